@@ -0,0 +1,21 @@
+import io from "socket.io-client";
+
+// The socket goes through the same /api proxy as the REST calls so the handshake carries the session cookie;
+// the server identifies the socket's user from that session
+const SOCKET_PATH = "/api/socket.io";
+
+let socket;
+
+// One socket per tab, shared by the chat sidebar (unread counts, presence) and the chat window (messages, typing)
+export const getSocket = () => {
+  if (!socket) {
+    socket = io({
+      path: SOCKET_PATH,
+      transports: ["websocket", "polling"],
+      withCredentials: true,
+    });
+  }
+  return socket;
+};
+
+export default getSocket;
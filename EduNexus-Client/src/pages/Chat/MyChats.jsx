@@ -1,26 +1,30 @@
 import { ChatState } from "../../contexts/chatProvider";
-import { Box, Button, useToast, Text } from "@chakra-ui/react";
+import { Badge, Box, Button, useToast, Text } from "@chakra-ui/react";
 import { useState, useEffect } from "react";
 import { AddIcon } from "@chakra-ui/icons";
 import ChatLoading from "./ChatLoading";
 import { Stack, Skeleton } from "@chakra-ui/react";
-import { getSender } from "../../config/ChatLogix";
+import { getSender, getSenderFull } from "../../config/ChatLogix";
 import GroupChatModal from "./GroupChatModal";
 import axios from "axios";
 import api, { getApiEndpoint } from "../../config/api";
+import { getSocket } from "../../config/socket";
 
 export default function MyChats({ fetchAgain, setFetchAgain }) {
   const { selectedChat, setSelectedChat, user, chats, setChats } = ChatState();
   console.log(user)
   const toast = useToast();
   const [loggedUser, setLoggedUser] = useState();
+  const [nextCursor, setNextCursor] = useState(null); // next_cursor of the last loaded page
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchChats = async () => {
     const endpoint = getApiEndpoint('/chats', user); // Construct endpoint
     if (!endpoint) return;
     try {
       const { data } = await api.get(endpoint); 
-      setChats(data);
+      setChats(data.chats);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast({
         position: "top-left",
@@ -34,6 +38,63 @@ export default function MyChats({ fetchAgain, setFetchAgain }) {
     }
   };
 
+  // The server pages the chat list; later pages are appended, skipping chats that moved to the first page
+  const fetchMoreChats = async () => {
+    const endpoint = getApiEndpoint('/chats', user);
+    if (!endpoint || !nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { data } = await api.get(endpoint, { params: { before: nextCursor } });
+      setChats(prev => {
+        const loaded = new Set((prev || []).map(chat => chat._id));
+        return [...(prev || []), ...data.chats.filter(chat => !loaded.has(chat._id))];
+      });
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      toast({
+        position: "top-left",
+        title: "Error Occured!",
+        description: error.message,
+        status: "warning",
+        duration: 5000,
+        isClosable: true,
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Live sidebar state: the server pushes unread counters and the presence of everyone sharing a chat with the user
+  useEffect(() => {
+    const socket = getSocket();
+    const handleUnreadUpdate = ({ chatId, unreadCount }) => {
+      setChats(prev => prev && prev.map(chat => chat._id === chatId ? { ...chat, unreadCount } : chat));
+    };
+    const handlePresence = ({ userId, online }) => {
+      setChats(prev => prev && prev.map(chat => {
+        if (!chat.users.some(member => String(member._id) === userId)) return chat;
+        const others = (chat.onlineUsers || []).filter(id => id !== userId);
+        return { ...chat, onlineUsers: online ? [...others, userId] : others };
+      }));
+    };
+    socket.on("unread update", handleUnreadUpdate);
+    socket.on("presence", handlePresence);
+    return () => {
+      socket.off("unread update", handleUnreadUpdate);
+      socket.off("presence", handlePresence);
+    };
+  }, []);
+
+  // Online when the other member of a one-to-one chat, or anyone else in a group, has a live socket
+  const isChatOnline = (chat) => {
+    const online = chat.onlineUsers || [];
+    if (!chat.isGroupChat) {
+      const other = getSenderFull(loggedUser, chat.users);
+      return Boolean(other) && online.includes(String(other._id));
+    }
+    return online.some(id => id !== String(loggedUser?._id));
+  };
+
   useEffect(() => {
     setLoggedUser(JSON.parse(localStorage.getItem("userInfo")));
     fetchChats();
@@ -86,7 +147,7 @@ export default function MyChats({ fetchAgain, setFetchAgain }) {
         w="100%"
         h="100%"
         borradius="lg"
-        overflowY="hidden"
+        overflowY="auto"
         
       >
         {chats ? (
@@ -96,7 +157,7 @@ export default function MyChats({ fetchAgain, setFetchAgain }) {
               <Box
                 onClick={() => setSelectedChat(chat)}
                 cursor="pointer"
-                bg={selectedChat === chat ? "#553c9a" : "#ab77f0"}
+                bg={selectedChat?._id === chat._id ? "#553c9a" : "#ab77f0"}
                 color={ "white" }
                 px={3}
                 py={2}
@@ -108,13 +169,39 @@ export default function MyChats({ fetchAgain, setFetchAgain }) {
                 fontWeight="bold"   
       borderWidth="1px"
               >
-                <Text>
-                  {!chat.isGroupChat
-                    ? getSender(loggedUser, chat.users)
-                    : chat.chatName}
-                </Text>
+                <Box display="flex" alignItems="center" justifyContent="space-between">
+                  <Box display="flex" alignItems="center" gap={2}>
+                    <Box
+                      w="8px"
+                      h="8px"
+                      borderRadius="full"
+                      flexShrink={0}
+                      bg={isChatOnline(chat) ? "green.300" : "gray.400"}
+                    />
+                    <Text>
+                      {!chat.isGroupChat
+                        ? getSender(loggedUser, chat.users)
+                        : chat.chatName}
+                    </Text>
+                  </Box>
+                  {chat.unreadCount > 0 && selectedChat?._id !== chat._id && (
+                    <Badge colorScheme="red" borderRadius="full" px={2}>
+                      {chat.unreadCount}
+                    </Badge>
+                  )}
+                </Box>
               </Box>
             ))}
+            {nextCursor && (
+              <Button
+                size="sm"
+                alignSelf="center"
+                onClick={fetchMoreChats}
+                isLoading={loadingMore}
+              >
+                Load more chats
+              </Button>
+            )}
           </Stack>
         ) : (
           <ChatLoading />
@@ -2,6 +2,7 @@ import { useState, useEffect,useRef } from "react";
 import { ChatState } from "../../../contexts/chatProvider";
 import {
   Box,
+  Button,
   Text,
   IconButton,
   Spinner,
@@ -16,13 +17,12 @@ import UpdateGroupChatModal from "../components/UpdateGroupChatModal";
 import axios from "axios";
 import "./style.css";
 import ScrollableChat from "./ScrollableChat";
-import io from "socket.io-client";
+import { getSocket } from "../../../config/socket";
 import animationData from "../../../../animations/typins.json";
 import Lottie from "react-lottie";
 import api, { getApiEndpoint } from "../../../config/api"; // Import helpers
 
 
-const ENDPOINT = "http://127.0.0.1:5000";
 var socket, selectedChatCompare;
 
 const SingleChat = ({ fetchAgain, setFetchAgain }) => {
@@ -30,6 +30,8 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
     ChatState();
   const [messages, setMessages] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [olderCursor, setOlderCursor] = useState(null); // next_cursor of the oldest loaded page
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState();
   const toast = useToast();
   const [socketConneted, setSocketConnected] = useState();
@@ -55,26 +57,23 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
     let k
     if(user["user_info"]) k = user["user_info"]
     else k = user
-    socket = io(ENDPOINT, {
-    path: '/socket.io',
-    transports: ['websocket', 'polling'],
-    withCredentials: true
-  });
+    socket = getSocket();
     socket.emit("setup", k);
-    socket.on("connected", () => setSocketConnected(true));
+    const handleConnected = () => setSocketConnected(true);
+    socket.on("connected", handleConnected);
     
     // Update typing handler to include user info
-    socket.on("typing", (userId) => {
+    const handleTyping = (userId) => {
       // Only show typing indicator if someone else is typing
-      if (userId !== k._id) {
+      if (String(userId) !== String(k._id)) {
         setIsTyping(true);
         // Store typing status with timestamp
         setTypingUsers(prev => new Map(prev).set(userId, Date.now()));
       }
-    });
+    };
+    socket.on("typing", handleTyping);
 
-    
-    socket.on("stop typing", (userId) => {
+    const handleStopTyping = (userId) => {
       // Remove user from typing users map
       setTypingUsers(prev => {
         const updatedMap = new Map(prev);
@@ -85,7 +84,15 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
         }
         return updatedMap;
       });
-    });
+    };
+    socket.on("stop typing", handleStopTyping);
+
+    // the socket is shared with the sidebar and outlives this component
+    return () => {
+      socket.off("connected", handleConnected);
+      socket.off("typing", handleTyping);
+      socket.off("stop typing", handleStopTyping);
+    };
   }, []);
 
   // useEffect(() => {
@@ -99,6 +106,18 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
   //   socket.on("stop typing", () => setIsTyping(false));
   // }, []);
 
+  // Reset the chat's unread counter on the server; the sidebar hears back through 'unread update'
+  const markChatRead = async (chatId, messageId) => {
+    const endpoint = getApiEndpoint('/chats/read', user);
+    if (!endpoint) return;
+    setChats(prev => prev && prev.map(chat => chat._id === chatId ? { ...chat, unreadCount: 0 } : chat));
+    try {
+      await api.post(endpoint, { chatId, messageId });
+    } catch (error) {
+      console.error("Could not mark chat as read:", error.message);
+    }
+  };
+
   useEffect(() => {
     if (!socket) return;
     
@@ -122,8 +141,9 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
           setFetchAgain(!fetchAgain);
         }
       } else {
-        // Add to messages if in the current chat
+        // Add to messages if in the current chat, which the user is looking at
         setMessages(prev => [...prev, newMessageReceived]);
+        markChatRead(newMessageReceived.chat._id, newMessageReceived._id);
       }
     };
     
@@ -168,9 +188,7 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
         // Mark as processed BEFORE adding to messages
         processedMessagesRef.current.add(data._id);
         console.log("Marked as processed:", data._id);
-        
-        // Still emit for socket (can later be removed once backend emits properly)
-        socket.emit("new message", data);
+        // The server delivers it to the other members once it is stored
         
         setNewMessage("");
         setMessages(prev => [...prev, data]);
@@ -192,13 +210,17 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
     try {
       setLoading(true);
       const { data } = await api.get(endpoint);
+      const { messages: page, next_cursor } = data;
       
       // Reset processed messages when loading a new chat
-      processedMessagesRef.current = new Set(data.map(msg => msg._id));
+      processedMessagesRef.current = new Set(page.map(msg => msg._id));
       
-      setMessages(data);
+      setMessages(page);
+      setOlderCursor(next_cursor);
       setLoading(false);
       socket.emit("join chat", selectedChat._id);
+      // opening a chat reads it up to its newest message
+      markChatRead(selectedChat._id, page.length ? page[page.length - 1]._id : undefined);
     } catch (error) {
       toast({
         title: "Error Occurred!",
@@ -211,6 +233,34 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
       setLoading(false);
     }
   };
+
+  // The server returns the newest page only; older pages are fetched with its next_cursor and prepended
+  const fetchOlderMessages = async () => {
+    if (!selectedChat || !olderCursor || loadingOlder) return;
+    const chatId = selectedChat._id;
+    const endpoint = getApiEndpoint(`/messages/${chatId}`, user);
+    try {
+      setLoadingOlder(true);
+      const { data } = await api.get(endpoint, { params: { before: olderCursor } });
+      // the user may have switched chats while the page was loading
+      if (!selectedChatCompare || selectedChatCompare._id !== chatId) return;
+      const older = data.messages.filter(msg => !processedMessagesRef.current.has(msg._id));
+      older.forEach(msg => processedMessagesRef.current.add(msg._id));
+      setMessages(prev => [...older, ...prev]);
+      setOlderCursor(data.next_cursor);
+    } catch (error) {
+      toast({
+        title: "Error Occurred!",
+        description: error.message,
+        status: "error",
+        duration: 5000,
+        position: "top-center",
+        isClosable: true,
+      });
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
   
 
 
@@ -492,6 +542,18 @@ const SingleChat = ({ fetchAgain, setFetchAgain }) => {
             ) : (
               <>
                 <div className="messages">
+                  {olderCursor && (
+                    <Button
+                      size="sm"
+                      alignSelf="center"
+                      mb={2}
+                      flexShrink={0}
+                      onClick={fetchOlderMessages}
+                      isLoading={loadingOlder}
+                    >
+                      Load older messages
+                    </Button>
+                  )}
                   <ScrollableChat messages={messages} />
                 </div>
               </>
@@ -1,10 +1,27 @@
-from server import create_app, socketio
-app = create_app()
+import os
+from dotenv import load_dotenv
 
-with app.app_context():
-    from server import db
-    db.create_all()
+load_dotenv()
+
+# Export pool workers (server/export_service.py) are spawned processes, and spawn re-imports this file in
+# each of them as __mp_main__. They only need core.export_tasks, so the app (database, Mongo indexes,
+# embedding model) is only set up in the server process itself.
+if __name__ != "__mp_main__":
+    # gevent / eventlet have to patch the standard library before anything else is imported
+    if os.environ.get('SOCKETIO_ASYNC_MODE') == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    elif os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+
+    from server import create_app, socketio
+    app = create_app()
+
+    with app.app_context():
+        from server import db
+        db.create_all()
 
 if __name__=="__main__":
-    socketio.run(app, debug=True, port=5000, allow_unsafe_werkzeug=True)
+    socketio.run(app, debug=True, port=int(os.environ.get('PORT', 5000)), allow_unsafe_werkzeug=True)
     # app.run(debug=True,port=5000)
\ No newline at end of file
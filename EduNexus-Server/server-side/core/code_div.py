@@ -1,130 +1,141 @@
-import pandas as pd
 import json
+import re
+import xlsxwriter
+from io import BytesIO
 from google import genai
 from datetime import datetime
 import os
+import tempfile
+import uuid
+from core.timetable_solver import TimetableSolver, TimetableInfeasible, TimetableValidationError, parse_time, format_time, \
+    slot_times
 
 from dotenv import load_dotenv
 load_dotenv()
 client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
-def generate_timetable(teachers_subjects, classes_subjects, hours_per_week, preferred_slots, classrooms,labs, lab_requirements,theory_requirements, start_time, end_time):
-    
+# /teacher/timetable request fields and their defaults; the dict ones can be patched key by key on a re-solve
+TIMETABLE_INPUTS = {
+    "teachers_subjects": {},
+    "class_subjects": {},
+    "hours_per_week": {},
+    "preferred_slots": {},
+    "unavailable_slots": {},
+    "classrooms": [],
+    "labs": [],
+    "lab_requirements": {},
+    "theory_requirements": [],
+    "start_time": "8:30",
+    "end_time": "17:30",
+}
+
+
+def generate_timetable(teachers_subjects, classes_subjects, hours_per_week, preferred_slots, classrooms,labs, lab_requirements,theory_requirements, start_time, end_time, unavailable_slots=None):
+    """
+    Timetable JSON ({"teachers": ..., "Classes": ...}) from the local solver.
+    Raises TimetableInfeasible (or ValueError) for impossible or invalid input, TimetableValidationError for a solver bug.
+    """
+    solver = TimetableSolver(teachers_subjects, classes_subjects, hours_per_week, preferred_slots, classrooms, labs,
+                             lab_requirements, theory_requirements, start_time, end_time,
+                             unavailable_slots=unavailable_slots)
+    return solver.solve()
+
+
+def timetable_inputs(data):
+    """The timetable fields of a request body, with defaults; raises ValueError for a field of the wrong type."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    inputs = {}
+    for key, default in TIMETABLE_INPUTS.items():
+        value = data.get(key)
+        if isinstance(default, (dict, list)) and value is not None and not isinstance(value, type(default)):
+            raise ValueError(f"{key} must be a{'n object' if isinstance(default, dict) else ' list'}")
+        inputs[key] = value or default
+    # the solver accepts "9", "9.30" or "2:00 pm"; everything after it (Mongo, the Excel export) sees "HH:MM"
+    for key in ("start_time", "end_time"):
+        inputs[key] = format_time(parse_time(inputs[key]))
+    return inputs
+
+
+def apply_timetable_delta(inputs, delta):
+    """
+    New inputs from a delta such as {"unavailable_slots": {"Mr Rao": "Mon"}, "labs": ["L1", "L2"]}.
+    Dict fields are patched per key (None removes the key), everything else is replaced.
+    """
+    if not isinstance(delta, dict):
+        raise ValueError("changes must be an object")
+    unknown = set(delta) - set(TIMETABLE_INPUTS)
+    if unknown:
+        raise ValueError(f"Unknown timetable fields: {', '.join(sorted(unknown))}")
+    merged = dict(inputs)
+    for key, value in delta.items():
+        if isinstance(TIMETABLE_INPUTS[key], dict) and isinstance(value, dict):
+            entries = dict(merged.get(key) or {})
+            for name, entry in value.items():
+                if entry is None:
+                    entries.pop(name, None)
+                else:
+                    entries[name] = entry
+            merged[key] = entries
+        else:
+            merged[key] = value
+    return timetable_inputs(merged)
 
-    print("request sent")
-    prompt = f"""
-        Act like an expert academic scheduler and timetable generator. 
-        You specialize in efficiently organizing timetables for schools and colleges while ensuring there are no scheduling conflicts for teachers, classrooms, or students. Your goal is to create a well-structured timetable in JSON format based on the given constraints.
 
-        ### **Input Details:**  
-        You will receive the following information:
+def resolve_timetable(inputs, previous, delta):
+    """Re-solve a stored timetable after a change, keeping it as stable as possible. Returns (inputs, timetable, changes)."""
+    inputs = apply_timetable_delta(inputs, delta)
+    solver = TimetableSolver(inputs["teachers_subjects"], inputs["class_subjects"], inputs["hours_per_week"],
+                             inputs["preferred_slots"], inputs["classrooms"], inputs["labs"],
+                             inputs["lab_requirements"], inputs["theory_requirements"], inputs["start_time"],
+                             inputs["end_time"], unavailable_slots=inputs["unavailable_slots"], previous=previous)
+    timetable = solver.solve()
+    return inputs, timetable, solver.diff(previous, timetable)
 
-        1. **Teachers and Subjects**  
-        - A list of teachers with the subjects they teach.  
-        - The classes each teacher is assigned to.  
-        - The total number of hours per week each teacher needs to teach each subject.  
-        
-        teachers_subjects = {teachers_subjects}  
-        hours_per_week = {hours_per_week}  
-        classes_subjects = {classes_subjects}   (Which class have which subjects)
-
-        2. **Preferred Time Slots**  
-        - The preferred days and hours for each teacher.  
-        - Any unavailable slots for specific teachers.  
-
-        preferred_slots = {preferred_slots}  
-
-        3. **Classrooms, Labs, and Class Subjects**  
-        - The total number of classrooms and labs available.  
-        - A dictionary specifying which classes have which subjects.  
-        - A list of available lab rooms.  
-        - A list of subjects that require only theory lectures.  
-        - A dictionary mapping lab-required subjects to their designated labs.  
-
-        classrooms = {classrooms}  
-        labs = {labs}  
-        theory subjects are = {theory_requirements}  
-        Lab subjects are = {lab_requirements}  
-
-
-        4. **College Timings**  
-        - The start and end times of the academic day.  
-        - Each lecture lasts **1 hour**, while lab sessions last **2 consecutive hours**.
-        - The number of slots per day should be dynamically calculated based on these timings.
-
-        start_time = {start_time}  # Integer (e.g., 9 for 9:00 AM)
-        end_time = {end_time}  # Integer (e.g., 17 for 5:00 PM)
-
-        Constraints to Follow:
-        1. No teacher should have overlapping lectures.
-        2. No class should have overlapping subjects at the same time.
-        3. A classroom or lab should not be double-booked.
-        4. Ensure that all teaching hours per week are met for each subject.
-        5. Prioritize teacher preferences when possible.
-        6. Subjects in `theory_requirements` should be scheduled only in regular classrooms, not labs.
-        7. Subjects listed in `lab_requirements` must be scheduled in their designated lab and should take **2 consecutive slots**.
-
-        ### **Output Format:**  
-        The timetable should be structured in JSON format as follows:
-
-        - The keys for teachers and classes should include the day and an identifier (e.g., "monday_Mrs Johnson" or "monday_10A").
-        - The number of slots per day is dynamic based on the college timings (each slot is 1 hour; labs occupy 2 consecutive slots).
-        - For teachers, each time slot entry should be either an empty list or a list of three elements: [Classroom/Lab, Class, Subject].
-        - For classes, each time slot entry should be either an empty list or a list of three elements: [Classroom/Lab, Teacher, Subject].
-
-        Example JSON structure:
-        ```json
-        {{
-            "teachers": {{
-                "monday_Mrs Johnson": [[], ["CR1", "10A", "Maths"], [], ...],
-                "tuesday_Mrs Johnson": [[], [], ["CR2", "10A", "Maths"], ...],
-                ...,
-                "Saturday_Mr Smith": [["CR1", "10D", "Science"], ["CR1", "10B", "Science"], ...]
-            }},
-            "Classes": {{
-                "monday_10A": [[], ["CR1", "Mrs Johnson", "Maths"], ...],
-                "tuesday_10A": [[], [], ["CR2", "Mrs Johnson", "Maths"], ...],
-                ...,
-                "Saturday_10D": [["102", "Mr Smith", "Science"], ...]
-            }}
-        }}
-        ```
-        Each list in the timetable corresponds to a 1-hour slot; if a lab is scheduled, it should cover 2 consecutive slots.
-
-        Analyze the input constraints and generate an optimized timetable that follows the above rules. If a perfect schedule isn't possible, provide the best possible solution and highlight any conflicts.
-
-        Take a deep breath and work on this problem step-by-step.
-    """
 
+TIMETABLE_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
 
-    
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config={
-            'response_mime_type': 'application/json',
-        },
-    )
 
-    # print(response.text)
-    return response.text
+def timetable_slot_headers(start_time, end_time):
+    """Column headers of the solver's 1-hour slots between start_time and end_time, e.g. "08:30 AM - 09:30 AM"."""
+    def label(minutes):
+        return datetime.strptime(format_time(minutes), "%H:%M").strftime('%I:%M %p')
+    return [f"{label(start)} - {label(end)}" for start, end in slot_times(start_time, end_time)]
 
 
-def save_timetable_to_excel(timetable, start_time="8:30", end_time="17:30"):
-    output_folder = "/timetables_output"
+def group_timetable(entries):
+    """{name: {Day: slots}} from keys like "monday_Mr. Smith"."""
+    grouped = {}
+    for key, slots in entries.items():
+        parts = key.split("_", 1)
+        if len(parts) != 2:
+            continue
+        grouped.setdefault(parts[1], {})[parts[0].capitalize()] = slots
+    return grouped
 
-    # Create the folder if it doesn't exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    # Generate a unique file name with a timestamp
-    unique_name = f"timetable_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    file_path = os.path.join(output_folder, unique_name)
-    print("Saving timetable to:", file_path)
-    writer = pd.ExcelWriter(file_path, engine='xlsxwriter')
-    workbook = writer.book
-    
-    # Define cell formats
+
+def timetable_sheet_name(name, used):
+    """Excel-safe, unique (case-insensitively) sheet name of at most 31 characters."""
+    base = INVALID_SHEET_CHARACTERS.sub(" ", str(name)).strip()[:31] or "Sheet"
+    sheet_name = base
+    counter = 2
+    while sheet_name.lower() in used:
+        suffix = f" ({counter})"
+        sheet_name = base[:31 - len(suffix)] + suffix
+        counter += 1
+    used.add(sheet_name.lower())
+    return sheet_name
+
+
+def timetable_excel_bytes(timetable, start_time="8:30", end_time="17:30"):
+    """
+    The timetable as an .xlsx in memory: one sheet per teacher, then one per class, days as rows and
+    time slots as columns. Headers are computed once and every row is written with a single write_row.
+    """
+    headers = timetable_slot_headers(start_time, end_time)
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
     cell_format = workbook.add_format({
         'border': 1, 
         'align': 'center', 
@@ -138,164 +149,45 @@ def save_timetable_to_excel(timetable, start_time="8:30", end_time="17:30"):
         'valign': 'vcenter', 
         'bg_color': '#D7E4BC'
     })
-    
-    # Order of days to display in the table
-    days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-    
-    #############################
-    # Process Teachers Timetable
-    #############################
-    teachers_data = timetable.get("teachers", {})
-    # Group by teacher name from keys like "monday_Mr. Smith"
-    teachers_grouped = {}
-    for key, slots in teachers_data.items():
-        parts = key.split("_", 1)
-        if len(parts) != 2:
-            continue
-        day = parts[0].capitalize()   # e.g., "Monday"
-        teacher = parts[1]
-        if teacher not in teachers_grouped:
-            teachers_grouped[teacher] = {}
-        teachers_grouped[teacher][day] = slots  # each slots is a list (e.g. 6 slots)
-    
-    for teacher, day_slots in teachers_grouped.items():
-        # Determine the number of slots (assume all days have the same number or use the max)
-        # Calculate the number of slots dynamically based on start_time and end_time
-        time_format = "%H:%M"  # Adjust if using a different format
-        start_dt = datetime.strptime(start_time, time_format)
-        end_dt = datetime.strptime(end_time, time_format)
-        num_slots = int((end_dt - start_dt).total_seconds() // 3600)  # Each slot = 1 hour
-
-        if num_slots == 0:
-            continue
-
-        # Generate time slot boundaries and then time slot ranges as column headers.
-        boundaries = pd.date_range(start=start_time, end=end_time, periods=num_slots+1)
-        time_slots = [
-            f"{boundaries[i].strftime('%I:%M %p')} - {boundaries[i+1].strftime('%I:%M %p')}"
-            for i in range(num_slots)
-        ]
-        
-        # Build a dictionary: keys = Day, value = list of cell contents for each time slot
-        table_data = {}
-        for day in days_order:
-            slots = day_slots.get(day, [""] * num_slots)
-            row = []
-            for slot in slots:
-                # For teachers, each slot is expected to be [Location, Class, Subject]
-                if isinstance(slot, list) and slot:
-                    row.append(", ".join(map(str, slot)))
-                else:
-                    row.append("")
-            table_data[day] = row
-        
-        # Ensure the number of time slot headers matches the number of columns in table_data
-        max_columns = max(len(row) for row in table_data.values())
-        if len(time_slots) > max_columns:
-            time_slots = time_slots[:max_columns]
-        elif len(time_slots) < max_columns:
-            time_slots.extend([f"Slot {i+1}" for i in range(len(time_slots), max_columns)])
-
-        # Create DataFrame: rows = days, columns = computed time slots
-        df = pd.DataFrame.from_dict(table_data, orient="index", columns=time_slots)
-        df.index.name = "Day"
-        
-        # Use the teacher's name (truncated to 31 characters) as the sheet name
-        sheet_name = teacher[:31]
-        df.to_excel(writer, sheet_name=sheet_name)
-        worksheet = writer.sheets[sheet_name]
-        
-        # Format header row (time slot columns)
-        for col_num, col_name in enumerate(df.columns):
-            worksheet.write(0, col_num + 1, col_name, header_format)
-            worksheet.set_column(col_num + 1, col_num + 1, 25)
-        
-        # Write day names in the first column
-        for row_num, day in enumerate(df.index):
-            worksheet.write(row_num + 1, 0, day, header_format)
-        
-        # Write cell data with formatting
-        for i in range(df.shape[0]):
-            for j in range(df.shape[1]):
-                worksheet.write(i + 1, j + 1, df.iloc[i, j], cell_format)
-                
-    #############################
-    # Process Classes Timetable
-    #############################
-    classes_data = timetable.get("Classes", {})
-    classes_grouped = {}
-    for key, slots in classes_data.items():
-        parts = key.split("_", 1)
-        if len(parts) != 2:
-            continue
-        day = parts[0].capitalize()
-        class_name = parts[1]
-        if class_name not in classes_grouped:
-            classes_grouped[class_name] = {}
-        classes_grouped[class_name][day] = slots  # each slot is expected to be [Classroom, Teacher, Subject]
-    
-    for class_name, day_slots in classes_grouped.items():
-        time_format = "%H:%M"
-        start_dt = datetime.strptime(start_time, time_format)
-        end_dt = datetime.strptime(end_time, time_format)
-        num_slots = int((end_dt - start_dt).total_seconds() // 3600)
-        
-        if num_slots == 0:
-            continue
-        
-        boundaries = pd.date_range(start=start_time, end=end_time, periods=num_slots+1)
-        time_slots = [
-            f"{boundaries[i].strftime('%I:%M %p')} - {boundaries[i+1].strftime('%I:%M %p')}"
-            for i in range(num_slots)
-        ]
-        
-        table_data = {}
-        for day in days_order:
-            slots = day_slots.get(day, [""] * num_slots)
-            row = []
-            for slot in slots:
-                # Ensure the slot has at least 3 elements: [Classroom, Teacher, Subject]
-                print(slot)
-                if isinstance(slot, list) and len(slot) == 3:
-                    classroom, teacher, subject = slot
-                    row.append(f"{classroom}\n{teacher}\n{subject}")  # Each on a new line
-                elif isinstance(slot, list) and len(slot) > 0:
-                    row.append("\n".join(map(str, slot)))  # Join what exists
-                else:
-                    row.append("")
-
-            table_data[day] = row
-        
-        # Ensure the number of time slot headers matches the number of columns in table_data
-        max_columns = max(len(row) for row in table_data.values())
-        if len(time_slots) > max_columns:
-            time_slots = time_slots[:max_columns]
-        elif len(time_slots) < max_columns:
-            time_slots.extend([f"Slot {i+1}" for i in range(len(time_slots), max_columns)])
 
-        
-        df = pd.DataFrame.from_dict(table_data, orient="index", columns=time_slots)
-        df.index.name = "Day"
-        
-        sheet_name = class_name[:31]
-        df.to_excel(writer, sheet_name=sheet_name)
-        worksheet = writer.sheets[sheet_name]
-        
-        # Format header row (time slot columns)
-        for col_num, col_name in enumerate(df.columns):
-            worksheet.write(0, col_num + 1, col_name, header_format)
-            worksheet.set_column(col_num + 1, col_num + 1, 25)
-        
-        # Write day names in first column
-        for row_num, day in enumerate(df.index):
-            worksheet.write(row_num + 1, 0, day, header_format)
-        
-        # Write cell data with formatting
-        for i in range(df.shape[0]):
-            for j in range(df.shape[1]):
-                worksheet.write(i + 1, j + 1, df.iloc[i, j], cell_format)
-    
-    writer.close()
+    used_names = set()
+    # teacher slots are [Location, Class, Subject] on one line, class slots [Classroom, Teacher, Subject] on three
+    for section, separator in (("teachers", ", "), ("Classes", "\n")):
+        for name, day_slots in group_timetable(timetable.get(section, {})).items():
+            if not headers:
+                continue
+            rows = [
+                [separator.join(map(str, slot)) if isinstance(slot, list) and slot else ""
+                 for slot in day_slots.get(day) or []]
+                for day in TIMETABLE_DAYS
+            ]
+            width = max(len(headers), *(len(row) for row in rows))
+            columns = headers + [f"Slot {i + 1}" for i in range(len(headers), width)]
+
+            worksheet = workbook.add_worksheet(timetable_sheet_name(name, used_names))
+            worksheet.set_column(1, width, 25)
+            worksheet.write_row(0, 0, ["Day"] + columns, header_format)
+            for row_num, (day, row) in enumerate(zip(TIMETABLE_DAYS, rows), start=1):
+                worksheet.write(row_num, 0, day, header_format)
+                worksheet.write_row(row_num, 1, row + [""] * (width - len(row)), cell_format)
+
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+def save_timetable_to_excel(timetable, start_time="8:30", end_time="17:30", file_path=None):
+    """
+    Write the timetable workbook to file_path (a temp file by default) for callers that need a file.
+    Routes send timetable_excel_bytes() straight from memory instead.
+    """
+    if file_path is None:
+        output_folder = os.path.join(tempfile.gettempdir(), "timetables_output")
+        os.makedirs(output_folder, exist_ok=True)
+        # uuid rather than a timestamp, so two timetables saved in the same second don't collide
+        file_path = os.path.join(output_folder, f"timetable_{uuid.uuid4().hex}.xlsx")
+    with open(file_path, "wb") as excel_file:
+        excel_file.write(timetable_excel_bytes(timetable, start_time, end_time).getbuffer())
     return file_path
 
 import pathlib
@@ -411,10 +303,53 @@ def generate_response(prompt):
 #===========================New RP ========================
 
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 import json
 import time
+from core.rate_limiter import TokenBucket
+
+
 
+SEMANTIC_SCHOLAR_API = "https://api.semanticscholar.org/graph/v1"
+PAPER_FIELDS = "title,authors,year,abstract,url,venue,citationCount,paperId"
+# Semantic Scholar allows 1 request/second per API key; all research requests of this process share the budget
+SEMANTIC_SCHOLAR_LIMITER = TokenBucket(rate=float(os.getenv("SEMANTIC_SCHOLAR_RPS", 1)),
+                                       capacity=int(os.getenv("SEMANTIC_SCHOLAR_BURST", 1)))
+SEMANTIC_SCHOLAR_TIMEOUT = float(os.getenv("SEMANTIC_SCHOLAR_TIMEOUT", 15))
+SUMMARY_WORKERS = int(os.getenv("PAPER_SUMMARY_WORKERS", 5))
+
+
+def semantic_scholar_request(method: str, path: str, max_retries: int = 3, **kwargs) -> Any:
+    """
+    Rate-limited Semantic Scholar call with retries on 429: the wait honours Retry-After
+    (exponential backoff otherwise) and holds back every other caller of the limiter too.
+    """
+    headers = {
+        "Accept": "application/json"
+    }
+    # Add API key if available
+    api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
+    if api_key:
+        headers["x-api-key"] = api_key
+
+    retry_delay = 5  # seconds
+    for attempt in range(max_retries):
+        SEMANTIC_SCHOLAR_LIMITER.acquire()
+        response = requests.request(method, f"{SEMANTIC_SCHOLAR_API}{path}", headers=headers,
+                                    timeout=SEMANTIC_SCHOLAR_TIMEOUT, **kwargs)
+        if response.status_code == 429 and attempt < max_retries - 1:
+            try:
+                delay = max(0.0, float(response.headers.get("Retry-After") or retry_delay))
+            except ValueError:
+                # Retry-After may also be an HTTP-date
+                delay = retry_delay
+            print(f"Rate limit hit, retrying in {delay} seconds...")
+            SEMANTIC_SCHOLAR_LIMITER.pause(delay)
+            retry_delay *= 2  # Exponential backoff
+            continue
+        response.raise_for_status()
+        return response.json()
 
 
 def get_paper_details(paper_id: str) -> Optional[Dict[str, Any]]:
@@ -428,39 +363,30 @@ def get_paper_details(paper_id: str) -> Optional[Dict[str, Any]]:
         Dict containing paper details or None if not found
     """
     try:
-        # Semantic Scholar API endpoint for paper details
-        api_url = f"https://api.semanticscholar.org/graph/v1/paper/{paper_id}"
-        
-        # Fields to retrieve
-        fields = "title,abstract,authors,year,url,venue,citationCount"
-        
-        # Parameters for the API request
-        params = {
-            "fields": fields
-        }
-        
-        # Add headers including API key if you have one
-        headers = {
-            "Accept": "application/json"
-        }
-        
-        # Add API key if available
-        api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
-        if api_key:
-            headers["x-api-key"] = api_key
-        
-        # Make the API request
-        response = requests.get(api_url, params=params, headers=headers)
-        response.raise_for_status()
-        
-        # Parse the response
-        paper_details = response.json()
-        
-        return paper_details
-        
+        return semantic_scholar_request("GET", f"/paper/{paper_id}", params={"fields": PAPER_FIELDS})
     except Exception as e:
         print(f"Error getting paper details: {str(e)}")
         return None
+
+
+def get_papers_details(paper_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Details of several papers in one request to the batch endpoint (up to 500 IDs)
+    
+    Args:
+        paper_ids: Semantic Scholar Paper IDs
+        
+    Returns:
+        Paper details in the same order as paper_ids, None for unknown IDs or when the request failed
+    """
+    if not paper_ids:
+        return []
+    try:
+        return semantic_scholar_request("POST", "/paper/batch", params={"fields": PAPER_FIELDS},
+                                        json={"ids": paper_ids})
+    except Exception as e:
+        print(f"Error getting paper details: {str(e)}")
+        return [None] * len(paper_ids)
     
     
 def search_papers(query: str, limit: int = 5, days_back: int = 365) -> List[Dict[str, Any]]:
@@ -468,53 +394,13 @@ def search_papers(query: str, limit: int = 5, days_back: int = 365) -> List[Dict
     Search for papers using Semantic Scholar API with retry logic
     """
     try:
-        # Semantic Scholar API endpoint
-        api_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-        
-        # Parameters for the API request
         params = {
             "query": query,
             "limit": limit,
-            "fields": "title,authors,year,abstract,url,venue,citationCount,paperId"
+            "fields": PAPER_FIELDS
         }
-        
-        # Add headers including API key if you have one
-        headers = {
-            "Accept": "application/json"
-        }
-        
-        # Add API key if available
-        api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
-        if api_key:
-            headers["x-api-key"] = api_key
-        
-        # Retry logic with exponential backoff
-        max_retries = 3
-        retry_delay = 5  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                # Make the API request
-                response = requests.get(api_url, params=params, headers=headers)
-                response.raise_for_status()
-                
-                # Parse the response
-                data = response.json()
-                
-                # Return the paper data
-                return data.get("data", [])
-                
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:  # Rate limit error
-                    if attempt < max_retries - 1:  # Not the last attempt
-                        print(f"Rate limit hit, retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                    else:
-                        raise  # Re-raise on last attempt
-                else:
-                    raise  # Re-raise other HTTP errors
-        
+        data = semantic_scholar_request("GET", "/paper/search", params=params)
+        return data.get("data", [])
     except Exception as e:
         print(f"Error searching papers: {str(e)}")
         return []
@@ -544,38 +430,41 @@ def search_and_summarize_papers(query: str, max_papers: int = 5, days_back: int
                 "papers": []
             }
         
-        # Step 2: Get detailed information for each paper
-        paper_details = []
-        for paper in papers:
-            # Get full paper details with abstract
-            details = get_paper_details(paper.get("paperId"))
-            if details:
-                paper_details.append(details)
-                
-            # Respect API rate limits
-            time.sleep(1)
+        # Step 2: the search already returns every field we need; only papers that came back without
+        # an abstract are looked up again, all in one batch request
+        missing = [paper for paper in papers if not paper.get("abstract") and paper.get("paperId")]
+        details = get_papers_details([paper["paperId"] for paper in missing])
+        for paper, detail in zip(missing, details):
+            if detail:
+                paper.update({key: value for key, value in detail.items() if value})
+        paper_details = [paper for paper in papers if paper.get("abstract")]
+        
+        # Step 3: Generate technical summaries using LLM, concurrently
+        summaries = []
+        if paper_details:
+            with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, len(paper_details))) as executor:
+                summaries = list(executor.map(
+                    lambda paper: generate_technical_summary(
+                        title=paper.get("title", ""),
+                        abstract=paper.get("abstract", ""),
+                        authors=paper.get("authors", []),
+                        year=paper.get("year")
+                    ),
+                    paper_details
+                ))
         
-        # Step 3: Generate technical summaries using LLM
         summarized_papers = []
-        for paper in paper_details:
-            if paper.get("abstract"):
-                summary = generate_technical_summary(
-                    title=paper.get("title", ""),
-                    abstract=paper.get("abstract", ""),
-                    authors=paper.get("authors", []),
-                    year=paper.get("year")
-                )
-                
-                summarized_papers.append({
-                    "title": paper.get("title"),
-                    "authors": [author.get("name") for author in paper.get("authors", [])],
-                    "year": paper.get("year"),
-                    "url": paper.get("url"),
-                    "abstract": paper.get("abstract"),
-                    "summary": summary,
-                    "citations": paper.get("citationCount"),
-                    "venue": paper.get("venue")
-                })
+        for paper, summary in zip(paper_details, summaries):
+            summarized_papers.append({
+                "title": paper.get("title"),
+                "authors": [author.get("name") for author in paper.get("authors", [])],
+                "year": paper.get("year"),
+                "url": paper.get("url"),
+                "abstract": paper.get("abstract"),
+                "summary": summary,
+                "citations": paper.get("citationCount"),
+                "venue": paper.get("venue")
+            })
         
         return {
             "query": query,
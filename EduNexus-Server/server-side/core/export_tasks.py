@@ -0,0 +1,44 @@
+"""
+Document renderers run inside the export process pool (see server/export_service.py).
+Each task writes the finished file to output_path. Generators are created once per worker process,
+and only this module and the generator it needs are imported there: spawn re-imports app.py in every
+worker as __mp_main__, and app.py skips creating the Flask app in that case.
+"""
+
+_generators = {}
+
+
+def _generator(name):
+    if name not in _generators:
+        if name == "pdf":
+            from core.pdf_generator import PdfGenerator
+            _generators[name] = PdfGenerator()
+        elif name == "lesson_pdf":
+            from core.teacher_pdf_generator import MarkdownPdfGenerator
+            _generators[name] = MarkdownPdfGenerator()
+        elif name == "pptx":
+            from core.ppt_generator import PptGenerator
+            _generators[name] = PptGenerator()
+    return _generators[name]
+
+
+def render_module_pdf(output_path, modulename, module_summary, submodule_content, src_lang, video_urls):
+    _generator("pdf").generate_pdf(output_path, modulename, module_summary, submodule_content, src_lang, video_urls)
+    return output_path
+
+
+def render_lesson_pdf(output_path, course_title, submodules, image_list):
+    _generator("lesson_pdf").generate_pdf(output_path, course_title, submodules, image_list)
+    return output_path
+
+
+def render_ppt(output_path, markdown_list, markdown_images_list, course_name, lesson_name):
+    prs = _generator("pptx").build_presentation(markdown_list, markdown_images_list, course_name, lesson_name)
+    prs.save(output_path)
+    return output_path
+
+
+def render_docx(output_path, markdown, course_name, exp_num):
+    from core.lab_manual_generator import LabManualGenerator
+    return LabManualGenerator.convert_markdown_to_docx(
+        input_file=markdown, course_name=course_name, exp_num=exp_num, output_file=output_path)
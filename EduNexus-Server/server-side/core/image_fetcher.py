@@ -0,0 +1,125 @@
+import base64
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+import requests
+from PIL import Image
+
+
+class ImageFetcher:
+    """
+    Loads the images of a document up front instead of one blocking download per slide / paragraph.
+    Sources can be http(s) URLs, data: URIs or local paths. Every source is fetched concurrently with
+    connect/read timeouts and a download size cap, decoded once, shrunk to fit the target box and
+    re-encoded as PNG (with transparency) or JPEG, so documents don't embed full-resolution originals.
+    Web images are kept in a disk cache keyed by URL and box size, shared by every worker process,
+    and URLs that failed are not retried for a while so a dead host only costs one timeout.
+    """
+    def __init__(self, cache_dir=None, timeout=None, max_bytes=None, max_workers=None, max_files=None,
+                 failure_ttl_seconds=600):
+        self.cache_dir = cache_dir or os.getenv("IMAGE_CACHE_DIR") or \
+            os.path.join(tempfile.gettempdir(), "edunexus_image_cache")
+        self.timeout = timeout or float(os.getenv("IMAGE_FETCH_TIMEOUT", 5))
+        self.max_bytes = max_bytes or int(os.getenv("IMAGE_FETCH_MAX_BYTES", 10 * 1024 * 1024))
+        self.max_files = max_files or int(os.getenv("IMAGE_CACHE_FILES", 2000))
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or int(os.getenv("IMAGE_FETCH_WORKERS", 8)))
+        self.session = requests.Session()
+        self.lock = Lock()
+        self.failures = {}
+
+    def prefetch(self, sources, max_size):
+        """
+        Map every distinct source to the bytes of its resized image, or to None when it could not be loaded.
+        max_size is the (width, height) box in pixels the images are shrunk to fit.
+        """
+        unique_sources = list(dict.fromkeys(source for source in sources if source))
+        futures = {source: self.executor.submit(self.load, source, max_size) for source in unique_sources}
+        images = {}
+        for source, future in futures.items():
+            try:
+                images[source] = future.result()
+            except Exception as e:
+                print(f"Error loading image {source[:100]}: {e}")
+                images[source] = None
+        if any(source.startswith('http') for source in unique_sources):
+            self.prune()
+        return images
+
+    def load(self, source, max_size):
+        if source.startswith('http'):
+            return self.load_url(source, max_size)
+        if source.startswith('data:image'):
+            return self.resize(base64.b64decode(re.sub('^data:image/.+;base64,', '', source)), max_size)
+        with open(source, 'rb') as image_file:
+            return self.resize(image_file.read(), max_size)
+
+    def load_url(self, url, max_size):
+        with self.lock:
+            failed_at = self.failures.get(url)
+        if failed_at is not None and time.monotonic() - failed_at < self.failure_ttl_seconds:
+            return None
+
+        cache_key = hashlib.sha256(f"{url}|{max_size[0]}x{max_size[1]}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{cache_key}.img")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as cached:
+                return cached.read()
+
+        try:
+            image = self.resize(self.download(url), max_size)
+        except Exception as e:
+            print(f"Error fetching image {url}: {e}")
+            with self.lock:
+                self.failures[url] = time.monotonic()
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(image)
+        os.replace(temp_path, cache_path)
+        return image
+
+    def download(self, url):
+        with self.session.get(url, timeout=(self.timeout, self.timeout), stream=True) as response:
+            response.raise_for_status()
+            if int(response.headers.get('Content-Length') or 0) > self.max_bytes:
+                raise ValueError(f"image larger than {self.max_bytes} bytes")
+            data = BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                data.write(chunk)
+                if data.tell() > self.max_bytes:
+                    raise ValueError(f"image larger than {self.max_bytes} bytes")
+            return data.getvalue()
+
+    @staticmethod
+    def resize(data, max_size):
+        """Decode, shrink to fit max_size keeping the aspect ratio and re-encode as PNG or JPEG."""
+        img = Image.open(BytesIO(data))
+        img.load()
+        img.thumbnail(max_size)
+        output = BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.convert("RGBA").save(output, format='PNG', optimize=True)
+        else:
+            img.convert("RGB").save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue()
+
+    def prune(self):
+        """Keep the disk cache to max_files images, dropping the least recently written ones."""
+        paths = glob.glob(os.path.join(self.cache_dir, "*.img"))
+        if len(paths) <= self.max_files:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -2,6 +2,7 @@ from api.gemini_client import GeminiProvider
 from api.serper_client import SerperProvider
 import pypandoc
 import os
+import uuid
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 import base64
@@ -100,7 +101,7 @@ class LabManualGenerator:
             base64_string += '=' * (4 - missing_padding)
         return base64_string
     @staticmethod
-    def convert_markdown_to_docx(input_file, course_name, exp_num ):
+    def convert_markdown_to_docx(input_file, course_name, exp_num, output_file=None):
         # Step 1: Replace placeholders in Markdown with image references
         markdown_content = input_file
         image_paths = []
@@ -117,12 +118,13 @@ class LabManualGenerator:
             '--from=markdown+hard_line_breaks+yaml_metadata_block+header_attributes'
         ]
         
-        current_dir = os.path.dirname(__file__)
-        output_dir = os.path.join(current_dir, "lab-manuals")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        doc = f"{course_name} Experiment {exp_num}.docx"
-        output_file = os.path.join(output_dir, doc)
+        if output_file is None:
+            current_dir = os.path.dirname(__file__)
+            output_dir = os.path.join(current_dir, "lab-manuals")
+            os.makedirs(output_dir, exist_ok=True)
+            
+            doc = f"{course_name} Experiment {exp_num} {uuid.uuid4().hex[:8]}.docx"
+            output_file = os.path.join(output_dir, doc)
         
         pypandoc.convert_text(markdown_content, 'docx', format='markdown', outputfile=output_file, extra_args=extra_args)
         
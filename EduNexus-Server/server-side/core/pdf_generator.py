@@ -7,9 +7,14 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import mm
 import os
+from threading import Lock
 
 
 class PdfGenerator:
+    # reportlab keeps registered fonts in a process-wide registry, so the TTF files only need parsing once
+    fonts_registered = False
+    fonts_lock = Lock()
+
     def __init__(self):
         self.heading_font_name = 'DejaVuSansCondensed'
         self.dev_heading_font_name = 'NotoSansDevanagari'
@@ -19,6 +24,14 @@ class PdfGenerator:
         self.dejavu_sans_path = os.path.join(self.current_dir, 'fonts', 'DejaVuSansCondensed.ttf')
         self.logo_path = os.path.join(self.current_dir, 'logo', 'logo.png')
 
+    def register_fonts(self):
+        with PdfGenerator.fonts_lock:
+            if PdfGenerator.fonts_registered:
+                return
+            pdfmetrics.registerFont(TTFont('NotoSansDevanagari', self.noto_sans_path))
+            pdfmetrics.registerFont(TTFont('DejaVuSansCondensed', self.dejavu_sans_path))
+            PdfGenerator.fonts_registered = True
+
     def add_page_number(self, canvas, docs):
         # Add page numbers
         page_num = canvas.getPageNumber()
@@ -26,9 +39,8 @@ class PdfGenerator:
         canvas.drawRightString(200*mm, 20*mm, text)
         
     def generate_pdf(self, pdf_file_path, modulename, module_summary, submodule_content, src_lang, video_urls):
-        # Register Unicode fonts
-        pdfmetrics.registerFont(TTFont('NotoSansDevanagari', self.noto_sans_path))
-        pdfmetrics.registerFont(TTFont('DejaVuSansCondensed', self.dejavu_sans_path))
+        """pdf_file_path can be a path or a writable binary file object such as a BytesIO."""
+        self.register_fonts()
 
         # Create a PDF document
         pdf = SimpleDocTemplate(pdf_file_path, pagesize=letter)
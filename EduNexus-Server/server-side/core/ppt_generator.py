@@ -1,11 +1,10 @@
 import os
 import re
-import base64
+import uuid
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-import requests
 from io import BytesIO
 import markdown
 from bs4 import BeautifulSoup
@@ -14,9 +13,10 @@ import time
 import ast
 
 from api.gemini_client import GeminiProvider
-from PIL import Image
-from PIL import Image
-from PIL import Image
+from core.image_fetcher import ImageFetcher
+
+# images are shrunk to this resolution for the widest image slot on a slide
+IMAGE_DPI = int(os.getenv("PPT_IMAGE_DPI", 150))
 
 
 class PptGenerator:
@@ -26,7 +26,7 @@ class PptGenerator:
         All parameters will be passed through the specific methods.
         """
         self.gemini_client = GeminiProvider()
-        pass
+        self.image_fetcher = ImageFetcher()
             
     def _process_markdown(self, text):
         """Convert markdown to HTML and then extract text with formatting hints."""
@@ -47,14 +47,14 @@ class PptGenerator:
         
         return headings[0] if headings else None, paragraphs
         
-    def _add_image_to_slide(self, slide, img_src, position, text_area_bottom=None, slide_height=None):
+    def _add_image_to_slide(self, slide, image_data, position, text_area_bottom=None, slide_height=None):
         """
-        Add an image to the slide from URL, file path or base64.
+        Add a prefetched image to the slide.
         Ensures images don't overlap with text by positioning them below text area.
         
         Args:
             slide: The slide to add the image to
-            img_src: Source of the image (URL, path, or base64)
+            image_data: Encoded image bytes from ImageFetcher.prefetch
             position: Tuple of (left, top, width) for image position
             text_area_bottom: Bottom boundary of text area to prevent overlap
             slide_height: Height of the slide for calculations
@@ -72,38 +72,7 @@ class PptGenerator:
             else:
                 max_height = Inches(3)  # Default max height if slide_height not provided
             
-            # Handle different image source types
-            if img_src.startswith('http'):
-                # Web URL
-                response = requests.get(img_src)
-                img_stream = BytesIO(response.content)
-                if img_src.endswith('.webp'):
-                    img = Image.open(img_stream).convert("RGB")
-                    img_stream = BytesIO()
-                    img.save(img_stream, format='PNG')
-                    img_stream.seek(0)
-                slide.shapes.add_picture(img_stream, left, top, width=width, height=max_height)
-            elif img_src.startswith('data:image'):
-                # Base64 encoded image
-                img_data = re.sub('^data:image/.+;base64,', '', img_src)
-                binary_data = base64.b64decode(img_data)
-                img_stream = BytesIO(binary_data)
-                if 'webp' in img_src:
-                    img = Image.open(img_stream).convert("RGB")
-                    img_stream = BytesIO()
-                    img.save(img_stream, format='PNG')
-                    img_stream.seek(0)
-                slide.shapes.add_picture(img_stream, left, top, width=width, height=max_height)
-            else:
-                # Local file path
-                if img_src.endswith('.webp'):
-                    img = Image.open(img_src).convert("RGB")
-                    img_stream = BytesIO()
-                    img.save(img_stream, format='PNG')
-                    img_stream.seek(0)
-                    slide.shapes.add_picture(img_stream, left, top, width=width, height=max_height)
-                else:
-                    slide.shapes.add_picture(img_src, left, top, width=width, height=max_height)
+            slide.shapes.add_picture(BytesIO(image_data), left, top, width=width, height=max_height)
             return True
         except Exception as e:
             print(f"Error adding image: {e}")
@@ -162,10 +131,20 @@ class PptGenerator:
         slides = []
         slide_height = prs.slide_height
         
-        for i, md_content in enumerate(markdown_list):
-            # Get heading and content from markdown
-            heading, paragraphs = self._process_markdown(md_content)
-            
+        # Pick the (up to 2) images of every slide first so they can all be downloaded concurrently
+        parsed_slides = [self._process_markdown(md_content) for md_content in markdown_list]
+        selected_images_list = []
+        for i, (heading, paragraphs) in enumerate(parsed_slides):
+            available_images = markdown_images_list[i] if i < len(markdown_images_list) else []
+            if paragraphs and available_images:
+                selected_images_list.append(random.sample(available_images, min(2, len(available_images))))
+            else:
+                selected_images_list.append([])
+        max_image_size = (int(Inches(4) / Inches(1) * IMAGE_DPI), int(slide_height / Inches(1) * IMAGE_DPI))
+        prefetched_images = self.image_fetcher.prefetch(
+            [img for selected_images in selected_images_list for img in selected_images], max_image_size)
+        
+        for i, (heading, paragraphs) in enumerate(parsed_slides):
             if not heading:
                 heading = f"Slide {i+1}"
                 
@@ -225,15 +204,10 @@ class PptGenerator:
                 
                 content_area_bottom = top + height
             
-            # Get images for this slide (if available)
-            available_images = []
-            if i < len(markdown_images_list):
-                available_images = markdown_images_list[i]
-            
             # Add up to 2 images if available, positioning them to avoid text overlap
-            if available_images:
-                num_images = min(2, len(available_images))
-                selected_images = random.sample(available_images, num_images)
+            selected_images = [img for img in selected_images_list[i] if prefetched_images.get(img)]
+            if selected_images:
+                num_images = len(selected_images)
                 
                 # Define positions for images (initial positions that will be adjusted)
                 if num_images == 1:
@@ -250,11 +224,11 @@ class PptGenerator:
                 
                 for j, img in enumerate(selected_images):
                     if j < len(positions):
-                        self._add_image_to_slide(slide, img, positions[j], content_area_bottom, slide_height)
+                        self._add_image_to_slide(slide, prefetched_images[img], positions[j], content_area_bottom, slide_height)
         
         return slides
     
-    def generate_ppt(self, markdown_list, markdown_images_list, course_name, lesson_name, output_folder="\Generated_PPTs"):
+    def generate_ppt(self, markdown_list, markdown_images_list, course_name, lesson_name, output_folder="Generated_PPTs"):
         """
         Generate the complete PowerPoint presentation.
         
@@ -268,28 +242,30 @@ class PptGenerator:
         Returns:
             Path to the saved presentation
         """
-        # Create a new presentation
-        prs = Presentation()
-        
         # Ensure output folder exists
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
             print("Making Generated PPT Directory", output_folder)
         
-        # Create title slide
-        self.create_title_slide(prs, course_name, lesson_name)
-        
-        # Create content slides
-        self.create_content_slides(prs, markdown_list, markdown_images_list)
+        prs = self.build_presentation(markdown_list, markdown_images_list, course_name, lesson_name)
         
-        # Save the presentation
-        output_path = os.path.join(output_folder, f"{course_name}_{lesson_name}")
+        # Save the presentation under a unique name, writing a temp file first so readers never see a partial deck
+        output_path = os.path.join(output_folder, f"{uuid.uuid4().hex[:8]}_{course_name}_{lesson_name}")
         print(output_path)
-        prs.save(output_path)
+        temp_path = f"{output_path}.tmp"
+        prs.save(temp_path)
+        os.replace(temp_path, output_path)
         return output_path
         #EduNexus-Server\server-side\Generated_PPTs\Large Language Models_Introduction to Generative AI.pptx.pptx
 
-    def generate_ppt_content(self, markdown_list : list[dict]):
+    def build_presentation(self, markdown_list, markdown_images_list, course_name, lesson_name):
+        """Build the title and content slides in memory and return the Presentation, leaving saving to the caller."""
+        prs = Presentation()
+        self.create_title_slide(prs, course_name, lesson_name)
+        self.create_content_slides(prs, markdown_list, markdown_images_list)
+        return prs
+
+    def generate_ppt_content(self, markdown_list : list[dict], max_attempts=3):
         prompt = """You are a skilled and creative expert in designing PowerPoint presentations. Your task is to take the content of a course and craft an engaging and concise presentation which is content-rich.\nFor each topic in the course, you will design slides explaining the topics provided. For each topic in the course, consolidate information into fewer slides (10-15 slides) by grouping related subtopics or concepts. Aim to minimize the total number of slides while ensuring each slide contains detailed and comprehensive content that thoroughly explains the topic. Strive for a balance between clarity and depth, presenting all critical information within a logical structure. \nEnsure that the slides are:\n - Organized logically for easy understanding.\n - Engaging and aligned with professional presentation standards.\n\n # Course Content:\n\n"""
         for index, markdown in enumerate(markdown_list):
             for key, value in markdown.items():
@@ -302,7 +278,7 @@ class PptGenerator:
         """
     
         prompt += output_format_prompt
-        while True:
+        for attempt in range(1, max_attempts + 1):
             try:
                 output = self.gemini_client.generate_response(prompt, remove_literals=False)
                 pattern = r"\[\s*(.*)\s*\]"
@@ -311,6 +287,8 @@ class PptGenerator:
                 extracted_list = ast.literal_eval(extracted_list_string)
                 return extracted_list
             except Exception as e:
+                if attempt == max_attempts:
+                    raise
                 print(f"Exception while creating PPT:{e}.\nTrying again in 10 seconds...")
                 time.sleep(10)
             
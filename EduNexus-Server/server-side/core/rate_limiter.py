@@ -0,0 +1,40 @@
+import time
+from threading import Lock
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are added per second, up to `capacity`.
+    acquire() takes a token, sleeping only as long as needed for one to become available, so
+    callers are paced at the API's rate without a fixed sleep after every request.
+    """
+    def __init__(self, rate, capacity=1):
+        if float(rate) <= 0:
+            raise ValueError(f"TokenBucket rate must be positive, got {rate}")
+        if float(capacity) < 1:
+            raise ValueError(f"TokenBucket capacity must be at least 1, got {capacity}")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds`, e.g. after the API answered 429 with Retry-After."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
@@ -0,0 +1,257 @@
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from threading import Lock, Timer
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# a failed background flush is retried after 5s, 10s, 20s... up to 5 minutes
+FLUSH_RETRY_BASE_SECONDS = float(os.getenv("RECOMMENDATION_INDEX_RETRY_SECONDS", 5))
+FLUSH_RETRY_MAX_SECONDS = float(os.getenv("RECOMMENDATION_INDEX_RETRY_MAX_SECONDS", 300))
+
+
+class RecommendationIndex:
+    """
+    On-disk index of module summary embeddings used for recommendations.
+
+    The index lives in recommendation_data/ as two files:
+      - module_embeddings.npy: row-normalized float32 matrix, memory-mapped on load
+      - module_index.json: one {module_id, module_name, summary} entry per matrix row
+    Modules are embedded when they are created, so workers never re-encode the corpus at startup.
+    Every write replaces both files atomically and other workers pick the change up on their next search.
+    Writes hold an flock on index.lock and start from the files on disk, so worker processes never drop each
+    other's modules. upsert_async / remove_async queue their changes, and the background flush writes all
+    queued changes with one embedding pass and one rewrite of the files. A failed flush puts its changes back on
+    the queue and is retried with exponential backoff, so the index doesn't drift from the modules table.
+    """
+    def __init__(self, model, data_dir=None):
+        self.model = model
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'recommendation_data')
+        self.embeddings_path = os.path.join(self.data_dir, 'module_embeddings.npy')
+        self.entries_path = os.path.join(self.data_dir, 'module_index.json')
+        self.lock_path = os.path.join(self.data_dir, 'index.lock')
+        # modules.csv (the old create_csv.py dump) seeds the index the first time it is built
+        self.seed_path = os.path.join(self.data_dir, 'modules.csv')
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # module_id -> (module_id, module_name, summary) to upsert, or None to remove
+        self.pending = {}
+        self.pending_lock = Lock()
+        self.flush_scheduled = False
+        self.flush_failures = 0
+        self.loaded_mtime = None
+        self.snapshot = (np.zeros((0, 0), dtype=np.float32), [])
+        self.load()
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms)
+
+    @staticmethod
+    def top_k_indices(embeddings, query_embedding, top_n):
+        """Indices of the top_n rows of embeddings by cosine similarity to query_embedding, best first."""
+        if embeddings.shape[0] == 0 or top_n <= 0:
+            return np.empty(0, dtype=np.int64)
+        scores = embeddings @ query_embedding
+        k = min(top_n, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def encode(self, summaries):
+        return self.normalize(self.model.encode(list(summaries), convert_to_numpy=True))
+
+    def __len__(self):
+        return len(self.snapshot[1])
+
+    def load(self):
+        if os.path.exists(self.embeddings_path) and os.path.exists(self.entries_path):
+            if self._read_from_disk():
+                return
+        if os.path.exists(self.seed_path):
+            print("Building recommendation index from modules.csv...")
+            df_module = pd.read_csv(self.seed_path)
+            modules = zip(df_module.module_id.tolist(), df_module.module_name.astype(str).tolist(), df_module.summary.astype(str).tolist())
+            self.rebuild(modules)
+
+    def _read_from_disk(self):
+        mtime = os.path.getmtime(self.entries_path)
+        with open(self.entries_path, encoding="utf-8") as f:
+            entries = json.load(f)
+        embeddings = np.load(self.embeddings_path, mmap_mode='r')
+        if embeddings.shape[0] != len(entries):
+            # caught another worker between the two file replaces, keep the current snapshot
+            print("Recommendation index files out of sync, skipping reload")
+            return False
+        self.snapshot = (embeddings, entries)
+        self.loaded_mtime = mtime
+        return True
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.entries_path)
+        except OSError:
+            return
+        if mtime != self.loaded_mtime:
+            with self.lock:
+                if mtime != self.loaded_mtime:
+                    self._read_from_disk()
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive against other threads and worker processes for a read-modify-write of the index files."""
+        with self.lock:
+            os.makedirs(self.data_dir, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # start from the files on disk, another worker may have written since our last load
+                    if os.path.exists(self.embeddings_path) and os.path.exists(self.entries_path):
+                        self._read_from_disk()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, embeddings, entries):
+        os.makedirs(self.data_dir, exist_ok=True)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        fd, embeddings_tmp = tempfile.mkstemp(dir=self.data_dir, suffix='.npy')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, embeddings)
+        fd, entries_tmp = tempfile.mkstemp(dir=self.data_dir, suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(embeddings_tmp, self.embeddings_path)
+        os.replace(entries_tmp, self.entries_path)
+        self._read_from_disk()
+
+    def search(self, query_embedding, top_n=5):
+        """Entries of the top_n modules most similar to a normalized query embedding."""
+        self.reload_if_changed()
+        embeddings, entries = self.snapshot
+        return [entries[i] for i in self.top_k_indices(embeddings, query_embedding, top_n)]
+
+    def upsert(self, modules):
+        """Embed and add or replace modules, given as (module_id, module_name, summary) tuples."""
+        modules = list(modules)
+        if not modules:
+            return
+        self._write_changes(modules, self.encode(summary for _, _, summary in modules), set())
+
+    def remove(self, module_ids):
+        self._write_changes([], None, {int(module_id) for module_id in module_ids})
+
+    def _write_changes(self, modules, vectors, removed_ids):
+        """Apply upserts (with their embeddings) and removals to the index files in a single write."""
+        with self._writing():
+            embeddings, entries = self.snapshot
+            keep = [i for i, entry in enumerate(entries) if entry["module_id"] not in removed_ids]
+            if not modules and len(keep) == len(entries):
+                return
+            # fancy indexing copies the memory-mapped rows into a writable array
+            embeddings = np.asarray(embeddings, dtype=np.float32)[keep]
+            entries = [entries[i] for i in keep]
+            positions = {entry["module_id"]: i for i, entry in enumerate(entries)}
+            new_rows = []
+            for (module_id, module_name, summary), vector in zip(modules, vectors if modules else []):
+                entry = {"module_id": int(module_id), "module_name": module_name, "summary": summary}
+                if entry["module_id"] in positions:
+                    embeddings[positions[entry["module_id"]]] = vector
+                    entries[positions[entry["module_id"]]] = entry
+                else:
+                    new_rows.append(vector)
+                    entries.append(entry)
+            if new_rows:
+                embeddings = np.vstack(new_rows) if embeddings.shape[0] == 0 else np.vstack([embeddings] + new_rows)
+            self._save(embeddings, entries)
+
+    def rebuild(self, modules):
+        """Re-embed the whole corpus from (module_id, module_name, summary) tuples."""
+        modules = list(modules)
+        entries = [{"module_id": int(module_id), "module_name": module_name, "summary": summary} for module_id, module_name, summary in modules]
+        embeddings = self.encode(entry["summary"] for entry in entries) if entries else np.zeros((0, 0), dtype=np.float32)
+        with self._writing():
+            self._save(embeddings, entries)
+
+    def compact(self, modules):
+        """
+        Sync the index with the current modules without re-embedding everything:
+        drops rows for modules that no longer exist and embeds the ones that are missing or whose
+        summary changed since they were indexed (each entry keeps the summary its vector was built from).
+        """
+        modules = list(modules)
+        self.reload_if_changed()
+        indexed = {entry["module_id"]: entry for entry in self.snapshot[1]}
+        current_ids = {int(module_id) for module_id, _, _ in modules}
+        self.remove(indexed.keys() - current_ids)
+        self.upsert(
+            (module_id, module_name, summary) for module_id, module_name, summary in modules
+            if int(module_id) not in indexed
+            or indexed[int(module_id)]["summary"] != summary
+            or indexed[int(module_id)]["module_name"] != module_name
+        )
+
+    def flush(self):
+        """
+        Write every queued upsert and removal with one embedding pass and one rewrite of the index files.
+        If that fails the changes go back on the queue (behind anything queued since) and the error is raised.
+        """
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+            self.flush_scheduled = False
+        try:
+            modules = [module for module in pending.values() if module is not None]
+            removed_ids = {module_id for module_id, module in pending.items() if module is None}
+            vectors = self.encode(summary for _, _, summary in modules) if modules else None
+            self._write_changes(modules, vectors, removed_ids)
+        except Exception:
+            with self.pending_lock:
+                self.pending = {**pending, **self.pending}
+            raise
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            with self.pending_lock:
+                self.flush_failures += 1
+                delay = min(FLUSH_RETRY_BASE_SECONDS * 2 ** (self.flush_failures - 1), FLUSH_RETRY_MAX_SECONDS)
+                # the retry timer owns the next flush, new changes just join the queue until then
+                self.flush_scheduled = True
+                queued = len(self.pending)
+            print(f"Error updating recommendation index, retrying {queued} changes in {delay:g}s: {e}")
+            timer = Timer(delay, self._submit_flush)
+            timer.daemon = True
+            timer.start()
+        else:
+            with self.pending_lock:
+                self.flush_failures = 0
+
+    def _submit_flush(self):
+        self.executor.submit(self._flush_in_background)
+
+    def _queue(self, changes):
+        with self.pending_lock:
+            self.pending.update(changes)
+            # changes queued while a flush runs are picked up by the next one
+            if self.flush_scheduled or not self.pending:
+                return
+            self.flush_scheduled = True
+        self._submit_flush()
+
+    def upsert_async(self, modules):
+        self._queue({int(module_id): (int(module_id), module_name, summary) for module_id, module_name, summary in modules})
+
+    def remove_async(self, module_ids):
+        self._queue({int(module_id): None for module_id in module_ids})
@@ -1,7 +1,5 @@
 import os
 import re
-import base64
-import urllib.request
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
@@ -10,6 +8,14 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak,
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import mm
+from core.image_fetcher import ImageFetcher
+
+IMAGE_PATTERN = r'!\[(.*?)\]'
+IMAGE_REFERENCE_PATTERN = r'image-(\d+)-(\d+)'
+# rendered size of an embedded image in points, and the resolution it is downsampled to
+IMAGE_WIDTH = 300
+IMAGE_HEIGHT = 200
+IMAGE_DPI = int(os.getenv("PDF_IMAGE_DPI", 150))
 
 class MarkdownPdfGenerator:
     def __init__(self):
@@ -20,6 +26,8 @@ class MarkdownPdfGenerator:
         # Removed logo image as per requirements.
         # self.logo_path = os.path.join(self.current_dir, 'logo', 'logo.png')
 
+        self.image_fetcher = ImageFetcher()
+
         # Register fonts
         pdfmetrics.registerFont(TTFont(self.heading_font_name, self.dejavu_sans_path))
         pdfmetrics.registerFont(TTFont(self.normal_font_name, self.dejavu_sans_path))
@@ -50,60 +58,55 @@ class MarkdownPdfGenerator:
         text = "Page %d" % page_num
         canvas.drawRightString(200 * mm, 20 * mm, text)
 
-    def markdown_to_flowables(self, markdown_text, image_list=None):
+    @staticmethod
+    def referenced_image(identifier, image_list):
+        """The image_list entry an ![image-<submoduleIndex>-<imageIndex>] reference points to, or None."""
+        m = re.match(IMAGE_REFERENCE_PATTERN, identifier)
+        if not m or not image_list:
+            return None
+        try:
+            return image_list[int(m.group(1))][int(m.group(2))]
+        except (IndexError, TypeError):
+            return None
+
+    def prefetch_images(self, markdown_texts, image_list):
+        """
+        Load every image referenced by the markdown texts in one concurrent pass, downsampled to the
+        rendered size at IMAGE_DPI. Returns {image value: encoded bytes or None when it could not be loaded}.
+        """
+        sources = []
+        for markdown_text in markdown_texts:
+            for identifier in re.findall(IMAGE_PATTERN, markdown_text):
+                image_value = self.referenced_image(identifier, image_list)
+                if image_value:
+                    sources.append(image_value)
+        max_size = (IMAGE_WIDTH * IMAGE_DPI // 72, IMAGE_HEIGHT * IMAGE_DPI // 72)
+        return self.image_fetcher.prefetch(sources, max_size)
+
+    def markdown_to_flowables(self, markdown_text, image_list=None, images=None):
         """
         Process markdown text line-by-line and convert to ReportLab flowables.
         Supports image markdown of the form ![image-<submoduleIndex>-<imageIndex>].
         The image_list parameter should be a list of lists. Each image value can be either:
           - a base64 data URL (starting with "data:image") or 
           - an HTTP URL (or a file path).
+        images is the result of prefetch_images; it is computed for this text alone when not given.
         """
         flowables = []
         lines = markdown_text.split('\n')
-        image_pattern = r'!\[(.*?)\]'
+        if images is None:
+            images = self.prefetch_images([markdown_text], image_list)
 
         for idx, line in enumerate(lines):
             # Look for image markdown in the line.
-            image_match = re.search(image_pattern, line)
+            image_match = re.search(IMAGE_PATTERN, line)
             if image_match:
-                identifier = image_match.group(1)
-                # Expecting a pattern like "image-0-0"
-                m = re.match(r'image-(\d+)-(\d+)', identifier)
-                if m and image_list:
-                    submoduleIndex = int(m.group(1))
-                    imageIndex = int(m.group(2))
-                    image_value = None
-                    try:
-                        image_value = image_list[submoduleIndex][imageIndex]
-                    except (IndexError, TypeError):
-                        image_value = None
-                    if image_value:
-                        # Check if image_value is base64 or a URL/file path.
-                        if image_value.startswith("data:image"):
-                            try:
-                                header, base64_data = image_value.split(',', 1)
-                                image_data = base64.b64decode(base64_data)
-                                image_file = BytesIO(image_data)
-                                flowables.append(Image(image_file, width=300, height=200))
-                            except Exception as e:
-                                # If decoding fails, skip the image.
-                                pass
-                        elif image_value.startswith("http"):
-                            try:
-                                with urllib.request.urlopen(image_value) as u:
-                                    image_data = u.read()
-                                image_file = BytesIO(image_data)
-                                flowables.append(Image(image_file, width=300, height=200))
-                            except Exception as e:
-                                # If downloading fails, skip the image.
-                                pass
-                        else:
-                            # Assume it's a local file path.
-                            try:
-                                flowables.append(Image(image_value, width=300, height=200))
-                            except Exception as e:
-                                pass
-                        continue  # Skip further processing of this line
+                image_value = self.referenced_image(image_match.group(1), image_list)
+                if image_value:
+                    # Images that failed to load are skipped.
+                    if images.get(image_value):
+                        flowables.append(Image(BytesIO(images[image_value]), width=IMAGE_WIDTH, height=IMAGE_HEIGHT))
+                    continue  # Skip further processing of this line
 
             # Process headings and formatting similar to your React logic.
             if line.startswith('## '):
@@ -154,6 +157,9 @@ class MarkdownPdfGenerator:
             Spacer(1, 12)
         ]
         
+        images = self.prefetch_images(
+            [markdown_text for module in submodules for markdown_text in module.values()], image_list)
+
         first = True
         for module in submodules:
             if not first:
@@ -161,7 +167,7 @@ class MarkdownPdfGenerator:
             first = False
             for submodule_title, markdown_text in module.items():
                 # content.append(Paragraph(submodule_title, self.styles['Heading2']))
-                content.extend(self.markdown_to_flowables(markdown_text, image_list))
+                content.extend(self.markdown_to_flowables(markdown_text, image_list, images))
                 content.append(Spacer(1, 12))
         
         pdf.build(content, onFirstPage=self.add_page_number, onLaterPages=self.add_page_number)
@@ -0,0 +1,545 @@
+import logging
+import math
+import re
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+DAY_ALIASES = {day.lower()[:3]: day for day in DAYS}
+TIME_PATTERN = re.compile(r"(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?", re.IGNORECASE)
+RANGE_PATTERN = re.compile(
+    r"(\d{1,2}(?:[:.]\d{2})?\s*(?:am|pm)?)\s*(?:-|–|to)\s*(\d{1,2}(?:[:.]\d{2})?\s*(?:am|pm)?)", re.IGNORECASE)
+
+# soft-constraint weights, per hour of a session
+OUTSIDE_PREFERRED_PENALTY = 3.0
+SAME_SUBJECT_SAME_DAY_PENALTY = 4.0
+CLASS_DAY_LOAD_PENALTY = 0.5
+TEACHER_DAY_LOAD_PENALTY = 0.25
+LATE_SLOT_PENALTY = 0.01
+# re-solves: moving a session away from where the previous timetable had it
+MOVE_PENALTY = 25.0
+
+logger = logging.getLogger(__name__)
+
+
+class TimetableInfeasible(ValueError):
+    """The hard constraints cannot all be met with the given teachers, rooms and timings."""
+
+
+class TimetableValidationError(RuntimeError):
+    """The solver produced an assignment that breaks a hard constraint; a solver bug, not bad input."""
+
+
+def parse_time(value):
+    """Minutes since midnight for "9", "09:00", "9.30" or "2:00 pm"."""
+    match = TIME_PATTERN.fullmatch(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid time: {value}")
+    hours = int(match.group(1))
+    minutes = int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower()
+    if meridiem == "pm" and hours < 12:
+        hours += 12
+    elif meridiem == "am" and hours == 12:
+        hours = 0
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"Invalid time: {value}")
+    return hours * 60 + minutes
+
+
+def format_time(minutes):
+    """"HH:MM" for minutes since midnight."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_times(start_time, end_time):
+    """(start, end) minutes of each 1-hour slot from start_time; a last partial hour before end_time is dropped."""
+    day_start = parse_time(start_time)
+    day_end = parse_time(end_time)
+    return [(day_start + 60 * i, day_start + 60 * (i + 1)) for i in range(max(0, (day_end - day_start) // 60))]
+
+
+def parse_preferred_slot(text, day_start, day_end):
+    """
+    Turn a free-text preference such as "9:00-10:30", "Mon, Wed 14:00-16:00" or "morning"
+    into (days or None for every day, [(start, end) minute ranges]). Returns None when nothing is recognised.
+    """
+    text = str(text or "").lower()
+    days = {DAY_ALIASES[word[:3]] for word in re.findall(r"[a-z]+", text) if word[:3] in DAY_ALIASES}
+    ranges = []
+    for start, end in RANGE_PATTERN.findall(text):
+        try:
+            ranges.append((parse_time(start), parse_time(end)))
+        except ValueError:
+            continue
+    if "morning" in text:
+        ranges.append((day_start, 12 * 60))
+    if "afternoon" in text:
+        ranges.append((12 * 60, day_end))
+    if not ranges and not days:
+        return None
+    return (days or None), (ranges or [(day_start, day_end)])
+
+
+class Session:
+    """One lecture (1 slot) or lab (2 consecutive slots) of a subject for a class."""
+    __slots__ = ("index", "class_name", "subject", "teacher", "length", "lab")
+
+    def __init__(self, index, class_name, subject, teacher, length, lab=None):
+        self.index = index
+        self.class_name = class_name
+        self.subject = subject
+        self.teacher = teacher
+        self.length = length
+        self.lab = lab
+
+
+class TimetableSolver:
+    """
+    Deterministic weekly timetable scheduler for the /teacher/timetable inputs.
+    Hard constraints (always met, or TimetableInfeasible is raised):
+      - a teacher, a class and a lab are never booked twice in the same slot
+      - at most len(classrooms) theory lectures run in the same slot, each in its own classroom
+      - every subject gets hours_per_week hours for each class that takes it
+      - lab subjects run in their designated lab in 2-slot sessions (an odd last hour is a 1-slot lab)
+    Soft constraints: teachers' preferred slots, spreading a subject over the week and balanced days.
+    Sessions are placed most-constrained first at their best-scoring free position; a session with no free
+    position evicts a single blocking session that can be moved elsewhere. A few hill-climbing passes then
+    move sessions to better positions. There is no randomness, so the same input gives the same timetable.
+    unavailable_slots ({teacher: "Mon 9:00-11:00"}) are hard: the teacher is never scheduled there.
+    Given a previous timetable, the solve is warm-started: sessions keep their teacher, slot and room whenever
+    those are still valid, and moving one costs MOVE_PENALTY, so only what the change forces is rescheduled.
+    """
+    def __init__(self, teachers_subjects, classes_subjects, hours_per_week, preferred_slots, classrooms, labs,
+                 lab_requirements, theory_requirements, start_time, end_time, days=DAYS, improvement_rounds=3,
+                 unavailable_slots=None, previous=None):
+        self.teachers_subjects = teachers_subjects or {}
+        self.classes_subjects = classes_subjects or {}
+        self.hours_per_week = hours_per_week or {}
+        self.classrooms = list(dict.fromkeys(classrooms or []))
+        self.labs = list(dict.fromkeys(labs or []))
+        self.lab_requirements = lab_requirements or {}
+        self.theory_requirements = set(theory_requirements or [])
+        self.days = list(days)
+        self.improvement_rounds = improvement_rounds
+
+        day_start = parse_time(start_time)
+        day_end = parse_time(end_time)
+        self.slot_times = slot_times(start_time, end_time)
+        num_slots = len(self.slot_times)
+        if num_slots <= 0:
+            raise TimetableInfeasible(f"The day from {start_time} to {end_time} has no full 1-hour slot")
+        self.num_slots = num_slots
+
+        self.preferences = {}
+        for teacher, text in (preferred_slots or {}).items():
+            preference = parse_preferred_slot(text, day_start, day_end)
+            if preference is None:
+                logger.info("Ignoring unrecognised preferred slot for %s: %s", teacher, text)
+            else:
+                self.preferences[teacher] = preference
+        self.unavailable = {}
+        for teacher, text in (unavailable_slots or {}).items():
+            blocked = parse_preferred_slot(text, day_start, day_end)
+            if blocked is None:
+                raise ValueError(f"Unrecognised unavailable slot for {teacher}: {text}")
+            self.unavailable[teacher] = {
+                (day, slot) for day in range(len(self.days)) for slot in range(num_slots)
+                if self.in_ranges(blocked, day, slot)
+            }
+
+        self.previous_cells = self.read_previous(previous) if previous else {}
+        self.sessions = self.build_sessions()
+        self.previous_position = self.match_previous()
+        self.check_capacity()
+        self.reset()
+
+    def build_sessions(self):
+        teachers_by_subject = {}
+        for teacher in sorted(self.teachers_subjects):
+            for subject in self.teachers_subjects[teacher] or []:
+                teachers_by_subject.setdefault(subject, []).append(teacher)
+
+        sessions = []
+        teacher_hours = {teacher: 0 for teacher in self.teachers_subjects}
+        for class_name in sorted(self.classes_subjects):
+            for subject in self.classes_subjects[class_name] or []:
+                hours = int(math.ceil(float(self.hours_per_week.get(subject) or 0)))
+                if hours <= 0:
+                    logger.info("No hours per week for %s, it is not scheduled for %s", subject, class_name)
+                    continue
+                candidates = teachers_by_subject.get(subject)
+                if not candidates:
+                    raise TimetableInfeasible(f"No teacher teaches {subject} for class {class_name}")
+                # keep the previous teacher on a re-solve, otherwise spread classes of a subject taught by
+                # several teachers over the least loaded of them
+                previous_teacher = self.previous_teacher(class_name, subject)
+                if previous_teacher in candidates:
+                    teacher = previous_teacher
+                else:
+                    teacher = min(candidates, key=lambda name: (teacher_hours[name], name))
+                teacher_hours[teacher] += hours
+
+                lab = self.lab_requirements.get(subject)
+                if lab:
+                    lengths = [2] * (hours // 2) + [1] * (hours % 2)
+                else:
+                    if not self.classrooms:
+                        raise TimetableInfeasible(f"{subject} for class {class_name} needs a classroom, none were given")
+                    lengths = [1] * hours
+                for length in lengths:
+                    sessions.append(Session(len(sessions), class_name, subject, teacher, length, lab))
+        return sessions
+
+    def check_capacity(self):
+        """Fail fast with a readable reason when a teacher, class, lab or the classrooms are over-booked."""
+        week_slots = len(self.days) * self.num_slots
+        totals = {}
+        for session in self.sessions:
+            for key in (("Teacher", session.teacher), ("Class", session.class_name),
+                        ("Lab", session.lab) if session.lab else ("Classrooms", None)):
+                totals[key] = totals.get(key, 0) + session.length
+        for (kind, name), hours in sorted(totals.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            capacity = week_slots * (len(self.classrooms) if kind == "Classrooms" else 1)
+            if hours > capacity:
+                label = "The classrooms" if kind == "Classrooms" else f"{kind} {name}"
+                raise TimetableInfeasible(f"{label} would need {hours} hours but the week only has {capacity}")
+
+        doubles = {}
+        for session in self.sessions:
+            if session.length == 2:
+                doubles[session.lab] = doubles.get(session.lab, 0) + 1
+        for lab, count in sorted(doubles.items()):
+            capacity = len(self.days) * (self.num_slots // 2)
+            if count > capacity:
+                raise TimetableInfeasible(
+                    f"Lab {lab} would need {count} 2-hour sessions but the week only fits {capacity}")
+
+    def read_previous(self, previous):
+        """{(class, subject): {(day, slot): (room, teacher)}} from a timetable returned by to_json()."""
+        day_index = {day.lower(): i for i, day in enumerate(self.days)}
+        cells = {}
+        for key, slots in (previous.get("Classes") or {}).items():
+            day, _, class_name = key.partition("_")
+            if day.lower() not in day_index:
+                continue
+            for slot, entry in enumerate(slots or []):
+                if slot < self.num_slots and entry and len(entry) == 3:
+                    room, teacher, subject = entry
+                    cells.setdefault((class_name, subject), {})[(day_index[day.lower()], slot)] = (room, teacher)
+        return cells
+
+    def previous_teacher(self, class_name, subject):
+        cells = self.previous_cells.get((class_name, subject))
+        if not cells:
+            return None
+        return min(cells.values(), key=lambda room_teacher: str(room_teacher[1]))[1]
+
+    def match_previous(self):
+        """Give each session a previous (day, slot) of its class and subject that it covers exactly."""
+        free = {key: set(cells) for key, cells in self.previous_cells.items()}
+        matched = {}
+        for session in sorted(self.sessions, key=lambda s: (-s.length, s.index)):
+            cells = free.get((session.class_name, session.subject))
+            if not cells:
+                continue
+            for day, slot in sorted(cells):
+                covered = self.cells(session, day, slot)
+                if all(cell in cells for cell in covered):
+                    cells.difference_update(covered)
+                    matched[session.index] = (day, slot)
+                    break
+        return matched
+
+    def reset(self):
+        self.position = {}
+        self.teacher_busy = {}
+        self.class_busy = {}
+        self.lab_busy = {}
+        self.classroom_load = {}
+        self.subject_days = {}
+        self.class_day_load = {}
+        self.teacher_day_load = {}
+
+    def cells(self, session, day, slot):
+        return [(day, slot + offset) for offset in range(session.length)]
+
+    def is_free(self, session, day, slot):
+        if slot + session.length > self.num_slots:
+            return False
+        for cell in self.cells(session, day, slot):
+            if cell in self.teacher_busy.get(session.teacher, {}) or cell in self.class_busy.get(session.class_name, {}):
+                return False
+            if cell in self.unavailable.get(session.teacher, ()):
+                return False
+            if session.lab:
+                if cell in self.lab_busy.get(session.lab, {}):
+                    return False
+            elif self.classroom_load.get(cell, 0) >= len(self.classrooms):
+                return False
+        return True
+
+    def blockers(self, session, day, slot):
+        """Sessions that keep session out of (day, slot); None when a full classroom slot blocks it."""
+        if slot + session.length > self.num_slots:
+            return None
+        blocking = set()
+        for cell in self.cells(session, day, slot):
+            if cell in self.unavailable.get(session.teacher, ()):
+                return None
+            for busy in (self.teacher_busy.get(session.teacher, {}), self.class_busy.get(session.class_name, {}),
+                         self.lab_busy.get(session.lab, {}) if session.lab else {}):
+                if cell in busy:
+                    blocking.add(busy[cell])
+            if not session.lab and self.classroom_load.get(cell, 0) >= len(self.classrooms):
+                return None
+        return blocking
+
+    def place(self, session, day, slot):
+        self.position[session.index] = (day, slot)
+        for cell in self.cells(session, day, slot):
+            self.teacher_busy.setdefault(session.teacher, {})[cell] = session.index
+            self.class_busy.setdefault(session.class_name, {})[cell] = session.index
+            if session.lab:
+                self.lab_busy.setdefault(session.lab, {})[cell] = session.index
+            else:
+                self.classroom_load[cell] = self.classroom_load.get(cell, 0) + 1
+        key = (session.class_name, session.subject, day)
+        self.subject_days[key] = self.subject_days.get(key, 0) + 1
+        self.class_day_load[(session.class_name, day)] = self.class_day_load.get((session.class_name, day), 0) + session.length
+        self.teacher_day_load[(session.teacher, day)] = self.teacher_day_load.get((session.teacher, day), 0) + session.length
+
+    def remove(self, session):
+        day, slot = self.position.pop(session.index)
+        for cell in self.cells(session, day, slot):
+            del self.teacher_busy[session.teacher][cell]
+            del self.class_busy[session.class_name][cell]
+            if session.lab:
+                del self.lab_busy[session.lab][cell]
+            else:
+                self.classroom_load[cell] -= 1
+        self.subject_days[(session.class_name, session.subject, day)] -= 1
+        self.class_day_load[(session.class_name, day)] -= session.length
+        self.teacher_day_load[(session.teacher, day)] -= session.length
+        return day, slot
+
+    def is_preferred(self, teacher, day, slot):
+        preference = self.preferences.get(teacher)
+        return preference is None or self.in_ranges(preference, day, slot)
+
+    def in_ranges(self, parsed_slot, day, slot):
+        days, ranges = parsed_slot
+        if days is not None and self.days[day] not in days:
+            return False
+        start, end = self.slot_times[slot]
+        middle = (start + end) / 2
+        return any(range_start <= middle <= range_end for range_start, range_end in ranges)
+
+    def score(self, session, day, slot):
+        """Soft-constraint cost of putting a (currently unplaced) session at (day, slot); lower is better."""
+        cost = 0.0
+        for _, cell_slot in self.cells(session, day, slot):
+            if not self.is_preferred(session.teacher, day, cell_slot):
+                cost += OUTSIDE_PREFERRED_PENALTY
+        cost += SAME_SUBJECT_SAME_DAY_PENALTY * self.subject_days.get((session.class_name, session.subject, day), 0)
+        cost += CLASS_DAY_LOAD_PENALTY * self.class_day_load.get((session.class_name, day), 0)
+        cost += TEACHER_DAY_LOAD_PENALTY * self.teacher_day_load.get((session.teacher, day), 0)
+        cost += LATE_SLOT_PENALTY * slot
+        previous = self.previous_position.get(session.index)
+        if previous is not None and previous != (day, slot):
+            cost += MOVE_PENALTY
+        return cost
+
+    def positions(self):
+        return [(day, slot) for day in range(len(self.days)) for slot in range(self.num_slots)]
+
+    def best_free_position(self, session, exclude=None):
+        best = None
+        for day, slot in self.positions():
+            if (day, slot) != exclude and self.is_free(session, day, slot):
+                candidate = (self.score(session, day, slot), day, slot)
+                if best is None or candidate < best:
+                    best = candidate
+        return best
+
+    def place_best(self, session):
+        best = self.best_free_position(session)
+        if best is not None:
+            self.place(session, best[1], best[2])
+            return True
+        return self.place_by_eviction(session)
+
+    def place_by_eviction(self, session):
+        """Take a position held by exactly one other session, if that session fits somewhere else."""
+        candidates = []
+        for day, slot in self.positions():
+            blocking = self.blockers(session, day, slot)
+            if blocking is not None and len(blocking) == 1:
+                candidates.append((self.score(session, day, slot), day, slot, next(iter(blocking))))
+        for _, day, slot, blocker_index in sorted(candidates):
+            blocker = self.sessions[blocker_index]
+            old_day, old_slot = self.remove(blocker)
+            if self.is_free(session, day, slot):
+                self.place(session, day, slot)
+                moved = self.best_free_position(blocker, exclude=(old_day, old_slot))
+                if moved is not None:
+                    self.place(blocker, moved[1], moved[2])
+                    return True
+                self.remove(session)
+            self.place(blocker, old_day, old_slot)
+        return False
+
+    def placement_order(self):
+        teacher_hours = {}
+        class_hours = {}
+        for session in self.sessions:
+            teacher_hours[session.teacher] = teacher_hours.get(session.teacher, 0) + session.length
+            class_hours[session.class_name] = class_hours.get(session.class_name, 0) + session.length
+        return sorted(self.sessions, key=lambda session: (
+            -session.length, session.lab is None, -teacher_hours[session.teacher],
+            -class_hours[session.class_name], session.class_name, session.subject, session.index))
+
+    def improve(self, sessions=None):
+        """Hill-climb: move each session to its best free position while that lowers the total cost."""
+        sessions = sessions if sessions is not None else self.sessions
+        for _ in range(self.improvement_rounds):
+            moved = False
+            for session in sessions:
+                day, slot = self.remove(session)
+                current = (self.score(session, day, slot), day, slot)
+                best = self.best_free_position(session)
+                if best is not None and best[0] < current[0] - 1e-9:
+                    self.place(session, best[1], best[2])
+                    moved = True
+                else:
+                    self.place(session, day, slot)
+            if not moved:
+                break
+
+    def solve(self):
+        """Schedule every session and return the timetable JSON consumed by timetable_excel_bytes."""
+        if self.previous_position:
+            try:
+                self.place_all(warm_start=True)
+            except TimetableInfeasible:
+                # the change doesn't fit around the kept sessions; place everything again, still guided by
+                # MOVE_PENALTY towards the previous slots
+                logger.info("Warm start could not place every session, re-solving from scratch")
+                self.place_all(warm_start=False)
+        else:
+            self.place_all(warm_start=False)
+        self.improve()
+        self.validate()
+        return self.to_json()
+
+    def place_all(self, warm_start):
+        self.reset()
+        pending = []
+        for session in self.placement_order():
+            # warm start: sessions go back where they were first, unless the change made that invalid
+            previous = self.previous_position.get(session.index)
+            if warm_start and previous is not None and self.is_free(session, *previous):
+                self.place(session, *previous)
+            else:
+                pending.append(session)
+        for session in pending:
+            if not self.place_best(session):
+                raise TimetableInfeasible(
+                    f"Could not fit a {session.length}-hour {session.subject} session for class {session.class_name} "
+                    f"(teacher {session.teacher}) without a conflict")
+
+    def validate(self):
+        """Re-check every hard constraint on the final assignment, raising TimetableValidationError."""
+        def check(condition, message):
+            if not condition:
+                raise TimetableValidationError(f"Generated timetable is invalid: {message}")
+
+        teacher_cells, class_cells, lab_cells, classroom_cells = set(), set(), set(), {}
+        hours = {}
+        for session in self.sessions:
+            day, slot = self.position[session.index]
+            check(slot + session.length <= self.num_slots, f"{session.subject} for {session.class_name} runs past the day")
+            for cell in self.cells(session, day, slot):
+                for key, cells in (((session.teacher, cell), teacher_cells), ((session.class_name, cell), class_cells)):
+                    check(key not in cells, f"double booking {key}")
+                    cells.add(key)
+                if session.lab:
+                    check((session.lab, cell) not in lab_cells, f"lab double booking {session.lab} {cell}")
+                    lab_cells.add((session.lab, cell))
+                else:
+                    classroom_cells[cell] = classroom_cells.get(cell, 0) + 1
+                    check(classroom_cells[cell] <= len(self.classrooms), f"no classroom free at {cell}")
+            key = (session.class_name, session.subject)
+            hours[key] = hours.get(key, 0) + session.length
+        for class_name, subjects in self.classes_subjects.items():
+            for subject in subjects or []:
+                expected = int(math.ceil(float(self.hours_per_week.get(subject) or 0)))
+                check(hours.get((class_name, subject), 0) == expected, f"{class_name} {subject} hours")
+
+    def slot_label(self, slot):
+        start, end = self.slot_times[slot]
+        return f"{format_time(start)}-{format_time(end)}"
+
+    def diff(self, previous, current):
+        """Class slots whose [room, teacher, subject] differ between two timetables, in day and slot order."""
+        previous_classes = (previous or {}).get("Classes") or {}
+        current_classes = current.get("Classes") or {}
+        changes = []
+        for day in self.days:
+            prefix = f"{day.lower()}_"
+            class_names = sorted({key[len(prefix):] for key in list(previous_classes) + list(current_classes)
+                                  if key.startswith(prefix)})
+            for class_name in class_names:
+                before_slots = previous_classes.get(prefix + class_name) or []
+                after_slots = current_classes.get(prefix + class_name) or []
+                for slot in range(self.num_slots):
+                    before = list(before_slots[slot]) if slot < len(before_slots) else []
+                    after = list(after_slots[slot]) if slot < len(after_slots) else []
+                    if before != after:
+                        changes.append({"day": day, "class": class_name, "slot": slot, "time": self.slot_label(slot),
+                                        "before": before, "after": after})
+        return changes
+
+    def room_assignment(self):
+        """Give each theory lecture a classroom, keeping a class in the same room whenever it is free."""
+        class_names = sorted(self.classes_subjects)
+        home = {name: self.classrooms[i % len(self.classrooms)] for i, name in enumerate(class_names)} if self.classrooms else {}
+        by_cell = {}
+        for session in self.sessions:
+            if not session.lab:
+                by_cell.setdefault(self.position[session.index], []).append(session)
+        rooms = {}
+        for cell, sessions in by_cell.items():
+            taken = set()
+            pending = []
+            for session in sorted(sessions, key=lambda s: s.class_name):
+                # on a re-solve an unmoved lecture keeps its previous room
+                previous = self.previous_cells.get((session.class_name, session.subject), {}).get(cell)
+                for room in ([previous[0]] if previous else []) + [home[session.class_name]]:
+                    if room in self.classrooms and room not in taken:
+                        rooms[session.index] = room
+                        taken.add(room)
+                        break
+                else:
+                    pending.append(session)
+            free_rooms = [room for room in self.classrooms if room not in taken]
+            for session, room in zip(pending, free_rooms):
+                rooms[session.index] = room
+        return rooms
+
+    def to_json(self):
+        rooms = self.room_assignment()
+        teachers = {}
+        classes = {}
+        for day in self.days:
+            for teacher in sorted(self.teachers_subjects):
+                teachers[f"{day.lower()}_{teacher}"] = [[] for _ in range(self.num_slots)]
+            for class_name in sorted(self.classes_subjects):
+                classes[f"{day.lower()}_{class_name}"] = [[] for _ in range(self.num_slots)]
+        for session in self.sessions:
+            day, slot = self.position[session.index]
+            room = session.lab or rooms[session.index]
+            day_name = self.days[day].lower()
+            for _, cell_slot in self.cells(session, day, slot):
+                teachers.setdefault(f"{day_name}_{session.teacher}", [[] for _ in range(self.num_slots)])[cell_slot] = \
+                    [room, session.class_name, session.subject]
+                classes[f"{day_name}_{session.class_name}"][cell_slot] = [room, session.teacher, session.subject]
+        return {"teachers": teachers, "Classes": classes}
@@ -0,0 +1,15 @@
+import os
+
+# Production socket.io worker:
+#   SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 PORT=5001 gunicorn -c gunicorn.conf.py app:app
+# Socket.IO needs sticky sessions and gunicorn cannot route by client, so each gunicorn process runs a
+# single gevent worker (which still serves thousands of websockets). To scale out, start one process per
+# port and put a load balancer with sticky sessions (e.g. nginx ip_hash) in front; the shared message
+# queue delivers room emits across all of them.
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = 1
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
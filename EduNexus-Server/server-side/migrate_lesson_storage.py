@@ -0,0 +1,9 @@
+from server.mongo import mongodb, ensure_indexes
+from server.lesson_store import LessonStore, migrate_course_lessons
+
+# One-time move from json.dumps strings to native documents, safe to re-run:
+#   python migrate_lesson_storage.py
+ensure_indexes()
+lessons_migrated = LessonStore(mongodb).migrate()
+courses_migrated = migrate_course_lessons(mongodb["course"])
+print(f"\n\n================ MIGRATED {lessons_migrated} LESSONS AND {courses_migrated} COURSES =================\n\n")
@@ -0,0 +1,228 @@
+"""baseline schema
+
+Revision ID: 1a0b5c3e9f21
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a0b5c3e9f21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def create_table(existing, name, *columns):
+    # databases created by db.create_all() before migrations existed already have the tables
+    if name not in existing:
+        op.create_table(name, *columns)
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    create_table(existing, 'user',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('fname', sa.String(length=50), nullable=False),
+        sa.Column('lname', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=50), nullable=False),
+        sa.Column('password', sa.String(length=50), nullable=False),
+        sa.Column('country', sa.String(length=50), nullable=False),
+        sa.Column('state', sa.String(length=50), nullable=False),
+        sa.Column('city', sa.String(length=50), nullable=False),
+        sa.Column('gender', sa.String(length=50), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('interests', sa.String(length=100), nullable=False),
+        sa.Column('college_name', sa.String(length=100), nullable=False),
+        sa.Column('course_name', sa.String(length=50), nullable=False),
+        sa.Column('student_id', sa.LargeBinary(), nullable=False),
+        sa.Column('date_joined', sa.DateTime(), nullable=False),
+        sa.Column('github_id', sa.String(length=50), nullable=False),
+        sa.Column('github_PAT', sa.String(length=150), nullable=False),
+        sa.Column('pic', sa.String(length=550), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.UniqueConstraint('email'),
+    )
+    create_table(existing, 'topic',
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('topic_name', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('topic_id'),
+        sa.UniqueConstraint('topic_name'),
+    )
+    create_table(existing, 'module',
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('module_name', sa.String(length=100), nullable=False),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('websearch', sa.String(length=5), nullable=False),
+        sa.Column('level', sa.String(length=8), nullable=False),
+        sa.Column('summary', sa.String(length=500), nullable=False),
+        sa.Column('submodule_content', sa.JSON(), nullable=True),
+        sa.Column('image_urls', sa.JSON(), nullable=True),
+        sa.Column('video_urls', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['topic_id'], ['topic.topic_id']),
+        sa.PrimaryKeyConstraint('module_id'),
+    )
+    create_table(existing, 'query',
+        sa.Column('query_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('date_search', sa.DateTime(), nullable=False),
+        sa.Column('level', sa.String(length=8), nullable=False),
+        sa.Column('websearch', sa.String(length=5), nullable=False),
+        sa.Column('lang', sa.String(length=4), nullable=False),
+        sa.ForeignKeyConstraint(['topic_id'], ['topic.topic_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('query_id'),
+    )
+    create_table(existing, 'ongoing_module',
+        sa.Column('omid', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('date_started', sa.DateTime(), nullable=False),
+        sa.Column('level', sa.String(length=8), nullable=False),
+        sa.ForeignKeyConstraint(['module_id'], ['module.module_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('omid'),
+    )
+    create_table(existing, 'completed_module',
+        sa.Column('cmid', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('level', sa.String(length=8), nullable=False),
+        sa.Column('date_completed', sa.DateTime(), nullable=True),
+        sa.Column('theory_quiz_score', sa.Integer(), nullable=True),
+        sa.Column('application_quiz_score', sa.Integer(), nullable=True),
+        sa.Column('assignment_score', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['module_id'], ['module.module_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('cmid'),
+    )
+    create_table(existing, 'completed_topics',
+        sa.Column('ctid', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('date_completed', sa.DateTime(), nullable=True),
+        sa.Column('level', sa.String(length=8), nullable=False),
+        sa.Column('remark', sa.String(length=100), nullable=True),
+        sa.ForeignKeyConstraint(['topic_id'], ['topic.topic_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('ctid'),
+    )
+    create_table(existing, 'ProjectsStudent',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_name', sa.String(length=100), nullable=False),
+        sa.Column('github_id', sa.String(length=50), nullable=False),
+        sa.Column('owner_id', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['github_id'], ['user.github_id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(existing, 'user_recommendation',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=50), nullable=True),
+        sa.Column('query_message', sa.String(length=200), nullable=True),
+        sa.Column('recommendations', sa.JSON(), nullable=True),
+        sa.Column('is_stale', sa.Boolean(), nullable=False),
+        sa.Column('date_updated', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    create_table(existing, 'personalized_ongoing_module',
+        sa.Column('omid', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('date_started', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('omid'),
+    )
+    create_table(existing, 'personalized_completed_module',
+        sa.Column('cmid', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('date_completed', sa.DateTime(), nullable=True),
+        sa.Column('theory_quiz_score', sa.Integer(), nullable=True),
+        sa.Column('application_quiz_score', sa.Integer(), nullable=True),
+        sa.Column('assignment_score', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('cmid'),
+    )
+    create_table(existing, 'personalized_module',
+        sa.Column('module_id', sa.Integer(), nullable=False),
+        sa.Column('module_code', sa.String(length=50), nullable=True),
+        sa.Column('module_name', sa.String(length=100), nullable=False),
+        sa.Column('summary', sa.String(length=500), nullable=False),
+        sa.Column('submodule_content', sa.JSON(), nullable=True),
+        sa.Column('image_urls', sa.JSON(), nullable=True),
+        sa.Column('video_urls', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('module_id'),
+        sa.UniqueConstraint('module_code'),
+    )
+    create_table(existing, 'teachers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(length=100), nullable=False),
+        sa.Column('last_name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('college_name', sa.String(length=100), nullable=False),
+        sa.Column('department', sa.String(length=50), nullable=True),
+        sa.Column('experience', sa.Integer(), nullable=True),
+        sa.Column('phone_number', sa.String(length=20), nullable=True),
+        sa.Column('qualification', sa.String(length=200), nullable=True),
+        sa.Column('subjects', sa.String(length=100), nullable=True),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('country', sa.String(length=50), nullable=False),
+        sa.Column('state', sa.String(length=50), nullable=False),
+        sa.Column('city', sa.String(length=50), nullable=False),
+        sa.Column('gender', sa.String(length=50), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('date_joined', sa.DateTime(), nullable=False),
+        sa.Column('github_id', sa.String(length=50), nullable=False),
+        sa.Column('github_PAT', sa.String(length=150), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    create_table(existing, 'courses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('course_name', sa.String(length=200), nullable=False),
+        sa.Column('num_of_lectures', sa.Integer(), nullable=False),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.Column('lessons_data', sa.JSON(), nullable=False),
+        sa.Column('course_code', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('course_code'),
+    )
+    create_table(existing, 'lessons',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('markdown_content', sa.Text(), nullable=True),
+        sa.Column('relevant_images', sa.JSON(), nullable=True),
+        sa.Column('uploaded_images', sa.JSON(), nullable=True),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(existing, 'lab_manuals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.Column('markdown_content', sa.Text(), nullable=False),
+        sa.Column('uploaded_images', sa.JSON(), nullable=True),
+        sa.Column('exp_aim', sa.Text(), nullable=False),
+        sa.Column('exp_number', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    for name in ['lab_manuals', 'lessons', 'courses', 'teachers', 'personalized_module',
+                 'personalized_completed_module', 'personalized_ongoing_module', 'user_recommendation',
+                 'ProjectsStudent', 'completed_topics', 'completed_module', 'ongoing_module', 'query',
+                 'module', 'topic', 'user']:
+        op.drop_table(name)
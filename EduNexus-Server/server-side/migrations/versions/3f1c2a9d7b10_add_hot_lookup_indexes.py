@@ -0,0 +1,37 @@
+"""add indexes for hot lookup columns
+
+Revision ID: 3f1c2a9d7b10
+Revises: 1a0b5c3e9f21
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = '1a0b5c3e9f21'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns) - composite indexes matching the route filters.
+# topic.topic_name is already covered by its unique constraint.
+INDEXES = [
+    ('ix_module_topic_websearch_level', 'module', ['topic_id', 'websearch', 'level']),
+    ('ix_completed_module_user_module_level', 'completed_module', ['user_id', 'module_id', 'level']),
+    ('ix_ongoing_module_user_module', 'ongoing_module', ['user_id', 'module_id']),
+    ('ix_query_user_date_search', 'query', ['user_id', 'date_search']),
+]
+
+
+def upgrade():
+    # databases created by db.create_all() already have these indexes, so only add missing ones
+    for name, table, columns in INDEXES:
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        op.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})')
+
+
+def downgrade():
+    for name, _, _ in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS "{name}"')
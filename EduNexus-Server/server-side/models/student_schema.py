@@ -7,6 +7,9 @@ from sqlalchemy.ext.associationproxy import association_proxy
 
 class Query(db.Model):
     """User Query/Topics"""
+    __table_args__ = (
+        db.Index('ix_query_user_date_search', 'user_id', 'date_search'),
+    )
     query_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'user.user_id'), nullable=False)
@@ -28,6 +31,9 @@ class Query(db.Model):
 
 class OngoingModule(db.Model):
     """Ongoing Module by user"""
+    __table_args__ = (
+        db.Index('ix_ongoing_module_user_module', 'user_id', 'module_id'),
+    )
     omid = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'user.user_id'), nullable=False)
@@ -47,6 +53,9 @@ class OngoingModule(db.Model):
 
 class CompletedModule(db.Model):
     """Completed Modules by user"""
+    __table_args__ = (
+        db.Index('ix_completed_module_user_module_level', 'user_id', 'module_id', 'level'),
+    )
     cmid = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey(
         'user.user_id'), nullable=False)
@@ -153,6 +162,9 @@ class Topic(db.Model):
 
 class Module(db.Model):
     """Modules in the app."""
+    __table_args__ = (
+        db.Index('ix_module_topic_websearch_level', 'topic_id', 'websearch', 'level'),
+    )
     module_id = db.Column(db.Integer, primary_key=True)
     module_name = db.Column(db.String(100), nullable=False)
 
@@ -189,6 +201,21 @@ class Module(db.Model):
         }
 
 
+class UserRecommendation(db.Model):
+    """Precomputed dashboard recommendations for a user"""
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'user.user_id'), primary_key=True)
+    # what the recommendations were computed from, e.g. "query:12" or "interests"
+    source = db.Column(db.String(50), nullable=True)
+    query_message = db.Column(db.String(200), nullable=True)
+    recommendations = db.Column(db.JSON, nullable=True)
+    is_stale = db.Column(db.Boolean, nullable=False, default=True)
+    date_updated = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<user_id={self.user_id} source={self.source} is_stale={self.is_stale} date_updated={self.date_updated}>'
+
+
 class PersonalizedOngoingModule(db.Model):
     """Personalized Ongoing Module by user"""
     omid = db.Column(db.String(50), primary_key=True)
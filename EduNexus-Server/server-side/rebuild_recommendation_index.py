@@ -0,0 +1,18 @@
+from server import create_app
+from models.student_schema import Module
+from server.constants import RECOMMENDATION_GENERATOR
+import sys
+
+# Usage:
+#   python rebuild_recommendation_index.py            re-embed every module (e.g. after changing the model)
+#   python rebuild_recommendation_index.py --compact  drop deleted modules, embed new ones and re-embed changed summaries
+app = create_app()
+
+with app.app_context():
+    all_modules = [(module.module_id, module.module_name, module.summary) for module in Module.query.all()]
+    index = RECOMMENDATION_GENERATOR.index
+    if "--compact" in sys.argv:
+        index.compact(all_modules)
+    else:
+        index.rebuild(all_modules)
+    print(f"\n\n================ RECOMMENDATION INDEX UPDATED: {len(index)} MODULES =================\n\n")
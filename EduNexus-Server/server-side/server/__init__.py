@@ -7,6 +7,9 @@ from flask_migrate import Migrate
 from flask_socketio import SocketIO
 from datetime import timedelta
 from flask import request, session, jsonify, send_file, Blueprint
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import sqlite3
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -15,6 +18,19 @@ socketio = SocketIO(
       # Enable Engine.IO logging
 )
 
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Local SQLite tuning: WAL lets readers run alongside the writer, NORMAL sync is safe under WAL."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
 def create_app():
     app = Flask(__name__)
 
@@ -55,19 +71,26 @@ def create_app():
             "Accept", 
             "Origin"
         ],
-        expose_headers=["Content-Type", "Authorization","Set-Cookie"], # Add others if needed
+        expose_headers=["Content-Type", "Authorization","Set-Cookie", "X-Timetable-Id"], # Add others if needed
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     
 
     db.init_app(app)
     bcrypt.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(
+        app,
+        async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+        message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'],
+        channel=app.config['SOCKETIO_CHANNEL'],
+    )
     migrate = Migrate(app, db)
 
     from server.teacher.routes_mongo import teachers
     from server.student.routes import students
     app.register_blueprint(teachers, url_prefix="/teacher")
     app.register_blueprint(students, url_prefix="/student")
+    from server.mongo import ensure_indexes
+    ensure_indexes()
     from . import socket_handlers
     with app.app_context(): # Ensure we are in app context for session
         # Inside create_app() in server/__init__.py, alongside the test-session-set route
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from io import BytesIO
+from threading import Lock
+from flask import send_file
+
+# one-off downloads are removed once sent (send(remove=True)); the max age only catches those whose request
+# failed before sending. Cache namespaces keep the store-wide max age
+DEFAULT_NAMESPACE_MAX_AGE = {"exports": 3600}
+
+
+class ArtifactStore:
+    """
+    Generated files (exports, cached PDFs and decks) under one root, one directory per namespace.
+      - names are UUIDs for one-off files, content hashes for put_bytes, or caller-chosen cache keys
+      - every file is written to a temp file in its namespace directory and renamed into place, so readers
+        never see partial files
+      - files older than their namespace's max age are evicted, then the least recently used ones until the
+        store is back under ARTIFACT_STORE_MAX_BYTES; files written or touched in the last
+        ARTIFACT_PROTECT_SECONDS are never evicted, so a path handed out by a cache is still there when it is sent
+      - send() serves files up to ARTIFACT_INLINE_MAX_BYTES from memory and streams larger ones
+    stats() reports the bytes and files stored per namespace plus write / eviction / delivery counters.
+    """
+    def __init__(self, root=None, max_bytes=None, max_age_seconds=None, inline_max_bytes=None,
+                 namespace_max_age=None, evict_interval_seconds=60, protect_seconds=None):
+        self.root = root or os.getenv("ARTIFACT_STORE_ROOT") or os.path.join(os.getcwd(), "server", "downloads")
+        self.max_bytes = max_bytes or int(os.getenv("ARTIFACT_STORE_MAX_BYTES", 2 * 1024 ** 3))
+        self.max_age_seconds = max_age_seconds or int(os.getenv("ARTIFACT_STORE_MAX_AGE", 7 * 24 * 3600))
+        self.inline_max_bytes = inline_max_bytes if inline_max_bytes is not None else \
+            int(os.getenv("ARTIFACT_INLINE_MAX_BYTES", 1024 * 1024))
+        self.namespace_max_age = namespace_max_age if namespace_max_age is not None else dict(DEFAULT_NAMESPACE_MAX_AGE)
+        self.evict_interval_seconds = evict_interval_seconds
+        self.protect_seconds = protect_seconds if protect_seconds is not None else \
+            int(os.getenv("ARTIFACT_PROTECT_SECONDS", 300))
+        self.lock = Lock()
+        self.evicted_at = 0
+        self.metrics = {
+            "written_files": 0,
+            "written_bytes": 0,
+            "evicted_files": 0,
+            "evicted_bytes": 0,
+            "inline_deliveries": 0,
+            "streamed_deliveries": 0,
+        }
+
+    def directory(self, namespace):
+        directory = os.path.join(self.root, namespace)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def path(self, namespace, name):
+        """Path of a named artifact, e.g. a cache entry whose name encodes its key."""
+        return os.path.join(self.directory(namespace), name)
+
+    def unique_path(self, namespace, suffix):
+        return self.path(namespace, f"{uuid.uuid4().hex}{suffix}")
+
+    def temp_path(self, namespace, suffix=""):
+        fd, temp_path = tempfile.mkstemp(suffix=f"{suffix}.tmp", dir=self.directory(namespace))
+        os.close(fd)
+        return temp_path
+
+    def commit(self, temp_path, final_path):
+        os.replace(temp_path, final_path)
+        size = os.path.getsize(final_path)
+        with self.lock:
+            self.metrics["written_files"] += 1
+            self.metrics["written_bytes"] += size
+        self.evict()
+        return final_path
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def writing(self, namespace, final_path):
+        """Yield a temp path to write to; it becomes final_path when the block succeeds and is removed otherwise."""
+        temp_path = self.temp_path(namespace, os.path.splitext(final_path)[1])
+        try:
+            yield temp_path
+        except BaseException:
+            self.discard(temp_path)
+            raise
+        self.commit(temp_path, final_path)
+
+    def put_bytes(self, namespace, data, suffix):
+        """Store data under its content hash, so identical artifacts are kept once."""
+        final_path = self.path(namespace, f"{hashlib.sha256(data).hexdigest()}{suffix}")
+        if self.touch(final_path):
+            return final_path
+        with self.writing(namespace, final_path) as temp_path:
+            with open(temp_path, "wb") as temp_file:
+                temp_file.write(data)
+        return final_path
+
+    @staticmethod
+    def touch(path):
+        """
+        Mark a cached artifact as used, which also protects it from eviction for a while.
+        Returns False when the file is gone, e.g. evicted since the caller checked it.
+        """
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def remove_prefixed(self, namespace, prefix, keep=None):
+        directory = self.directory(namespace)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(prefix) and not name.endswith(".tmp") and path != keep:
+                self.discard(path)
+
+    def _files(self):
+        if not os.path.isdir(self.root):
+            return
+        for namespace in os.listdir(self.root):
+            directory = os.path.join(self.root, namespace)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if os.path.isfile(path):
+                    yield namespace, name, path, stat
+
+    def evict(self, force=False):
+        """Drop expired artifacts, then the least recently used ones while the store is over its size limit."""
+        now = time.time()
+        with self.lock:
+            if not force and now - self.evicted_at < self.evict_interval_seconds:
+                return
+            self.evicted_at = now
+
+        evicted_files = 0
+        evicted_bytes = 0
+        remaining = []
+        protected_bytes = 0
+        for namespace, name, path, stat in self._files():
+            max_age = self.namespace_max_age.get(namespace, self.max_age_seconds)
+            if now - stat.st_mtime < self.protect_seconds:
+                # just written or handed out by a cache; counts towards the size but is never evicted
+                protected_bytes += stat.st_size
+                continue
+            # abandoned temp files (e.g. from a timed-out render) go after the same max age
+            if now - stat.st_mtime > max_age:
+                self.discard(path)
+                evicted_files += 1
+                evicted_bytes += stat.st_size
+            elif not name.endswith(".tmp"):
+                remaining.append((stat.st_mtime, stat.st_size, path))
+
+        total = protected_bytes + sum(size for _, size, _ in remaining)
+        if total > self.max_bytes:
+            # go a bit below the limit so the next few writes don't trigger another pass
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(remaining):
+                if total <= target:
+                    break
+                self.discard(path)
+                total -= size
+                evicted_files += 1
+                evicted_bytes += size
+
+        if evicted_files:
+            with self.lock:
+                self.metrics["evicted_files"] += evicted_files
+                self.metrics["evicted_bytes"] += evicted_bytes
+            print(f"Artifact store evicted {evicted_files} files ({evicted_bytes} bytes)")
+
+    def send(self, path, download_name, mimetype=None, remove=False):
+        """
+        send_file for an artifact, from memory when it is small enough.
+        remove=True is for one-off exports nobody reads again: the file is deleted once it has been read into
+        memory, or once the streamed response is closed.
+        """
+        size = os.path.getsize(path)
+        if size <= self.inline_max_bytes:
+            with open(path, "rb") as artifact:
+                data = BytesIO(artifact.read())
+            if remove:
+                self.discard(path)
+            with self.lock:
+                self.metrics["inline_deliveries"] += 1
+            return send_file(data, as_attachment=True, download_name=download_name, mimetype=mimetype)
+        with self.lock:
+            self.metrics["streamed_deliveries"] += 1
+        response = send_file(path, as_attachment=True, download_name=download_name, mimetype=mimetype)
+        if remove:
+            response.call_on_close(lambda: self.discard(path))
+        return response
+
+    def stats(self):
+        namespaces = {}
+        for namespace, _, _, stat in self._files():
+            entry = namespaces.setdefault(namespace, {"files": 0, "bytes": 0})
+            entry["files"] += 1
+            entry["bytes"] += stat.st_size
+        with self.lock:
+            metrics = dict(self.metrics)
+        return {
+            "bytes": sum(entry["bytes"] for entry in namespaces.values()),
+            "files": sum(entry["files"] for entry in namespaces.values()),
+            "max_bytes": self.max_bytes,
+            "namespaces": namespaces,
+            **metrics,
+        }
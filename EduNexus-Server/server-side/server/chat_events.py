@@ -0,0 +1,100 @@
+import os
+import time
+from threading import Lock
+from bson import ObjectId
+from server import socketio
+
+
+def user_room(user_id):
+    """Every socket joins a personal room named after its user id on 'setup'."""
+    return str(user_id)
+
+
+def fan_out_message(message, user_ids):
+    """
+    Deliver a persisted message to every member of its chat exactly once per socket.
+    Emitting to the list of personal rooms lets Socket.IO de-duplicate sockets that are in several of them,
+    and with a message queue configured the emit reaches members connected to other worker processes.
+    """
+    rooms = sorted({user_room(user_id) for user_id in user_ids})
+    if rooms:
+        socketio.emit('message received', message, to=rooms)
+
+
+class ChatSocketRegistry:
+    """
+    Server-side view of this process's sockets: which user each sid belongs to, which chat rooms it joined,
+    and whether it is currently shown as typing. Typing events are coalesced per (sid, room): a 'typing' is
+    forwarded when the user starts typing and then at most once per refresh interval, and a 'stop typing'
+    only when a 'typing' was forwarded before.
+    """
+    def __init__(self, typing_refresh_seconds=None):
+        self.typing_refresh_seconds = typing_refresh_seconds if typing_refresh_seconds is not None else \
+            float(os.getenv("TYPING_REFRESH_SECONDS", 2.5))
+        self.lock = Lock()
+        self.users = {}
+        self.rooms = {}
+        self.typing = {}
+
+    def register(self, sid, user_id):
+        with self.lock:
+            self.users[sid] = str(user_id)
+            self.rooms.setdefault(sid, set())
+
+    def user_of(self, sid):
+        return self.users.get(sid)
+
+    def join(self, sid, room):
+        with self.lock:
+            self.rooms.setdefault(sid, set()).add(room)
+
+    def in_room(self, sid, room):
+        """True when the socket joined the chat room through a membership-checked 'join chat'."""
+        return room in self.rooms.get(sid, ())
+
+    def should_forward_typing(self, sid, room):
+        now = time.monotonic()
+        with self.lock:
+            last = self.typing.get((sid, room))
+            if last is not None and now - last < self.typing_refresh_seconds:
+                return False
+            self.typing[(sid, room)] = now
+            return True
+
+    def should_forward_stop_typing(self, sid, room):
+        with self.lock:
+            return self.typing.pop((sid, room), None) is not None
+
+    def unregister(self, sid):
+        """Forget a disconnected socket, returning (user_id, rooms it was typing in)."""
+        with self.lock:
+            user_id = self.users.pop(sid, None)
+            self.rooms.pop(sid, None)
+            typing_rooms = [room for (typing_sid, room) in self.typing if typing_sid == sid]
+            for room in typing_rooms:
+                del self.typing[(sid, room)]
+        return user_id, typing_rooms
+
+
+def chat_member_id(user_id):
+    """The value chats store in `users` for a user: ObjectId for teachers, int for students, None if neither."""
+    if isinstance(user_id, ObjectId):
+        return user_id
+    if isinstance(user_id, str) and ObjectId.is_valid(user_id):
+        return ObjectId(user_id)
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_chat_member(mongodb, chat_id, user_id):
+    """True when user_id (teacher ObjectId string or student integer id) belongs to the chat."""
+    try:
+        chat_oid = ObjectId(chat_id)
+    except Exception:
+        return False
+    member = chat_member_id(user_id)
+    if member is None:
+        return False
+    return mongodb["chats"].find_one({"_id": chat_oid, "users": member}, {"_id": 1}) is not None
@@ -0,0 +1,163 @@
+import os
+import re
+import socket
+import uuid
+from datetime import datetime, timedelta
+from threading import Lock
+from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
+from server import socketio
+from server.mongo import mongodb
+from server.chat_events import chat_member_id, user_room
+
+
+class ChatState:
+    """
+    Read state and presence for the chat subsystem, kept in Mongo so every worker process sees the same values.
+      - chat_reads: one {user, chat, unread, lastReadAt, lastReadMessage} document per (user, chat),
+        incremented when a message is stored and reset when the user reads the chat
+      - presence: one {_id: user, sids, lastSeen} document per user. Each sid is tagged "<instance>|<sid>" with
+        the id of the worker process holding the socket, and every worker refreshes lastSeen of its users every
+        PRESENCE_HEARTBEAT_SECONDS. A user is online while sids is non-empty and lastSeen is fresh, so the
+        sockets of a crashed or restarted worker (never disconnected) stop counting once its heartbeat stops.
+    Sidebars read both with a single $in query each and get live changes through 'unread update' / 'presence' events.
+    """
+    def __init__(self, mongodb, heartbeat_seconds=None):
+        self.reads_collection = mongodb["chat_reads"]
+        self.presence_collection = mongodb["presence"]
+        self.chats_collection = mongodb["chats"]
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.heartbeat_seconds = heartbeat_seconds or int(os.getenv("PRESENCE_HEARTBEAT_SECONDS", 30))
+        # three missed heartbeats and the worker's sockets are considered gone
+        self.presence_ttl = timedelta(seconds=3 * self.heartbeat_seconds)
+        self.heartbeat_lock = Lock()
+        self.heartbeat_started = False
+
+    def record_message(self, chat_id, message_id, member_ids, sender_id):
+        """Bump the unread counter of every member but the sender and push the new counts to them."""
+        chat_oid = ObjectId(chat_id)
+        sender_key = str(sender_id)
+        now = datetime.now()
+        recipients = [str(member) for member in member_ids if str(member) != sender_key]
+        operations = [
+            UpdateOne({"user": recipient, "chat": chat_oid}, {"$inc": {"unread": 1}}, upsert=True)
+            for recipient in recipients
+        ]
+        # sending a message means the sender has read the chat up to it
+        operations.append(UpdateOne(
+            {"user": sender_key, "chat": chat_oid},
+            {"$set": {"unread": 0, "lastReadAt": now, "lastReadMessage": ObjectId(message_id)}},
+            upsert=True
+        ))
+        self.reads_collection.bulk_write(operations, ordered=False)
+
+        if recipients:
+            for read in self.reads_collection.find(
+                    {"chat": chat_oid, "user": {"$in": recipients}}, {"user": 1, "unread": 1}):
+                socketio.emit('unread update', {"chatId": str(chat_oid), "unreadCount": read.get("unread", 0)},
+                              to=user_room(read["user"]))
+
+    def mark_read(self, chat_id, user_id, message_id=None):
+        """Reset the user's unread counter; callers validate the ids and the user's membership first."""
+        chat_oid = ObjectId(chat_id)
+        update = {"unread": 0, "lastReadAt": datetime.now()}
+        if message_id:
+            update["lastReadMessage"] = ObjectId(message_id)
+        previous = self.reads_collection.find_one_and_update(
+            {"user": str(user_id), "chat": chat_oid},
+            {"$set": update},
+            projection={"unread": 1},
+            upsert=True
+        )
+        if previous and previous.get("unread"):
+            # keep the user's other tabs in sync
+            socketio.emit('unread update', {"chatId": str(chat_oid), "unreadCount": 0}, to=user_room(user_id))
+
+    def unread_counts(self, user_id, chat_ids):
+        """Map str(chat_id) -> unread count for the given chats; chats never read or written count as 0."""
+        chat_oids = [ObjectId(chat_id) for chat_id in chat_ids if ObjectId.is_valid(str(chat_id))]
+        if not chat_oids:
+            return {}
+        return {
+            str(read["chat"]): read.get("unread", 0)
+            for read in self.reads_collection.find(
+                {"user": str(user_id), "chat": {"$in": chat_oids}}, {"chat": 1, "unread": 1})
+        }
+
+    def online_users(self, user_ids):
+        keys = list({str(user_id) for user_id in user_ids})
+        if not keys:
+            return set()
+        return {
+            presence["_id"]
+            for presence in self.presence_collection.find(
+                {"_id": {"$in": keys}, "sids.0": {"$exists": True},
+                 "lastSeen": {"$gte": datetime.now() - self.presence_ttl}}, {"_id": 1})
+        }
+
+    def tagged(self, sid):
+        return f"{self.instance_id}|{sid}"
+
+    def start_heartbeat(self):
+        with self.heartbeat_lock:
+            if self.heartbeat_started:
+                return
+            self.heartbeat_started = True
+        socketio.start_background_task(self.heartbeat)
+
+    def heartbeat(self):
+        """Keep lastSeen fresh for every user with a socket on this worker."""
+        own_sids = {"sids": {"$regex": f"^{re.escape(self.instance_id)}\\|"}}
+        while True:
+            try:
+                self.presence_collection.update_many(own_sids, {"$set": {"lastSeen": datetime.now()}})
+            except Exception as e:
+                print(f"Presence heartbeat failed: {e}")
+            socketio.sleep(self.heartbeat_seconds)
+
+    def connect(self, user_id, sid):
+        """Register a socket for the user, announcing them when it is their first live one."""
+        self.start_heartbeat()
+        now = datetime.now()
+        # a stale document only holds sockets of workers that are gone, start it over
+        self.presence_collection.update_one(
+            {"_id": str(user_id), "lastSeen": {"$lt": now - self.presence_ttl}},
+            {"$set": {"sids": []}}
+        )
+        previous = self.presence_collection.find_one_and_update(
+            {"_id": str(user_id)},
+            {"$addToSet": {"sids": self.tagged(sid)}, "$set": {"lastSeen": now}},
+            projection={"sids": 1},
+            upsert=True
+        )
+        if not previous or not previous.get("sids"):
+            self.announce(user_id, True)
+
+    def disconnect(self, user_id, sid):
+        """Drop a socket, announcing the user as offline once their last socket is gone."""
+        now = datetime.now()
+        current = self.presence_collection.find_one_and_update(
+            {"_id": str(user_id)},
+            {"$pull": {"sids": self.tagged(sid)}, "$set": {"lastSeen": now}},
+            projection={"sids": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if current is not None and not current.get("sids"):
+            self.announce(user_id, False, now)
+
+    def announce(self, user_id, online, last_seen=None):
+        """Tell everyone who shares a chat with the user that their presence changed."""
+        member = chat_member_id(user_id)
+        if member is None:
+            return
+        contacts = {str(contact) for contact in self.chats_collection.distinct("users", {"users": member})}
+        contacts.discard(str(user_id))
+        if contacts:
+            socketio.emit('presence', {
+                "userId": str(user_id),
+                "online": online,
+                "lastSeen": last_seen.isoformat() if last_seen else None,
+            }, to=sorted(user_room(contact) for contact in contacts))
+
+
+CHAT_STATE = ChatState(mongodb)
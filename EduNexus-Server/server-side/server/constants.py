@@ -17,6 +17,16 @@ from core.lesson_planner import LessonPlanner
 from core.skills_analyzer import SkillsAnalyzer
 from core.teacher_pdf_generator import MarkdownPdfGenerator
 from server.utils import AssistantUtils
+from server.recommendation_cache import RecommendationCache
+from server.course_content_cache import CourseContentCache
+from server.lesson_store import LessonStore, LESSON_IMAGE_FIELDS, decode_legacy
+from server.user_directory import UserDirectory
+from server.user_search import UserSearchIndex
+from server.module_pdf_cache import ModulePdfCache
+from server.lesson_ppt_cache import LessonPptCache
+from server.export_service import ExportService, ExportTimeout
+from server.artifact_store import ArtifactStore
+from server.mongo import mongodb
 import os
 
 DEVICE_TYPE = torch.device(  "mps" if torch.backends.mps.is_available() else "cpu")
@@ -33,13 +43,22 @@ MODULE_GENERATOR = ModuleGenerator()
 SUB_MODULE_GENERATOR = SubModuleGenerator()
 CONTENT_GENERATOR = ContentGenerator()
 PDF_GENERATOR = PdfGenerator()
+ARTIFACT_STORE = ArtifactStore()
+EXPORT_SERVICE = ExportService(ARTIFACT_STORE)
+MODULE_PDF_CACHE = ModulePdfCache(EXPORT_SERVICE, ARTIFACT_STORE)
 TEACHER_PDF_GENERATOR = MarkdownPdfGenerator()
 LAB_MANUAL_GENERATOR = LabManualGenerator()
 PPT_GENERATOR = PptGenerator()
+LESSON_PPT_CACHE = LessonPptCache(mongodb, PPT_GENERATOR, EXPORT_SERVICE, ARTIFACT_STORE)
 QUIZ_GENERATOR = QuizGenerator()
 LESSON_PLANNER = LessonPlanner()
 SKILLS_ANALYZER = SkillsAnalyzer()
 RECOMMENDATION_GENERATOR = RecommendationGenerator()
+RECOMMENDATION_CACHE = RecommendationCache(RECOMMENDATION_GENERATOR)
+COURSE_CONTENT_CACHE = CourseContentCache(mongodb)
+LESSON_STORE = LessonStore(mongodb)
+USER_DIRECTORY = UserDirectory(mongodb)
+USER_SEARCH = UserSearchIndex(mongodb)
 EVALUATOR = Evaluator()
 USER_DOCS_PATH = os.path.join('server', 'user_docs')
 AVAILABLE_TOOLS = {
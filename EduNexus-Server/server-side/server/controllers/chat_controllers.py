@@ -1,6 +1,9 @@
 from bson import ObjectId
 from flask import jsonify, request, session
 from ..models.chat_models import ChatModel, MessageModel
+from .message_controllers import encode_cursor, decode_cursor
+from server.chat_state import CHAT_STATE
+from server.chat_events import is_chat_member
 import json
 from datetime import datetime
 from server import socketio
@@ -56,7 +59,42 @@ def get_current_user_id(is_teacher=False):
     else:
         return session.get('user_id')
 
-def access_chat(request, mongodb, is_teacher=False, get_teacher_func=None, get_student_func=None,current_user_id=None):
+def populate_latest_messages(mongodb, chats):
+    """Load the latestMessage of every formatted chat with a single $in query, keyed by message id."""
+    message_ids = [ObjectId(chat['latestMessage']) for chat in chats if chat.get('latestMessage')]
+    if not message_ids:
+        return {}
+    return {str(message['_id']): message for message in mongodb["messages"].find({"_id": {"$in": message_ids}})}
+
+DEFAULT_CHAT_PAGE_SIZE = 30
+MAX_CHAT_PAGE_SIZE = 100
+
+def populate_chats(mongodb, chats, user_directory, latest_messages=None):
+    """
+    Populate users, groupAdmin and latestMessage (with its sender) for a list of formatted chats.
+    latest_messages maps message id -> message document when the caller has already joined them.
+    """
+    if latest_messages is None:
+        latest_messages = populate_latest_messages(mongodb, chats)
+
+    # collect every participant, admin and sender first so they resolve in one batch
+    user_ids = []
+    for chat in chats:
+        user_ids.extend(user_directory.chat_user_ids(chat))
+    user_ids.extend(message.get('sender') for message in latest_messages.values())
+    cards = user_directory.resolve(user_ids)
+
+    for chat in chats:
+        user_directory.populate_chat(chat, cards)
+        message = latest_messages.get(chat.get('latestMessage')) if chat.get('latestMessage') else None
+        if message:
+            sender_card = cards.get(str(message.get('sender')))
+            message = MessageModel.format_message_response(message)
+            message['sender'] = sender_card
+            chat['latestMessage'] = message
+    return chats
+
+def access_chat(request, mongodb, is_teacher=False, user_directory=None, current_user_id=None):
     """Create or access a one-on-one chat"""
     data = request.json
     userId = data.get('userId')
@@ -88,75 +126,8 @@ def access_chat(request, mongodb, is_teacher=False, get_teacher_func=None, get_s
     })
     
     if chat:
-        # Populate users
         populated_chat = ChatModel.format_chat_response(chat)
-        
-        # Populate user details
-        populated_users = []
-        for user_id in populated_chat['users']:
-            user_id_type = get_id_type(user_id)
-            if user_id_type == "ObjectId" or len(user_id) == 24:
-                # Try to find in teachers collection
-                teacher = get_teacher_func(user_id)
-                if teacher:
-                    teacher_data = {
-                        "_id": user_id,
-                        "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                        "email": teacher.get('email', ''),
-                        "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                        "type": "teacher"
-                    }
-                    populated_users.append(teacher_data)
-                    continue
-            
-            # Try to find in students SQL
-            student = get_student_func(user_id)
-            if student:
-                student_data = {
-                    "_id": user_id,
-                    "name": f"{student.fname} {student.lname}",
-                    "email": student.email,
-                    "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                    "type": "student"
-                }
-                populated_users.append(student_data)
-        
-        populated_chat['users'] = populated_users
-        
-        # Populate latest message
-        if 'latestMessage' in populated_chat and populated_chat['latestMessage']:
-            message = mongodb["messages"].find_one({"_id": ObjectId(populated_chat['latestMessage'])})
-            if message:
-                sender_id = message.get('sender')
-                sender_id_type = get_id_type(sender_id)
-                
-                sender = None
-                if sender_id_type == "ObjectId" or (isinstance(sender_id, str) and len(sender_id) == 24):
-                    sender = get_teacher_func(sender_id)
-                    if sender:
-                        sender_data = {
-                            "_id": str(sender_id),
-                            "name": f"{sender.get('first_name', '')} {sender.get('last_name', '')}",
-                            "email": sender.get('email', ''),
-                            "pic": sender.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                            "type": "teacher"
-                        }
-                
-                if not sender:
-                    sender = get_student_func(sender_id)
-                    if sender:
-                        sender_data = {
-                            "_id": str(sender_id),
-                            "name": f"{sender.fname} {sender.lname}",
-                            "email": sender.email,
-                            "pic": sender.pic if sender.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                            "type": "student"
-                        }
-                
-                message = MessageModel.format_message_response(message)
-                message['sender'] = sender_data
-                populated_chat['latestMessage'] = message
-        
+        populate_chats(mongodb, [populated_chat], user_directory)
         return jsonify(populated_chat), 200
     else:
         # Create new chat
@@ -172,46 +143,18 @@ def access_chat(request, mongodb, is_teacher=False, get_teacher_func=None, get_s
         # Get the full chat with populated users
         full_chat = chats_collection.find_one({"_id": result.inserted_id})
         populated_chat = ChatModel.format_chat_response(full_chat)
-        
-        # Populate user details
-        populated_users = []
-        for user_id in populated_chat['users']:
-            user_id_type = get_id_type(user_id)
-            if user_id_type == "ObjectId" or (isinstance(user_id, str) and len(user_id) == 24):
-                # Try to find in teachers collection
-                teacher = get_teacher_func(user_id)
-                if teacher:
-                    teacher_data = {
-                        "_id": str(user_id),
-                        "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                        "email": teacher.get('email', ''),
-                        "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                        "type": "teacher"
-                    }
-                    populated_users.append(teacher_data)
-                    continue
-            
-            # Try to find in students SQL
-            student = get_student_func(user_id)
-            if student:
-                student_data = {
-                    "_id": str(user_id),
-                    "name": f"{student.fname} {student.lname}",
-                    "email": student.email,
-                    "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                    "type": "student"
-                }
-                populated_users.append(student_data)
-        
-        populated_chat['users'] = populated_users
- 
+        cards = user_directory.resolve(populated_chat['users'])
+        user_directory.populate_chat(populated_chat, cards)
         
         return jsonify(populated_chat), 200
 
-def fetch_chats(mongodb, is_teacher=False, get_teacher_func=None, get_student_func=None,current_user_id=None):
-    """Fetch all chats for the current user"""
+def fetch_chats(mongodb, is_teacher=False, user_directory=None, current_user_id=None, before=None, limit=None):
+    """
+    Fetch one page of the current user's chats, most recently updated first.
+    The chats and their latest messages come from one aggregation and every user from one batch resolve,
+    so the number of round-trips does not grow with the number of chats. Pass next_cursor as `before` for the next page.
+    """
     # current_user_id = get_current_user_id(is_teacher)
-    print("IIIIIiiiiiiiiiii",current_user_id)
     if not current_user_id:
         return jsonify({"message": "Not logged in"}), 401
      
@@ -219,115 +162,61 @@ def fetch_chats(mongodb, is_teacher=False, get_teacher_func=None, get_student_fu
     current_id_type = get_id_type(current_user_id)
     current_id = ObjectId(current_user_id) if current_id_type == "ObjectId" else int(current_user_id)
     
-    # Find chats
+    try:
+        limit = min(max(int(limit or DEFAULT_CHAT_PAGE_SIZE), 1), MAX_CHAT_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    
+    chat_filter = {"users": current_id}
+    if before:
+        try:
+            before_updated_at, before_id = decode_cursor(before)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid cursor"}), 400
+        chat_filter["$or"] = [
+            {"updatedAt": {"$lt": before_updated_at}},
+            {"updatedAt": before_updated_at, "_id": {"$lt": before_id}},
+        ]
+    
+    # Find chats together with their latest message
     chats_collection = mongodb["chats"]
-    chats = list(chats_collection.find({"users": current_id}).sort("updatedAt", -1))
+    chats = list(chats_collection.aggregate([
+        {"$match": chat_filter},
+        {"$sort": {"updatedAt": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "messages",
+            "localField": "latestMessage",
+            "foreignField": "_id",
+            "as": "latestMessageDoc",
+        }},
+        {"$addFields": {"latestMessageDoc": {"$arrayElemAt": ["$latestMessageDoc", 0]}}},
+    ]))
+    has_more = len(chats) > limit
+    chats = chats[:limit]
+    next_cursor = encode_cursor(chats[-1]['updatedAt'], chats[-1]['_id']) if has_more else None
+    
+    latest_messages = {}
+    for chat in chats:
+        message = chat.pop('latestMessageDoc', None)
+        if message:
+            latest_messages[str(message['_id'])] = message
     
     # Format and populate chats
-    populated_chats = []
-    for chat in chats:
-        populated_chat = ChatModel.format_chat_response(chat)
-        
-        # Populate users
-        populated_users = []
-        for user_id in populated_chat['users']:
-            user_id_type = get_id_type(user_id)
-            if user_id_type == "ObjectId" or (isinstance(user_id, str) and len(user_id) == 24):
-                # Try to find in teachers collection
-                teacher = get_teacher_func(user_id)
-                if teacher:
-                    teacher_data = {
-                        "_id": str(user_id),
-                        "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                        "email": teacher.get('email', ''),
-                        "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                        "type": "teacher"
-                    }
-                    populated_users.append(teacher_data)
-                    continue
-            
-            # Try to find in students SQL
-            student = get_student_func(user_id)
-            if student:
-                student_data = {
-                    "_id": str(user_id),
-                    "name": f"{student.fname} {student.lname}",
-                    "email": student.email,
-                    "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                    "type": "student"
-                }
-                populated_users.append(student_data)
-        
-        populated_chat['users'] = populated_users
-        
-        # Populate group admin if exists
-        if 'groupAdmin' in populated_chat and populated_chat['groupAdmin']:
-            admin_id = populated_chat['groupAdmin']
-            admin_id_type = get_id_type(admin_id)
-            
-            if admin_id_type == "ObjectId" or (isinstance(admin_id, str) and len(admin_id) == 24):
-                teacher = get_teacher_func(admin_id)
-                if teacher:
-                    admin_data = {
-                        "_id": str(admin_id),
-                        "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                        "email": teacher.get('email', ''),
-                        "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                        "type": "teacher"
-                    }
-                    populated_chat['groupAdmin'] = admin_data
-            
-            if 'groupAdmin' in populated_chat and isinstance(populated_chat['groupAdmin'], str):
-                student = get_student_func(admin_id)
-                if student:
-                    admin_data = {
-                        "_id": str(admin_id),
-                        "name": f"{student.fname} {student.lname}",
-                        "email": student.email,
-                        "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                        "type": "student"
-                    }
-                    populated_chat['groupAdmin'] = admin_data
-        
-        # Populate latest message
-        if 'latestMessage' in populated_chat and populated_chat['latestMessage']:
-            message = mongodb["messages"].find_one({"_id": ObjectId(populated_chat['latestMessage'])})
-            if message:
-                sender_id = message.get('sender')
-                sender_id_type = get_id_type(sender_id)
-                
-                sender_data = None
-                if sender_id_type == "ObjectId" or (isinstance(sender_id, str) and len(sender_id) == 24):
-                    teacher = get_teacher_func(sender_id)
-                    if teacher:
-                        sender_data = {
-                            "_id": str(sender_id),
-                            "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                            "email": teacher.get('email', ''),
-                            "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                            "type": "teacher"
-                        }
-                
-                if not sender_data:
-                    student = get_student_func(sender_id)
-                    if student:
-                        sender_data = {
-                            "_id": str(sender_id),
-                            "name": f"{student.fname} {student.lname}",
-                            "email": student.email,
-                            "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                            "type": "student"
-                        }
-                
-                message = MessageModel.format_message_response(message)
-                message['sender'] = sender_data
-                populated_chat['latestMessage'] = message
-        
-        populated_chats.append(populated_chat)
+    populated_chats = [ChatModel.format_chat_response(chat) for chat in chats]
+    
+    # Read state and presence for the whole page, one query each
+    unread_counts = CHAT_STATE.unread_counts(current_user_id, [chat['_id'] for chat in populated_chats])
+    online_users = CHAT_STATE.online_users(user_id for chat in populated_chats for user_id in chat.get('users', []))
+    for chat in populated_chats:
+        chat['unreadCount'] = unread_counts.get(chat['_id'], 0)
+        chat['onlineUsers'] = [str(user_id) for user_id in chat.get('users', []) if str(user_id) in online_users]
     
-    return jsonify(populated_chats), 200
+    populate_chats(mongodb, populated_chats, user_directory, latest_messages=latest_messages)
+    
+    return jsonify({"chats": populated_chats, "next_cursor": next_cursor}), 200
 
-def create_group_chat(request, mongodb, is_teacher=False, get_teacher_func=None, get_student_func=None,current_user_id=None):
+def create_group_chat(request, mongodb, is_teacher=False, user_directory=None, current_user_id=None):
     """Create a group chat"""
     data = request.json
     name = data.get('name')
@@ -381,71 +270,8 @@ def create_group_chat(request, mongodb, is_teacher=False, get_teacher_func=None,
     # Get full group chat with populated data
     full_chat = chats_collection.find_one({"_id": result.inserted_id})
     populated_chat = ChatModel.format_chat_response(full_chat)
-    
-    # Populate users
-    populated_users = []
-    for user_id in populated_chat['users']:
-        user_id_type = get_id_type(user_id)
-        if user_id_type == "ObjectId" or (isinstance(user_id, str) and len(user_id) == 24):
-            # Try to find in teachers collection
-            teacher = get_teacher_func(user_id)
-            if teacher:
-                teacher_data = {
-                    "_id": str(user_id),
-                    "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                    "email": teacher.get('email', ''),
-                    "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                    "type": "teacher"
-                }
-                populated_users.append(teacher_data)
-                continue
-        
-        # Try to find in students SQL
-        student = get_student_func(user_id)
-        if student:
-            student_data = {
-                "_id": str(user_id),
-                "name": f"{student.fname} {student.lname}",
-                "email": student.email,
-                "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                "type": "student"
-            }
-            populated_users.append(student_data)
-    
-    populated_chat['users'] = populated_users
-    
-    # Populate group admin
-    admin_id = populated_chat['groupAdmin']
-    admin_id_type = get_id_type(admin_id)
-    
-    if admin_id_type == "ObjectId" or (isinstance(admin_id, str) and len(admin_id) == 24):
-        teacher = get_teacher_func(admin_id)
-        if teacher:
-            admin_data = {
-                "_id": str(admin_id),
-                "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                "email": teacher.get('email', ''),
-                "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                "type": "teacher"
-            }
-            populated_chat['groupAdmin'] = admin_data
-    
-    if isinstance(populated_chat['groupAdmin'], str) or populated_chat['groupAdmin'] == admin_id:
-        student = get_student_func(admin_id)
-        if student:
-            admin_data = {
-                "_id": str(admin_id),
-                "name": f"{student.fname} {student.lname}",
-                "email": student.email,
-                "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                "type": "student"
-            }
-            populated_chat['groupAdmin'] = admin_data
-            
-    
-
-    
-    
+    cards = user_directory.resolve(user_directory.chat_user_ids(populated_chat))
+    user_directory.populate_chat(populated_chat, cards)
     
     return jsonify(populated_chat), 200
 
@@ -521,4 +347,26 @@ def remove_from_group(request, mongodb, is_teacher=False,current_user_id=None):
     if not updated_chat:
         return jsonify({"message": "Chat not found"}), 404
     
-    return jsonify(ChatModel.format_chat_response(updated_chat)), 200
\ No newline at end of file
+    return jsonify(ChatModel.format_chat_response(updated_chat)), 200
+
+def mark_chat_read(request, mongodb, is_teacher=False, current_user_id=None):
+    """Reset the current user's unread counter for a chat"""
+    data = request.json or {}
+    chatId = data.get('chatId')
+    
+    if not chatId:
+        return jsonify({"message": "Please provide chat ID"}), 400
+    
+    if not current_user_id:
+        return jsonify({"message": "Not logged in"}), 401
+    
+    messageId = data.get('messageId')
+    if not ObjectId.is_valid(str(chatId)) or (messageId and not ObjectId.is_valid(str(messageId))):
+        return jsonify({"message": "Invalid chat or message ID"}), 400
+    
+    # only members have read state for a chat
+    if not is_chat_member(mongodb, chatId, current_user_id):
+        return jsonify({"message": "Chat not found"}), 404
+    
+    CHAT_STATE.mark_read(chatId, current_user_id, messageId)
+    return jsonify({"chatId": chatId, "unreadCount": 0}), 200
\ No newline at end of file
@@ -2,7 +2,8 @@ from bson import ObjectId
 from flask import jsonify, request, session
 from ..models.chat_models import MessageModel
 from datetime import datetime
-from server import socketio 
+from server.chat_events import fan_out_message, is_chat_member
+from server.chat_state import CHAT_STATE
 
 def get_id_type(id_value):
     # MongoDB ObjectID
@@ -56,13 +57,13 @@ def get_current_user_id(is_teacher=False):
     else:
         return session.get('user_id')
 
-def send_message(request, mongodb, is_teacher=False, get_teacher_func=None, get_student_func=None,current_user_id=None):
+def send_message(request, mongodb, is_teacher=False, user_directory=None, current_user_id=None):
     """Send a new message"""
     data = request.json
     chatId = data.get('chatId')
     content = data.get('content')
     
-    if not chatId or not content:
+    if not chatId or not content or not ObjectId.is_valid(str(chatId)):
         return jsonify({"message": "Invalid data in request body"}), 400
     
     # Get current user ID
@@ -74,6 +75,10 @@ def send_message(request, mongodb, is_teacher=False, get_teacher_func=None, get_
     current_id_type = get_id_type(current_user_id)
     current_id = ObjectId(current_user_id) if current_id_type == "ObjectId" else int(current_user_id)
     
+    # only members can post, and posting updates their read state
+    if not is_chat_member(mongodb, chatId, current_user_id):
+        return jsonify({"message": "Chat not found"}), 404
+    
     # Create message
     message_data = {
         "sender": current_id,
@@ -90,42 +95,11 @@ def send_message(request, mongodb, is_teacher=False, get_teacher_func=None, get_
     populated_message = MessageModel.format_message_response(message)
     
     # Populate sender
-    sender_id = populated_message['sender']
-    sender_id_type = get_id_type(sender_id)
-    
-    sender_data = None
-    if sender_id_type == "ObjectId" or (isinstance(sender_id, str) and len(sender_id) == 24):
-        teacher = get_teacher_func(sender_id)
-        if teacher:
-            sender_data = {
-                "_id": str(sender_id),
-                "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                "email": teacher.get('email', ''),
-                "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                "type": "teacher"
-            }
-    
-    if not sender_data:
-        student = get_student_func(sender_id)
-        if student:
-            sender_data = {
-                "_id": str(sender_id),
-                "name": f"{student.fname} {student.lname}",
-                "email": student.email,
-                "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                "type": "student"
-            }
-    
+    sender_data = user_directory.card(populated_message['sender'])
     populated_message['sender'] = sender_data
     
-    socket_message = json_serialize_message(populated_message)
-    
-    # Emit the new message event to the chat room
-    chat_room = str(chatId)
-    socketio.emit('new message', socket_message, room=chat_room)
-    
     # Populate chat
-    chat = mongodb["chats"].find_one({"_id": ObjectId(chatId)})
+    chat = mongodb["chats"].find_one({"_id": ObjectId(chatId)}, {"chatName": 1, "isGroupChat": 1, "users": 1})
     populated_chat = {
         "_id": str(chat["_id"]),
         "chatName": chat.get("chatName"),
@@ -140,66 +114,90 @@ def send_message(request, mongodb, is_teacher=False, get_teacher_func=None, get_
         {"$set": {"latestMessage": result.inserted_id, "updatedAt": datetime.now()}}
     )
     
+    # The stored message is delivered once to each member's personal room, the sender's other tabs included
+    fan_out_message(json_serialize_message(populated_message), populated_chat["users"])
+    CHAT_STATE.record_message(chatId, result.inserted_id, populated_chat["users"], current_user_id)
+    
     return jsonify(populated_message), 200
 
-def all_messages(chat_id, mongodb, is_teacher=False, get_teacher_func=None, get_student_func=None,current_user_id=None):
-    """Get all messages for a chat"""
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+def encode_cursor(timestamp, object_id):
+    """Opaque page cursor for (timestamp, _id) ordered results. Mongo stores datetimes to the millisecond."""
+    return f"{timestamp.isoformat(timespec='milliseconds')}_{object_id}"
+
+def decode_cursor(cursor):
+    timestamp, object_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(timestamp), ObjectId(object_id)
+
+def all_messages(chat_id, mongodb, is_teacher=False, user_directory=None, current_user_id=None, before=None, limit=None):
+    """
+    Get one page of messages for a chat, oldest first.
+    Pages walk backwards through the (chat, createdAt, _id) index: pass the returned next_cursor
+    as `before` to load the previous page; next_cursor is None once the start of the chat is reached.
+    """
     if not chat_id:
         return jsonify({"message": "Chat ID is required"}), 400
+    if not ObjectId.is_valid(str(chat_id)):
+        return jsonify({"message": "Invalid chat ID"}), 400
     
     # Get current user ID
     # current_user_id = get_current_user_id(is_teacher)
     if not current_user_id:
         return jsonify({"message": "Not logged in"}), 401
     
-    # Get messages
+    try:
+        limit = min(max(int(limit or DEFAULT_MESSAGE_PAGE_SIZE), 1), MAX_MESSAGE_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    
+    message_filter = {"chat": ObjectId(chat_id)}
+    if before:
+        try:
+            before_created_at, before_id = decode_cursor(before)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid cursor"}), 400
+        message_filter["$or"] = [
+            {"createdAt": {"$lt": before_created_at}},
+            {"createdAt": before_created_at, "_id": {"$lt": before_id}},
+        ]
+    
+    # The chat is the same for every message, fetch it once
+    chat = mongodb["chats"].find_one({"_id": ObjectId(chat_id)}, {"chatName": 1, "isGroupChat": 1, "users": 1})
+    if chat is None:
+        return jsonify({"message": "Chat not found"}), 404
+    populated_chat = {
+        "_id": str(chat["_id"]),
+        "chatName": chat.get("chatName"),
+        "isGroupChat": chat.get("isGroupChat"),
+        "users": [str(user) if isinstance(user, ObjectId) else int(user) for user in chat.get("users", [])],
+    }
+    
+    # Get the newest `limit` messages before the cursor, plus one to know whether more remain
     messages_collection = mongodb["messages"]
-    messages = list(messages_collection.find({"chat": ObjectId(chat_id)}).sort("createdAt", 1))
+    messages = list(messages_collection.find(message_filter)
+                    .sort([("createdAt", -1), ("_id", -1)])
+                    .limit(limit + 1))
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    next_cursor = encode_cursor(messages[0]['createdAt'], messages[0]['_id']) if has_more else None
+    
+    # Resolve every sender in one batch
+    senders = user_directory.resolve(message.get('sender') for message in messages)
     
     # Format and populate messages
     populated_messages = []
     for message in messages:
         populated_message = MessageModel.format_message_response(message)
-        
-        # Populate sender
-        sender_id = populated_message['sender']
-        sender_id_type = get_id_type(sender_id)
-        
-        sender_data = None
-        if sender_id_type == "ObjectId" or (isinstance(sender_id, str) and len(sender_id) == 24):
-            teacher = get_teacher_func(sender_id)
-            if teacher:
-                sender_data = {
-                    "_id": str(sender_id),
-                    "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-                    "email": teacher.get('email', ''),
-                    "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-                    "type": "teacher"
-                }
-        
-        if not sender_data:
-            student = get_student_func(sender_id)
-            if student:
-                sender_data = {
-                    "_id": str(sender_id),
-                    "name": f"{student.fname} {student.lname}",
-                    "email": student.email,
-                    "pic": student.pic if student.pic else 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-                    "type": "student"
-                }
-        
-        populated_message['sender'] = sender_data
-        
-        # Populate chat
-        chat = mongodb["chats"].find_one({"_id": ObjectId(chat_id)})
-        populated_chat = {
-            "_id": str(chat["_id"]),
-            "chatName": chat.get("chatName"),
-            "isGroupChat": chat.get("isGroupChat"),
-            "users": [str(user) if isinstance(user, ObjectId) else int(user) for user in chat.get("users", [])],
-        }
+        populated_message['sender'] = senders.get(str(populated_message['sender']))
         populated_message['chat'] = populated_chat
-        
         populated_messages.append(populated_message)
     
-    return jsonify(populated_messages), 200
\ No newline at end of file
+    # Loading the newest page means the user has seen the chat (read state is only kept for members)
+    is_member = str(current_user_id) in {str(user) for user in populated_chat["users"]}
+    if not before and populated_messages and is_member:
+        CHAT_STATE.mark_read(chat_id, current_user_id, populated_messages[-1]['_id'])
+    
+    return jsonify({"messages": populated_messages, "next_cursor": next_cursor}), 200
\ No newline at end of file
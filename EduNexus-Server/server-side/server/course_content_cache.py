@@ -0,0 +1,67 @@
+import os
+import time
+from threading import Lock
+
+
+class CourseContentCache:
+    """
+    Lesson statuses and lab manuals for a course, as shown by fetch-lessons / fetch-shared-lessons.
+    Lesson statuses come from a single $in query instead of one find_one per lesson title.
+    Entries live for a short TTL and add-lesson / add-lab-manual drop them straight away.
+    """
+    def __init__(self, mongodb, ttl_seconds=None):
+        self.lessons_collection = mongodb["lessons"]
+        self.lab_manuals_collection = mongodb["lab_manuals"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("COURSE_CONTENT_CACHE_TTL", 30))
+        self.lock = Lock()
+        self.entries = {}
+
+    def get(self, course_id, lesson_titles):
+        lesson_titles = list(lesson_titles)
+        key = (course_id, tuple(lesson_titles))
+        now = time.monotonic()
+        with self.lock:
+            cached = self.entries.get(course_id)
+        if cached and cached[0] == key and now - cached[1] < self.ttl_seconds:
+            return cached[2]
+
+        content = self.load(course_id, lesson_titles)
+        with self.lock:
+            self.entries[course_id] = (key, now, content)
+        return content
+
+    def load(self, course_id, lesson_titles):
+        lesson_ids_by_title = {}
+        for lesson in self.lessons_collection.find(
+                {"course_id": course_id, "title": {"$in": lesson_titles}},
+                {"_id": 1, "title": 1}):
+            # keep the first match per title, like the old find_one did
+            lesson_ids_by_title.setdefault(lesson["title"], str(lesson["_id"]))
+
+        lesson_statuses = ["View" if title in lesson_ids_by_title else "Generate" for title in lesson_titles]
+        lesson_ids = [lesson_ids_by_title.get(title, 0) for title in lesson_titles]
+
+        lab_manuals = list(self.lab_manuals_collection.find(
+            {"course_id": course_id},
+            {"_id": 1, "markdown_content": 1, "exp_aim": 1, "exp_number": 1}))
+        manuals = [
+            {
+                "id": str(lm["_id"]),
+                "markdown_content": lm.get("markdown_content"),
+                "exp_aim": lm.get("exp_aim"),
+                "exp_number": lm.get("exp_number"),
+            }
+            for lm in lab_manuals
+        ]
+
+        return {
+            "lesson_statuses": lesson_statuses,
+            "lesson_ids": lesson_ids,
+            "lab_manuals": manuals,
+            "manual_statuses": ["View"] * len(manuals),
+            "manual_ids": [manual["id"] for manual in manuals],
+        }
+
+    def invalidate(self, course_id):
+        with self.lock:
+            self.entries.pop(course_id, None)
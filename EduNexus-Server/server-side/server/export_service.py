@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+
+DEFAULT_EXPORT_LIMITS = {"pdf": 2, "pptx": 2, "docx": 2}
+
+
+class ExportTimeout(Exception):
+    """Raised when an export did not get a render slot or did not finish within the timeout."""
+
+
+class ExportService:
+    """
+    Renders PDF / PPTX / DOCX exports in a bounded process pool, so ReportLab, python-pptx and pandoc
+    work never holds the GIL of the worker that serves requests.
+      - the pool is spawned lazily with EXPORT_WORKERS processes (spawn, so children don't inherit the app, and
+        app.py skips building it when a child re-imports it as __mp_main__)
+      - each format has its own concurrency limit (EXPORT_LIMIT_PDF / _PPTX / _DOCX); a slot is held until
+        the render really finishes, even when the waiting request has already timed out
+      - run() waits up to EXPORT_TIMEOUT seconds in total, for a slot and the render; submit() returns the Future for callers that poll
+      - export() renders a one-off file into the artifact store's "exports" namespace
+    Tasks are the module-level functions of core.export_tasks; their first argument is the output path.
+    """
+    def __init__(self, artifact_store, max_workers=None, limits=None, timeout_seconds=None):
+        self.artifact_store = artifact_store
+        self.max_workers = max_workers or int(os.getenv("EXPORT_WORKERS", min(4, os.cpu_count() or 1)))
+        limits = limits or {
+            kind: int(os.getenv(f"EXPORT_LIMIT_{kind.upper()}", limit)) for kind, limit in DEFAULT_EXPORT_LIMITS.items()
+        }
+        self.slots = {kind: BoundedSemaphore(limit) for kind, limit in limits.items()}
+        self.timeout_seconds = timeout_seconds or float(os.getenv("EXPORT_TIMEOUT", 120))
+        self.lock = Lock()
+        self.executor = None
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.executor
+
+    def _reset_executor(self, broken):
+        with self.lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False)
+
+    def submit(self, kind, task, *args, timeout=None):
+        """Queue a render once a slot for its format is free, returning the Future of task(*args)."""
+        timeout = self.timeout_seconds if timeout is None else timeout
+        slot = self.slots[kind]
+        if not slot.acquire(timeout=timeout):
+            raise ExportTimeout(f"No {kind} render slot became free within {timeout}s")
+        executor = self._executor()
+        try:
+            future = executor.submit(task, *args)
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory), start a fresh pool and try once more
+            self._reset_executor(executor)
+            try:
+                future = self._executor().submit(task, *args)
+            except Exception:
+                slot.release()
+                raise
+        except Exception:
+            slot.release()
+            raise
+        future.add_done_callback(lambda _: slot.release())
+        return future
+
+    def run(self, kind, task, *args, timeout=None):
+        """Render in the pool and wait for the result; waiting for a slot and rendering share one timeout."""
+        timeout = timeout or self.timeout_seconds
+        deadline = time.monotonic() + timeout
+        future = self.submit(kind, task, *args, timeout=timeout)
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            raise ExportTimeout(f"{kind} export did not finish within {timeout}s")
+
+    def export(self, kind, task, suffix, *args):
+        """
+        Render task(output_path, *args) into a new artifact and return its path.
+        Nothing reads an export again, so callers send it with ArtifactStore.send(..., remove=True).
+        """
+        output_path = self.artifact_store.unique_path("exports", suffix)
+        with self.artifact_store.writing("exports", output_path) as temp_path:
+            self.run(kind, task, temp_path, *args)
+        return output_path
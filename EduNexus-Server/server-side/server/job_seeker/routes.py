@@ -6,9 +6,7 @@ from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from flask import request, jsonify, Blueprint, session
 from flask_cors import cross_origin
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
-from urllib.parse import quote_plus
+from server.mongo import job_seeker_db
 from io import BytesIO
 from bson import ObjectId
 import fitz
@@ -18,11 +16,7 @@ from werkzeug.security import check_password_hash, generate_password_hash
 load_dotenv()
 
 job_seeker = Blueprint(name='job_seeker', import_name=__name__, url_prefix="/job_seeker")
-password = quote_plus(os.getenv("MONGO_PASS"))
-uri = "mongodb+srv://ishashah2303:" + password +"@cluster0.mp52ofe.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
-client = MongoClient(uri, server_api=ServerApi('1'))
-
-student_data = client["student_data"]
+student_data = job_seeker_db
 std_profile_coll = student_data["profile"]
 job_roles = student_data["job_roles"]
 
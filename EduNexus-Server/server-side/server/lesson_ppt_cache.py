@@ -0,0 +1,72 @@
+import hashlib
+import json
+from datetime import datetime
+from threading import Lock
+from core.export_tasks import render_ppt
+
+NAMESPACE = "lesson_ppts"
+
+
+class LessonPptCache:
+    """
+    Presentations generated from a lesson, cached against a hash of its markdown_content and markdown_images.
+      - ppt_content (Mongo): {_id: lesson_id, hash, slides, createdAt}, the condensed slide markdown from Gemini
+      - the artifact store's lesson_ppts namespace: the built decks, named {lesson_id}_{hash}.pptx and
+        rendered in the export process pool
+    Both are shared by every worker process. add-lesson drops them, and a changed hash skips them anyway.
+    """
+    def __init__(self, mongodb, ppt_generator, export_service, artifact_store):
+        self.content_collection = mongodb["ppt_content"]
+        self.ppt_generator = ppt_generator
+        self.export_service = export_service
+        self.artifact_store = artifact_store
+        self.lock = Lock()
+        self.building = {}
+
+    @staticmethod
+    def lesson_hash(lesson):
+        payload = json.dumps([lesson.get("markdown_content") or [], lesson.get("markdown_images") or []],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def slides_for(self, lesson_id, lesson, content_hash):
+        """Condensed slide markdown for the lesson, calling Gemini only when the lesson changed."""
+        cached = self.content_collection.find_one({"_id": lesson_id, "hash": content_hash}, {"slides": 1})
+        if cached is not None:
+            return cached["slides"]
+        slides = self.ppt_generator.generate_ppt_content(markdown_list=lesson.get("markdown_content") or [])
+        self.content_collection.replace_one(
+            {"_id": lesson_id},
+            {"hash": content_hash, "slides": slides, "createdAt": datetime.now()},
+            upsert=True
+        )
+        return slides
+
+    def path_for(self, lesson_id, lesson, course_name, lesson_name):
+        """Return the cached .pptx for the lesson, generating the slides and the deck on a miss."""
+        lesson_id = str(lesson_id)
+        content_hash = self.lesson_hash(lesson)
+        # the title slide shows the course and lesson names, so they are part of the deck's key
+        deck_hash = hashlib.sha256(f"{content_hash}|{course_name}|{lesson_name}".encode("utf-8")).hexdigest()[:16]
+        deck_path = self.artifact_store.path(NAMESPACE, f"{lesson_id}_{deck_hash}.pptx")
+        # touching both checks for the file and protects it from eviction until it has been sent
+        if self.artifact_store.touch(deck_path):
+            return deck_path
+
+        with self.lock:
+            build_lock = self.building.setdefault(deck_path, Lock())
+        with build_lock:
+            if not self.artifact_store.touch(deck_path):
+                slides = self.slides_for(lesson_id, lesson, content_hash)
+                with self.artifact_store.writing(NAMESPACE, deck_path) as temp_path:
+                    self.export_service.run("pptx", render_ppt, temp_path, slides,
+                                            lesson.get("markdown_images") or [], course_name, lesson_name)
+                self.artifact_store.remove_prefixed(NAMESPACE, f"{lesson_id}_", keep=deck_path)
+        with self.lock:
+            self.building.pop(deck_path, None)
+        return deck_path
+
+    def invalidate(self, lesson_id):
+        lesson_id = str(lesson_id)
+        self.content_collection.delete_one({"_id": lesson_id})
+        self.artifact_store.remove_prefixed(NAMESPACE, f"{lesson_id}_")
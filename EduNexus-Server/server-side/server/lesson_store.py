@@ -0,0 +1,110 @@
+import ast
+import json
+from bson.objectid import ObjectId
+
+LESSON_IMAGE_FIELDS = ("relevant_images", "uploaded_images", "markdown_images")
+
+
+def decode_legacy(value, default=None):
+    """Values written before the native storage migration are json.dumps strings (or str() reprs)."""
+    if not isinstance(value, str):
+        return default if value is None else value
+    try:
+        return json.loads(value)
+    except ValueError:
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return default
+
+
+class LessonStore:
+    """
+    Lessons are stored as native BSON: markdown_content stays a list of submodule dicts on the lesson document.
+    The image lists live in lesson_images under the same _id, so list and status reads never load them.
+    """
+    def __init__(self, mongodb):
+        self.lessons_collection = mongodb["lessons"]
+        self.images_collection = mongodb["lesson_images"]
+
+    def save(self, title, course_id, teacher_id, markdown_content, images, lesson_id=None):
+        """Insert a new lesson or update an existing one, returning its id as a string."""
+        if lesson_id:
+            lesson_oid = ObjectId(lesson_id)
+            self.lessons_collection.update_one(
+                {"_id": lesson_oid},
+                {"$set": {"markdown_content": markdown_content},
+                 "$unset": {field: "" for field in LESSON_IMAGE_FIELDS}}
+            )
+        else:
+            lesson_oid = self.lessons_collection.insert_one({
+                "title": title,
+                "markdown_content": markdown_content,
+                "teacher_id": teacher_id,
+                "course_id": course_id
+            }).inserted_id
+
+        self.images_collection.update_one(
+            {"_id": lesson_oid},
+            {"$set": {field: images.get(field) for field in LESSON_IMAGE_FIELDS}},
+            upsert=True
+        )
+        return str(lesson_oid)
+
+    def get(self, lesson_id, fields=None, image_fields=()):
+        """
+        Fetch a lesson, loading only the requested fields (all lesson fields when fields is None)
+        and only the requested image lists from lesson_images.
+        """
+        lesson_oid = ObjectId(lesson_id)
+        projection = None if fields is None else {field: 1 for field in fields}
+        lesson = self.lessons_collection.find_one({"_id": lesson_oid}, projection)
+        if lesson is None:
+            return None
+
+        if "markdown_content" in lesson:
+            lesson["markdown_content"] = decode_legacy(lesson["markdown_content"], [])
+
+        if image_fields:
+            image_projection = {field: 1 for field in image_fields}
+            images = self.images_collection.find_one({"_id": lesson_oid}, image_projection)
+            if images is None:
+                # lessons that have not been migrated yet still carry the strings inline
+                images = self.lessons_collection.find_one({"_id": lesson_oid}, image_projection) or {}
+            for field in image_fields:
+                lesson[field] = decode_legacy(images.get(field))
+        return lesson
+
+    def migrate(self):
+        """
+        One-time move of json.dumps-encoded lessons to native storage, with images split into lesson_images.
+        Only documents that still hold string fields are touched, so it is safe to re-run.
+        """
+        legacy_filter = {"$or": [{"markdown_content": {"$type": "string"}}] +
+                         [{field: {"$exists": True}} for field in LESSON_IMAGE_FIELDS]}
+        migrated = 0
+        for lesson in self.lessons_collection.find(legacy_filter):
+            self.images_collection.update_one(
+                {"_id": lesson["_id"]},
+                {"$set": {field: decode_legacy(lesson.get(field)) for field in LESSON_IMAGE_FIELDS}},
+                upsert=True
+            )
+            self.lessons_collection.update_one(
+                {"_id": lesson["_id"]},
+                {"$set": {"markdown_content": decode_legacy(lesson.get("markdown_content"), [])},
+                 "$unset": {field: "" for field in LESSON_IMAGE_FIELDS}}
+            )
+            migrated += 1
+        return migrated
+
+
+def migrate_course_lessons(courses_collection):
+    """Turn course.lessons_data JSON strings into embedded documents. Safe to re-run."""
+    migrated = 0
+    for course in courses_collection.find({"lessons_data": {"$type": "string"}}, {"lessons_data": 1}):
+        courses_collection.update_one(
+            {"_id": course["_id"]},
+            {"$set": {"lessons_data": decode_legacy(course["lessons_data"], {})}}
+        )
+        migrated += 1
+    return migrated
@@ -0,0 +1,57 @@
+import hashlib
+import json
+from threading import Lock
+from deep_translator import GoogleTranslator
+from server.utils import ServerUtils
+from core.export_tasks import render_module_pdf
+
+NAMESPACE = "module_pdfs"
+
+
+class ModulePdfCache:
+    """
+    Translated module summary PDFs, keyed by (module_id, content hash, language).
+    A PDF is translated once and rendered in the export process pool into the artifact store, which writes it
+    atomically, so concurrent downloads never see a half-written file and every worker process can serve it.
+    Changing a module's content changes its hash, and the outdated file is removed; the store evicts the rest.
+    """
+    def __init__(self, export_service, artifact_store):
+        self.export_service = export_service
+        self.artifact_store = artifact_store
+        self.lock = Lock()
+        self.building = {}
+
+    @staticmethod
+    def content_hash(module):
+        payload = json.dumps(
+            [module.module_name, module.summary, module.submodule_content, module.video_urls],
+            sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def path_for(self, module, source_language):
+        """Return the cached PDF for the module in the given language, building it on a miss."""
+        prefix = f"{module.module_id}_{source_language}_"
+        pdf_path = self.artifact_store.path(NAMESPACE, f"{prefix}{self.content_hash(module)}.pdf")
+        # touching both checks for the file and protects it from eviction until it has been sent
+        if self.artifact_store.touch(pdf_path):
+            return pdf_path
+
+        # one build per file in this process; concurrent requests for it wait on the same lock
+        with self.lock:
+            build_lock = self.building.setdefault(pdf_path, Lock())
+        with build_lock:
+            if not self.artifact_store.touch(pdf_path):
+                self.build(module, source_language, pdf_path)
+                self.artifact_store.remove_prefixed(NAMESPACE, prefix, keep=pdf_path)
+        with self.lock:
+            self.building.pop(pdf_path, None)
+        return pdf_path
+
+    def build(self, module, source_language, pdf_path):
+        trans_modulename = GoogleTranslator(source='en', target=source_language).translate(module.module_name)
+        trans_module_summary = GoogleTranslator(source='en', target=source_language).translate(module.summary)
+        trans_submodule_content = ServerUtils.translate_submodule_content(module.submodule_content, source_language)
+
+        with self.artifact_store.writing(NAMESPACE, pdf_path) as temp_path:
+            self.export_service.run("pdf", render_module_pdf, temp_path, trans_modulename, trans_module_summary,
+                                    trans_submodule_content, source_language, module.video_urls)
@@ -0,0 +1,102 @@
+import os
+from urllib.parse import quote_plus
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.server_api import ServerApi
+from pymongo.errors import ConnectionFailure
+
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "CodeDIV")
+JOB_SEEKER_DB_NAME = os.getenv("MONGO_JOB_SEEKER_DB_NAME", "student_data")
+
+# (database, collection) -> list of (keys, options); create_index is a no-op when the index already exists
+MONGO_INDEXES = {
+    (MONGO_DB_NAME, "teacher"): [
+        ([("email", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "course"): [
+        ([("course_code", ASCENDING)], {}),
+        ([("teacher_id", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "lessons"): [
+        # course_id first so course-only lookups can use the same index
+        ([("course_id", ASCENDING), ("title", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "lab_manuals"): [
+        ([("course_id", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "assignments"): [
+        ([("assignment_id", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "messages"): [
+        # _id breaks createdAt ties for the all_messages page cursor
+        ([("chat", ASCENDING), ("createdAt", ASCENDING), ("_id", ASCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "chats"): [
+        ([("users", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    (MONGO_DB_NAME, "chat_reads"): [
+        ([("user", ASCENDING), ("chat", ASCENDING)], {"unique": True}),
+    ],
+    (MONGO_DB_NAME, "presence"): [
+        # the presence heartbeat finds a worker's users by the "<instance>|" prefix of their sids
+        ([("sids", ASCENDING)], {}),
+    ],
+    (JOB_SEEKER_DB_NAME, "job_roles"): [
+        ([("student_id", ASCENDING), ("job_role", ASCENDING)], {}),
+    ],
+}
+
+
+def get_mongo_uri():
+    """MONGO_URI wins; otherwise fall back to the shared Atlas cluster using MONGO_PASS."""
+    uri = os.getenv("MONGO_URI")
+    if uri:
+        return uri
+    password = quote_plus(os.getenv("MONGO_PASS", ""))
+    return "mongodb+srv://ishashah2303:" + password + "@cluster0.mp52ofe.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
+
+
+def create_mongo_client(uri=None):
+    """
+    Build the process-wide MongoClient with pool and timeout settings from the environment.
+    A mongomock:// URI returns an in-memory mongomock client for local runs and tests.
+    """
+    uri = uri or get_mongo_uri()
+    if uri.startswith("mongomock://"):
+        import mongomock
+        return mongomock.MongoClient()
+
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000)),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000)),
+        "retryWrites": True,
+    }
+    if uri.startswith("mongodb+srv://"):
+        options["server_api"] = ServerApi('1')
+    return MongoClient(uri, **options)
+
+
+# MongoClient connects lazily and is thread-safe, so every blueprint shares this one pool
+mongo_client = create_mongo_client()
+mongodb = mongo_client[MONGO_DB_NAME]
+job_seeker_db = mongo_client[JOB_SEEKER_DB_NAME]
+
+
+def ensure_indexes(client=None):
+    """Create the collection indexes the routes rely on. Safe to run on every startup."""
+    client = client or mongo_client
+    for (db_name, collection_name), indexes in MONGO_INDEXES.items():
+        collection = client[db_name][collection_name]
+        for keys, options in indexes:
+            try:
+                collection.create_index(keys, background=True, **options)
+            except ConnectionFailure as e:
+                # don't wait out the server selection timeout once per index
+                print(f"Skipping MongoDB index bootstrap, server unreachable: {e}")
+                return
+            except Exception as e:
+                print(f"Error creating index {keys} on {db_name}.{collection_name}: {e}")
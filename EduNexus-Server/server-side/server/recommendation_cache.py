@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from pytz import timezone
+from flask import current_app
+from sqlalchemy import desc
+from server import db
+from models.student_schema import User, Module, Query, UserRecommendation
+
+logger = logging.getLogger(__name__)
+
+NO_QUERY_MESSAGE = "You have not searched for any topic yet. Please search for a topic to get recommendations."
+
+
+class RecommendationCache:
+    """
+    Stores dashboard recommendations per user and refreshes them in the background.
+    The dashboard only ever reads the stored row; the Gemini / embedding calls happen
+    on a worker thread whenever the user's latest Query or interests change.
+    After a failed refresh the stale row is served without re-queueing for retry_cooldown_seconds,
+    so a failing upstream isn't called again on every dashboard load; invalidate() still refreshes at once.
+    """
+    def __init__(self, recommendation_generator, max_workers=2, retry_cooldown_seconds=None):
+        self.recommendation_generator = recommendation_generator
+        self.retry_cooldown_seconds = retry_cooldown_seconds if retry_cooldown_seconds is not None else int(os.getenv("RECOMMENDATION_RETRY_COOLDOWN", 300))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = Lock()
+        self.pending = set()
+        # user_id -> whether the extra run was forced by invalidate()
+        self.requeued = {}
+        self.failed_at = {}
+
+    def get(self, user_id):
+        """Return the stored recommendations for a user, scheduling a refresh if they are missing or stale."""
+        entry = UserRecommendation.query.get(user_id)
+        if entry is None or entry.is_stale:
+            self.schedule_refresh(user_id)
+
+        if entry is None:
+            return {
+                "query_message": "",
+                "recommended_topics": {},
+                "is_stale": True,
+                "date_updated": None,
+            }
+        return {
+            "query_message": entry.query_message or "",
+            "recommended_topics": entry.recommendations or {},
+            "is_stale": entry.is_stale,
+            "date_updated": entry.date_updated.strftime("%d/%m/%Y %H:%M") if entry.date_updated else None,
+        }
+
+    def invalidate(self, user_id):
+        """Mark a user's recommendations as stale and recompute them in the background."""
+        entry = UserRecommendation.query.get(user_id)
+        if entry is None:
+            entry = UserRecommendation(user_id=user_id)
+            db.session.add(entry)
+        entry.is_stale = True
+        db.session.commit()
+        self.schedule_refresh(user_id, force=True)
+
+    def delete(self, user_id):
+        UserRecommendation.query.filter_by(user_id=user_id).delete()
+
+    def schedule_refresh(self, user_id, force=False):
+        with self.lock:
+            if force:
+                self.failed_at.pop(user_id, None)
+            elif user_id in self.failed_at:
+                if time.monotonic() - self.failed_at[user_id] < self.retry_cooldown_seconds:
+                    return
+                del self.failed_at[user_id]
+            if user_id in self.pending:
+                # a refresh is already running, run once more when it finishes so the latest change is picked up
+                self.requeued[user_id] = force or self.requeued.get(user_id, False)
+                return
+            self.pending.add(user_id)
+        app = current_app._get_current_object()
+        self.executor.submit(self._refresh_in_context, app, user_id)
+
+    def _refresh_in_context(self, app, user_id):
+        try:
+            with app.app_context():
+                self.refresh(user_id)
+        except Exception:
+            logger.exception("Error refreshing recommendations for user %s", user_id)
+            with self.lock:
+                self.failed_at[user_id] = time.monotonic()
+        finally:
+            with self.lock:
+                self.pending.discard(user_id)
+                # after a failure only an invalidate() made in the meantime runs again
+                forced = self.requeued.pop(user_id, None)
+                if forced:
+                    self.failed_at.pop(user_id, None)
+                run_again = forced is not None and user_id not in self.failed_at
+            if run_again:
+                with self.lock:
+                    self.pending.add(user_id)
+                self.executor.submit(self._refresh_in_context, app, user_id)
+
+    def refresh(self, user_id):
+        """Recompute and store the recommendations for a user. Runs on the worker thread."""
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+
+        latest_query = Query.query.filter_by(user_id=user_id).order_by(
+            desc(Query.date_search), desc(Query.query_id)).first()
+        if latest_query is None:
+            source = "interests"
+            query_message = NO_QUERY_MESSAGE
+            recommended_modules = self.recommendation_generator.generate_recommendations_with_interests(
+                user.course_name, user.interests)
+        else:
+            source = f"query:{latest_query.query_id}"
+            query_message = ""
+            base_module = Module.query.filter_by(topic_id=latest_query.topic_id).first()
+            if base_module is None:
+                recommended_modules = {}
+            else:
+                recommended_modules = self.recommendation_generator.generate_recommendations_with_summary(
+                    base_module.summary)
+
+        entry = UserRecommendation.query.get(user_id)
+        if entry is None:
+            entry = UserRecommendation(user_id=user_id)
+            db.session.add(entry)
+        entry.source = source
+        entry.query_message = query_message
+        entry.recommendations = recommended_modules
+        entry.is_stale = False
+        entry.date_updated = datetime.now(timezone("Asia/Kolkata"))
+        db.session.commit()
+        return recommended_modules
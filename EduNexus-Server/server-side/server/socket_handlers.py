@@ -1,115 +1,80 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask import request
-from datetime import datetime
-from bson import ObjectId
+from flask import request, session
 from server import socketio
+from server.mongo import mongodb
+from server.chat_events import ChatSocketRegistry, chat_member_id, is_chat_member, user_room
+from server.chat_state import CHAT_STATE
 
-def json_serialize_message(obj):
-    """
-    Recursively convert message object to be fully JSON serializable
-    by converting datetime objects and ObjectIds to strings
-    """
-    if isinstance(obj, dict):
-        return {k: json_serialize_message(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [json_serialize_message(item) for item in obj]
-    elif isinstance(obj, datetime):
-        return obj.isoformat()
-    elif isinstance(obj, ObjectId):
-        return str(obj)
-    else:
-        return obj
+# Messages are fanned out by send_message once they are stored (see server/chat_events.py),
+# clients no longer relay 'new message' back through the socket.
+SOCKET_REGISTRY = ChatSocketRegistry()
 
 @socketio.on('connect')
 def handle_connect():
     print("Client connected to socket.io")
 
+def session_user_id(user_type):
+    """
+    The socket's user comes from the Flask session of the handshake, never from the client payload.
+    userData['type'] only picks between a student and a teacher login held by the same browser session.
+    """
+    if user_type == 'teacher':
+        return session.get('teacher_id')
+    if user_type == 'student':
+        return session.get('user_id')
+    return session.get('user_id') or session.get('teacher_id')
+
 @socketio.on('setup')
 def handle_setup(userData):
-    room = userData.get('_id')
-    join_room(room)
-    print(f"User {room} joined their room")
+    user_type = userData.get('type') if isinstance(userData, dict) else None
+    user_id = session_user_id(user_type)
+    if user_id is None:
+        print(f"Rejected setup from {request.sid}: not logged in")
+        return
+    # checked before anything is written for the user (presence, rooms)
+    if chat_member_id(user_id) is None:
+        print(f"Rejected setup from {request.sid}: invalid user id {user_id!r}")
+        return
+    SOCKET_REGISTRY.register(request.sid, user_id)
+    join_room(user_room(user_id))
+    CHAT_STATE.connect(user_id, request.sid)
+    print(f"User {user_id} joined their room")
     emit('connected')
 
 @socketio.on('join chat')
 def handle_join_chat(room):
+    user_id = SOCKET_REGISTRY.user_of(request.sid)
+    if user_id is None or not is_chat_member(mongodb, room, user_id):
+        print(f"Rejected join for room {room} from {user_id}")
+        return
+    SOCKET_REGISTRY.join(request.sid, room)
     join_room(room)
-    print(f"User joined room: {room}")
+    print(f"User {user_id} joined room: {room}")
 
-# @socketio.on('typing')
-# def handle_typing(room):
-#     emit('typing', room=room)
-
-# @socketio.on('stop typing')
-# def handle_stop_typing(room):
-#     emit('stop typing', room=room)
 @socketio.on('typing')
 def handle_typing(data):
-    room = data.get('room')
-    user_id = data.get('userId')
-    # Pass along who is typing to all clients in the room
-    emit('typing', user_id, room=room)
+    room = data.get('room') if isinstance(data, dict) else None
+    # only sockets that joined the chat (and so passed the membership check) can type in it
+    if room is None or not SOCKET_REGISTRY.in_room(request.sid, room) \
+            or not SOCKET_REGISTRY.should_forward_typing(request.sid, room):
+        return
+    # Pass along who is typing to everyone else in the room
+    user_id = SOCKET_REGISTRY.user_of(request.sid)
+    emit('typing', user_id, room=room, include_self=False)
 
 @socketio.on('stop typing')
 def handle_stop_typing(data):
-    room = data.get('room')
-    user_id = data.get('userId')
-    emit('stop typing', user_id, room=room)
-    
-@socketio.on('new message')
-def handle_new_message(new_message_received):
-    # Serialize incoming message before processing
-    new_message_received = json_serialize_message(new_message_received)
-    
-    chat = new_message_received.get('chat', {})
-    
-    if not chat:
-        return
-        
-    chat_id = chat.get('_id')
-    
-    if not chat_id:
+    room = data.get('room') if isinstance(data, dict) else None
+    if room is None or not SOCKET_REGISTRY.in_room(request.sid, room) \
+            or not SOCKET_REGISTRY.should_forward_stop_typing(request.sid, room):
         return
-    
-    # First, send to the entire chat room
-    emit('message received', new_message_received, room=chat_id)
-    
-    # Then send to each user's individual room
-    users = chat.get('users', [])
-    sender_id = new_message_received.get('sender', {}).get('_id')
-    
-    for user_id in users:
-        if isinstance(user_id, dict) and '_id' in user_id:
-            user_id = user_id['_id']
-            
-        # Don't send to the sender
-        if user_id != sender_id:
-            emit('message received', new_message_received, room=user_id)
+    user_id = SOCKET_REGISTRY.user_of(request.sid)
+    emit('stop typing', user_id, room=room, include_self=False)
 
-# @socketio.on('new message')
-# def handle_new_message(new_message_received):
-#     chat = new_message_received.get('chat', {})
-    
-#     if not chat:
-#         return
-        
-#     chat_id = chat.get('_id')
-    
-#     if not chat_id:
-#         return
-    
-#     # First, send to the entire chat room
-#     emit('message received', new_message_received, room=chat_id)
-    
-#     # Then send to each user's individual room
-#     users = chat.get('users', [])
-#     sender_id = new_message_received.get('sender', {}).get('_id')
-    
-#     for user_id in users:
-#         # If user_id is an object with _id property, use that
-#         if isinstance(user_id, dict) and '_id' in user_id:
-#             user_id = user_id['_id']
-            
-#         # Don't send to the sender
-#         if user_id != sender_id:
-#             emit('message received', new_message_received, room=user_id)
\ No newline at end of file
+@socketio.on('disconnect')
+def handle_disconnect():
+    user_id, typing_rooms = SOCKET_REGISTRY.unregister(request.sid)
+    for room in typing_rooms:
+        emit('stop typing', user_id, room=room, include_self=False)
+    if user_id is not None:
+        CHAT_STATE.disconnect(user_id, request.sid)
@@ -5,7 +5,8 @@ from io import BytesIO
 from server import db, bcrypt
 from datetime import datetime
 from gtts import gTTS
-from sqlalchemy import desc
+from sqlalchemy import desc, insert
+from sqlalchemy.exc import IntegrityError
 from deep_translator import GoogleTranslator
 from flask import request, session, jsonify, send_file, Blueprint
 from models.student_schema import User, Topic, Module, CompletedModule, Query, OngoingModule,ProjectsStudent
@@ -18,22 +19,16 @@ from langchain_community.document_loaders import PyPDFLoader
 from api.serper_client import SerperProvider
 from server.constants import *
 from server.utils import ServerUtils
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
+from core.export_tasks import render_docx
+from server.mongo import mongodb
 from bson.objectid import ObjectId
 from bson.errors import InvalidId 
-from urllib.parse import quote_plus
 import json
-from ..controllers.chat_controllers import access_chat, fetch_chats, create_group_chat, rename_group, add_to_group, remove_from_group, get_id_type
+from ..controllers.chat_controllers import access_chat, fetch_chats, create_group_chat, rename_group, add_to_group, remove_from_group, mark_chat_read, get_id_type
 from ..controllers.message_controllers import send_message, all_messages
-from sqlalchemy import or_
 
 
 students = Blueprint(name='students', import_name=__name__)
-password = quote_plus(os.getenv("MONGO_PASS"))
-uri = "mongodb+srv://ishashah2303:" + password +"@cluster0.mp52ofe.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
-client = MongoClient(uri, server_api=ServerApi('1'))
-mongodb = client["CodeDIV"]
 teachers_collection = mongodb["teacher"]
 lessons_collection = mongodb["lessons"]
 courses_collection = mongodb["course"]
@@ -93,6 +88,8 @@ def register():
     new_user = User(fname=fname, lname=lname, email=email, password=hash_pass, country=country, state=state, city=city, gender=gender, age=age, college_name=college_name, course_name=course_name, interests=interests, student_id=student_id_file.read(),github_id=github_id,github_PAT=github_PAT,pic=pic if pic else "https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg")
     db.session.add(new_user)
     db.session.commit()
+    RECOMMENDATION_CACHE.invalidate(new_user.user_id)
+    USER_SEARCH.upsert_student(new_user)
     
     user_pic = getattr(new_user, 'pic', "https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg")
     user_info = {
@@ -170,6 +167,7 @@ def user_profile():
     if request.method == 'POST':
         data = request.json
         print("data is printed---------",data)
+        interests_changed = user.interests != data.get("interests") or user.course_name != data.get("course_name")
         user.fname = data.get("fname")
         user.lname = data.get("lname")
         user.email = data.get("email")
@@ -182,6 +180,10 @@ def user_profile():
         user.college_name = data.get("college_name")
         user.course_name = data.get("course_name")
         db.session.commit()
+        USER_DIRECTORY.invalidate(user.user_id)
+        USER_SEARCH.upsert_student(user)
+        if interests_changed:
+            RECOMMENDATION_CACHE.invalidate(user.user_id)
     
     user_info = {}
     user_info['fname'] = user.fname
@@ -216,8 +218,6 @@ def getuser():
 
     user_ongoing_modules = user.user_onmodule_association
     user_completed_modules = user.user_module_association
-    user_course = user.course_name
-    user_interest = user.interests
     all_ongoing_modules_names = ""
   
     for comp_module in user_ongoing_modules:
@@ -245,19 +245,8 @@ def getuser():
             ongoing_modules.append(temp)
             
 
-    query_message = ""
-    user_queries = user.user_query_association 
-    if len(user_queries) == 0:
-        query_message = "You have not searched for any topic yet. Please search for a topic to get recommendations."
-        recommended_modules = RECOMMENDATION_GENERATOR.generate_recommendations_with_interests(user_course, user_interest) 
-        return jsonify({"message": "User found", "query_message":query_message,"recommended_topics":recommended_modules, "user_ongoing_modules":ongoing_modules, "user_completed_module":completed_modules, "response":True}), 200
-    else:
-        latest_query = Query.query.filter_by(user_id=user_id).order_by(desc(Query.date_search)).first() 
-        base_module = Module.query.filter_by(topic_id=latest_query.topic_id).first()
-        print("Module Name:", base_module.module_name)
-        print("Module Summary:", base_module.summary)
-        recommended_modules = RECOMMENDATION_GENERATOR.generate_recommendations_with_summary(base_module.summary)
-        return jsonify({"message": "User found", "query_message":query_message,"recommended_topics":recommended_modules, "user_ongoing_modules":ongoing_modules, "user_completed_module":completed_modules, "response":True}), 200
+    recommendations = RECOMMENDATION_CACHE.get(user_id)
+    return jsonify({"message": "User found", "query_message":recommendations["query_message"],"recommended_topics":recommendations["recommended_topics"], "recommendations_stale":recommendations["is_stale"], "recommendations_updated_at":recommendations["date_updated"], "user_ongoing_modules":ongoing_modules, "user_completed_module":completed_modules, "response":True}), 200
 
 @students.route('/logout', methods=['GET'])
 @cross_origin(supports_credentials=True)
@@ -284,10 +273,12 @@ def delete():
     # user_saved_queries = user.queries
     # user_saved_topics = user.completed_topics
 
+    RECOMMENDATION_CACHE.delete(user.user_id)
     db.session.delete(user)
     # db.session.delete(user_saved_queries)
     # db.session.delete(user_saved_topics)
     db.session.commit()
+    USER_SEARCH.remove("student", user_id)
 
     # return response
     return jsonify({"message": "User deleted successfully", "response":True}), 200
@@ -453,6 +444,52 @@ def create_project():
     return jsonify({"message": "Project created successfully", "github_id":current_user_github_id ,"github_PAT":user.github_PAT,"response": True}), 201
     
 
+def save_generated_modules(user, topic, topic_name, module_summary_content, level, websearch, source_language):
+    """
+    Save the topic (if new), the generated modules and the user's Query in one transaction.
+    Modules are bulk inserted with RETURNING so their ids come back without a round trip per module.
+    Returns the topic and a {module_name: module_id} dict.
+    """
+    module_rows = [
+        {"module_name": modulename, "websearch": websearch, "level": level, "summary": modulesummary}
+        for modulename, modulesummary in module_summary_content.items()
+    ]
+    try:
+        if topic is None:
+            try:
+                # two first requests for a new topic can both get here; the loser of the unique
+                # constraint reuses the winner's row instead of failing after the generation.
+                # The topic is the first write of the transaction, so rolling back loses nothing else,
+                # and the topic, modules and Query still commit or roll back together.
+                topic = Topic(topic_name=topic_name.lower())
+                db.session.add(topic)
+                db.session.flush()
+                print(f"topic added to database: {topic}")
+            except IntegrityError:
+                db.session.rollback()
+                topic = Topic.query.filter_by(topic_name=topic_name.lower()).first()
+                if topic is None:
+                    raise
+        for row in module_rows:
+            row["topic_id"] = topic.topic_id
+        new_modules = []
+        if module_rows:
+            new_modules = db.session.execute(
+                insert(Module).returning(Module.module_id, Module.module_name, Module.summary, sort_by_parameter_order=True),
+                module_rows
+            ).all()
+        new_user_query = Query(user_id=user.user_id, topic_id=topic.topic_id, level=level, websearch=websearch, lang=source_language)
+        db.session.add(new_user_query)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    RECOMMENDATION_GENERATOR.add_modules(new_modules)
+    RECOMMENDATION_CACHE.invalidate(user.user_id)
+    module_ids = {module.module_name: module.module_id for module in new_modules}
+    return topic, module_ids
+
 @students.route('/query2/doc-upload/<string:topicname>/<string:level>/<string:source_lang>',methods=['POST'])
 def doc_query_topic(topicname,level,source_lang):
     user_id = session.get('user_id')
@@ -497,32 +534,10 @@ def doc_query_topic(topicname,level,source_lang):
     print(f"Translated topic name: {trans_topic_name}")
 
     topic = Topic.query.filter_by(topic_name=trans_topic_name.lower()).first()
-    if topic is None:
-            topic = Topic(topic_name=trans_topic_name.lower())
-            db.session.add(topic)
-            db.session.commit()
-            print(f"topic added to database: {topic}")
 
-    
     module_summary_content = SUB_MODULE_GENERATOR.generate_submodules_from_textbook(trans_topic_name,level,VECTORDB_TEXTBOOK)    
     print("Content",module_summary_content)
-    module_ids = {}
-    for modulename, modulesummary in module_summary_content.items():
-        new_module = Module(
-            module_name=modulename,
-            topic_id=topic.topic_id,
-            websearch=websearch,
-            level=level,
-            summary=modulesummary
-        )
-        db.session.add(new_module)
-        db.session.commit()
-        module_ids[modulename] = new_module.module_id
-
-    # add user query to database
-    new_user_query = Query(user_id=user.user_id, topic_id=topic.topic_id, level=level, websearch=websearch, lang=source_language)
-    db.session.add(new_user_query)
-    db.session.commit()
+    topic, module_ids = save_generated_modules(user, topic, trans_topic_name, module_summary_content, level, websearch, source_language)
 
     trans_moduleids = {}
     if source_language !='english':
@@ -623,12 +638,7 @@ def query_topic(topicname,level,websearch,source_lang):
         trans_topic_name = topicname
     topic = Topic.query.filter_by(topic_name=trans_topic_name.lower()).first()
     session['topic']=trans_topic_name
-    if topic is None:
-            topic = Topic(topic_name=trans_topic_name.lower())
-            db.session.add(topic)
-            db.session.commit()
-            print(f"topic added to database: {topic}")
-    else:
+    if topic is not None:
         modules = Module.query.filter_by(topic_id=topic.topic_id, websearch=websearch, level=level).all()
         if modules:
             module_ids = {module.module_name:module.module_id for module in modules}
@@ -651,22 +661,7 @@ def query_topic(topicname,level,websearch,source_lang):
         print("web search false:-")
         module_summary_content = MODULE_GENERATOR.generate_module_summary(topic=trans_topic_name,level=level)    
     
-    module_ids = {}
-    for modulename, modulesummary in module_summary_content.items():
-        new_module = Module(
-            module_name=modulename,
-            topic_id=topic.topic_id,
-            websearch=websearch,
-            level=level,
-            summary=modulesummary
-        )
-        db.session.add(new_module)
-        db.session.commit()
-        module_ids[modulename] = new_module.module_id
-
-    new_user_query = Query(user_id=user.user_id, topic_id=topic.topic_id, level=level, websearch=websearch, lang=source_language)
-    db.session.add(new_user_query)
-    db.session.commit()
+    topic, module_ids = save_generated_modules(user, topic, trans_topic_name, module_summary_content, level, websearch, source_language)
 
     trans_moduleids = {}
     if source_language !='english':
@@ -790,20 +785,16 @@ def test():
 @students.route('/query2/<int:module_id>/<string:source_language>/download', methods=['GET'])
 def download_pdf(module_id, source_language):
     module = Module.query.get(module_id)
-    modulename = module.module_name
-    clean_modulename = modulename.replace(':',"_") 
-    module_summary = module.summary
-    submodule_content = module.submodule_content
-
-    trans_modulename = GoogleTranslator(source='en', target=source_language).translate(modulename)
-    trans_module_summary = GoogleTranslator(source='en', target=source_language).translate(module_summary)
-    trans_submodule_content = ServerUtils.translate_submodule_content(submodule_content, source_language)
+    if module is None:
+        return jsonify({"message": "Module not found", "response":False}), 404
+    clean_modulename = module.module_name.replace(':',"_") 
 
-    download_dir = os.path.join(os.getcwd(), "server", "downloads")
-    os.makedirs(download_dir, exist_ok=True)
-    pdf_file_path = os.path.join(download_dir, f"{clean_modulename}_summary.pdf")
-    PDF_GENERATOR.generate_pdf(pdf_file_path, trans_modulename, trans_module_summary, trans_submodule_content, source_language, module.video_urls)
-    return send_file(pdf_file_path, as_attachment=True)
+    try:
+        pdf_file_path = MODULE_PDF_CACHE.path_for(module, source_language)
+    except ExportTimeout as e:
+        print(f"Module PDF export timed out: {e}")
+        return jsonify({"message": "Creating the PDF took too long, please try again.", "response": False}), 504
+    return ARTIFACT_STORE.send(pdf_file_path, download_name=f"{clean_modulename}_summary.pdf", mimetype='application/pdf')
 
 @students.route('/generate-audio', methods=['POST'])
 @cross_origin(supports_credentials=True)
@@ -1113,6 +1104,7 @@ def delete_info():
     if module:
         db.session.delete(module)
         db.session.commit()
+        RECOMMENDATION_GENERATOR.remove_modules([module_id])
     return jsonify({"message": "An error occurred during evaluation"}), 200
 
 @students.route('/fetch-shared-course', methods=['POST'])
@@ -1154,44 +1146,16 @@ def fetch_shared_lessons():
     if course is None:
         return jsonify({"message": "Course not found for this teacher."}), 404
 
-    lessons_data : dict = json.loads(course.get("lessons_data", "{}"))
-    lesson_statuses = []
-    lesson_ids = []
-
-    for lesson_title in lessons_data.keys():
-        existing_lesson = lessons_collection.find_one({"title": lesson_title, "course_id": course_id})
-        if existing_lesson:
-            lesson_statuses.append("View")
-            lesson_ids.append(str(existing_lesson["_id"]))
-        else:
-            lesson_statuses.append("Generate")
-            lesson_ids.append(0)
-
-    lab_manuals = list(lab_manuals_collection.find({"course_id": course_id}))
-    manual_statuses = []
-    manual_ids = []
-
-    for manual in lab_manuals:
-        manual_statuses.append("View" if manual else "Generate")
-        manual_ids.append(str(manual["_id"]) if manual else 0)
-
-    manuals = [
-        {
-            "id": str(lm["_id"]),
-            "markdown_content": lm.get("markdown_content"),
-            "exp_aim": lm.get("exp_aim"),
-            "exp_number": lm.get("exp_number"),
-        }
-        for lm in lab_manuals
-    ]
+    lessons_data : dict = decode_legacy(course.get("lessons_data"), {})
+    content = COURSE_CONTENT_CACHE.get(course_id, lessons_data.keys())
 
     return jsonify({
         "lessons": lessons_data,
-        "lesson_statuses": lesson_statuses,
-        "lesson_ids": lesson_ids,
-        "lab_manuals": manuals,
-        "manual_statuses": manual_statuses,
-        "manual_ids": manual_ids
+        "lesson_statuses": content["lesson_statuses"],
+        "lesson_ids": content["lesson_ids"],
+        "lab_manuals": content["lab_manuals"],
+        "manual_statuses": content["manual_statuses"],
+        "manual_ids": content["manual_ids"]
     }), 200
 
 @students.route('/create-lab-manual-docx', methods=['POST'])
@@ -1228,14 +1192,17 @@ def convert_docx():
         markdown = lab_manual.get('markdown_content', '')
         exp_num = lab_manual.get('exp_number', 'Unknown_Experiment')
         image_list = json.loads(lab_manual.get('markdown_images'))
-        doc = LabManualGenerator.convert_markdown_to_docx(markdown, course_name, exp_num)
+        doc = EXPORT_SERVICE.export("docx", render_docx, ".docx", markdown, course_name, exp_num)
 
-        return send_file(
+        return ARTIFACT_STORE.send(
             doc,
-            as_attachment=True,
             download_name=f"{course_name}_{exp_num}.docx",
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            remove=True
         )
+    except ExportTimeout as e:
+        print("Lab manual export timed out:", e)
+        return jsonify({"message": "Creating the document took too long, please try again.", "response": False}), 504
     except Exception as e:
         print("An error occurred while creating the document:", e)
         return jsonify({"message": "Failed to create document", "response": False}), 500
@@ -1317,34 +1284,12 @@ def submit_assignment():
     })
 
     
-# Add these helper functions in the students blueprint
-def get_teacher_by_id(teacher_id):
-    """Get teacher by ID"""
-    id_type = get_id_type(teacher_id)
-    
-    if id_type == "ObjectId" or (isinstance(teacher_id, str) and len(teacher_id) == 24):
-        try:
-            return teachers_collection.find_one({"_id": ObjectId(teacher_id)})
-        except InvalidId:
-            pass
-    
-    return None
-
-def get_student_by_id(student_id):
-    """Get student by ID"""
-    id_type = get_id_type(student_id)
-    
-    if id_type == "Integer":
-        return User.query.get(student_id)
-    
-    return None
-
 # Add these routes to the students blueprint
 @students.route('/chats', methods=['POST'])
 # @cross_origin(supports_credentials=True)
 def student_access_chat():
     user_id = session.get("user_id", None)
-    return access_chat(request, mongodb, is_teacher=False, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=user_id)
+    return access_chat(request, mongodb, is_teacher=False, user_directory=USER_DIRECTORY, current_user_id=user_id)
 
 @students.route('/chats', methods=['GET'])
 # @cross_origin(supports_credentials=True)
@@ -1356,13 +1301,14 @@ def student_fetch_chats():
     user_id = session.get("user_id", None)
     # print("OOOOOOOOO",user_id)
     print("SET222",session.get("user_id"))
-    return fetch_chats(mongodb, is_teacher=False, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=user_id)
+    return fetch_chats(mongodb, is_teacher=False, user_directory=USER_DIRECTORY, current_user_id=user_id,
+                       before=request.args.get('before'), limit=request.args.get('limit'))
 
 @students.route('/chats/group', methods=['POST'])
 @cross_origin(supports_credentials=True)
 def student_create_group_chat():
     user_id = session.get("user_id", None)
-    return create_group_chat(request, mongodb, is_teacher=False, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=user_id)
+    return create_group_chat(request, mongodb, is_teacher=False, user_directory=USER_DIRECTORY, current_user_id=user_id)
 
 @students.route('/chats/rename', methods=['PUT'])
 @cross_origin(supports_credentials=True)
@@ -1382,17 +1328,24 @@ def student_remove_from_group():
     user_id = session.get("user_id", None)
     return remove_from_group(request, mongodb, is_teacher=False,current_user_id=user_id)
 
+@students.route('/chats/read', methods=['POST'])
+@cross_origin(supports_credentials=True)
+def student_mark_chat_read():
+    user_id = session.get("user_id", None)
+    return mark_chat_read(request, mongodb, is_teacher=False, current_user_id=user_id)
+
 @students.route('/messages', methods=['POST'])
 @cross_origin(supports_credentials=True)
 def student_send_message():
     user_id = session.get("user_id", None)
-    return send_message(request, mongodb, is_teacher=False, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=user_id)
+    return send_message(request, mongodb, is_teacher=False, user_directory=USER_DIRECTORY, current_user_id=user_id)
 
 @students.route('/messages/<chat_id>', methods=['GET'])
 @cross_origin(supports_credentials=True)
 def student_all_messages(chat_id):
     user_id = session.get("user_id", None)
-    return all_messages(chat_id, mongodb, is_teacher=False, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=user_id)
+    return all_messages(chat_id, mongodb, is_teacher=False, user_directory=USER_DIRECTORY, current_user_id=user_id,
+                        before=request.args.get('before'), limit=request.args.get('limit'))
 
 # Add a route for searching users (teachers and students) for chat
 @students.route('/users/search', methods=['GET'])
@@ -1402,59 +1355,14 @@ def search_users():
     if not search_query:
         return jsonify([]), 200
     
-    # Get current teacher ID
+    # Get current student ID
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"message": "Not logged in"}), 401
     
-    # Search for teachers
-    teacher_results = list(teachers_collection.find({
-        "$and": [
-            # {"_id": {"$ne": ObjectId(teacher_id)}},
-            {"$or": [
-                {"first_name": {"$regex": search_query, "$options": "i"}},
-                {"last_name": {"$regex": search_query, "$options": "i"}},
-                {"email": {"$regex": search_query, "$options": "i"}}
-            ]}
-        ]
-    }))
-    
-    # Search for students
-    student_results = User.query.filter(
-        or_(
-            User.fname.ilike(f'%{search_query}%'),
-            User.lname.ilike(f'%{search_query}%'),
-            User.email.ilike(f'%{search_query}%')
-        )
-        ).filter(
-            # Add the new AND condition to exclude the current user
-            User.user_id != user_id
-        ).all()
-    
-    # Format results
-    formatted_results = []
-    
-    # Format teacher results
-    for teacher in teacher_results:
-        formatted_results.append({
-            "_id": str(teacher["_id"]),
-            "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-            "email": teacher.get('email', ''),
-            "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-            "type": "teacher"
-        })
-    
-    # Format student results
-    for student in student_results:
-        formatted_results.append({
-            "_id": student.user_id,
-            "name": f"{student.fname} {student.lname}",
-            "email": student.email,
-            "pic": 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-            "type": "student"
-        })
-    
-    return jsonify(formatted_results), 200
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    results = USER_SEARCH.search(search_query, exclude=("student", str(user_id)), limit=limit)
+    return jsonify(results), 200
     
     
     
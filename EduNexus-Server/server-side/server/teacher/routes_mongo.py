@@ -15,28 +15,20 @@ from werkzeug.utils import secure_filename
 from langchain_community.vectorstores import FAISS
 from api.serper_client import SerperProvider
 from core.rag import MultiModalRAG, SimpleRAG
+from core.export_tasks import render_lesson_pdf, render_docx
 from server.constants import *
 from server.utils import ServerUtils
 import json
 import uuid
 import re
-import ast
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
+from server.mongo import mongodb
 from bson.objectid import ObjectId
 from bson.errors import InvalidId 
-from urllib.parse import quote_plus
 from werkzeug.security import check_password_hash, generate_password_hash
-from ..controllers.chat_controllers import access_chat, fetch_chats, create_group_chat, rename_group, add_to_group, remove_from_group, get_id_type
+from ..controllers.chat_controllers import access_chat, fetch_chats, create_group_chat, rename_group, add_to_group, remove_from_group, mark_chat_read, get_id_type
 from ..controllers.message_controllers import send_message, all_messages
-from sqlalchemy import or_
 
 teachers = Blueprint(name='teachers', import_name=__name__)
-password = quote_plus(os.getenv("MONGO_PASS"))
-uri = "mongodb+srv://ishashah2303:" + password + \
-    "@cluster0.mp52ofe.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
-client = MongoClient(uri, server_api=ServerApi('1'))
-mongodb = client["CodeDIV"]
 teachers_collection = mongodb["teacher"]
 lessons_collection = mongodb["lessons"]
 courses_collection = mongodb["course"]
@@ -121,6 +113,7 @@ def register():
     }
 
     result = teachers_collection.insert_one(new_teacher)
+    USER_SEARCH.upsert_teacher({**new_teacher, "_id": result.inserted_id})
     
     user_info = {
             "_id": str(result.inserted_id),
@@ -170,7 +163,7 @@ def create_course():
     try:
         course_name = request.form['course_name']
         num_lectures = request.form['num_lectures']
-        lessons = request.form['lessons']
+        lessons = json.loads(request.form['lessons'])
         course_code = ServerUtils.generate_course_code(
             courses_collection, length=6)
 
@@ -236,45 +229,16 @@ def fetch_lessons():
     if course is None:
         return jsonify({"message": "Course not found for this teacher."}), 404
 
-    lessons_data: dict = json.loads(course.get("lessons_data", "{}"))
-    lesson_statuses = []
-    lesson_ids = []
-
-    for lesson_title in lessons_data.keys():
-        existing_lesson = lessons_collection.find_one(
-            {"title": lesson_title, "course_id": course_id})
-        if existing_lesson:
-            lesson_statuses.append("View")
-            lesson_ids.append(str(existing_lesson["_id"]))
-        else:
-            lesson_statuses.append("Generate")
-            lesson_ids.append(0)
-
-    lab_manuals = list(lab_manuals_collection.find({"course_id": course_id}))
-    manual_statuses = []
-    manual_ids = []
-
-    for manual in lab_manuals:
-        manual_statuses.append("View" if manual else "Generate")
-        manual_ids.append(str(manual["_id"]) if manual else 0)
-
-    manuals = [
-        {
-            "id": str(lm["_id"]),
-            "markdown_content": lm.get("markdown_content"),
-            "exp_aim": lm.get("exp_aim"),
-            "exp_number": lm.get("exp_number"),
-        }
-        for lm in lab_manuals
-    ]
+    lessons_data: dict = decode_legacy(course.get("lessons_data"), {})
+    content = COURSE_CONTENT_CACHE.get(course_id, lessons_data.keys())
 
     return jsonify({
         "lessons": lessons_data,
-        "lesson_statuses": lesson_statuses,
-        "lesson_ids": lesson_ids,
-        "lab_manuals": manuals,
-        "manual_statuses": manual_statuses,
-        "manual_ids": manual_ids
+        "lesson_statuses": content["lesson_statuses"],
+        "lesson_ids": content["lesson_ids"],
+        "lab_manuals": content["lab_manuals"],
+        "manual_statuses": content["manual_statuses"],
+        "manual_ids": content["manual_ids"]
     }), 200
 
 
@@ -641,34 +605,20 @@ def add_lesson():
         return jsonify({"message": "Course ID is required."}), 400
 
     if lesson_id:
-        lesson: dict = lessons_collection.find_one(
-            {"_id": ObjectId(lesson_id)})
+        lesson: dict = LESSON_STORE.get(lesson_id, fields=["teacher_id"])
         if not lesson or lesson.get("teacher_id") != teacher_id:
             return jsonify({"message": "Lesson not found or you do not have permission to edit it."}), 404
 
-        lessons_collection.update_one(
-            {"_id": ObjectId(lesson_id)},
-            {"$set": {
-                "markdown_content": json.dumps(markdown_content),
-                "relevant_images": json.dumps(relevant_images),
-                "uploaded_images": json.dumps(uploaded_images),
-                "markdown_images": json.dumps(markdown_images),
-            }}
-        )
-    else:
-        new_lesson = {
-            "title": title,
-            "markdown_content": json.dumps(markdown_content),
-            "relevant_images": json.dumps(relevant_images),
-            "uploaded_images": json.dumps(uploaded_images),
-            "markdown_images": json.dumps(markdown_images),
-            "teacher_id": teacher_id,
-            "course_id": course_id
-        }
-        result = lessons_collection.insert_one(new_lesson)
-        new_lesson_id = str(result.inserted_id)
+    images = {
+        "relevant_images": relevant_images,
+        "uploaded_images": uploaded_images,
+        "markdown_images": markdown_images,
+    }
+    lesson_id_to_return = LESSON_STORE.save(
+        title, course_id, teacher_id, markdown_content, images, lesson_id=lesson_id)
 
-    lesson_id_to_return = lesson_id if lesson_id else new_lesson_id
+    COURSE_CONTENT_CACHE.invalidate(course_id)
+    LESSON_PPT_CACHE.invalidate(lesson_id_to_return)
     return jsonify({"message": "Lesson saved successfully!", "lesson_id": lesson_id_to_return, "response": True}), 200
 
 
@@ -679,17 +629,18 @@ def get_lesson():
     if not lesson_id:
         return jsonify({"message": "Lesson ID is required."}), 400
 
-    lesson: dict = lessons_collection.find_one({"_id": ObjectId(lesson_id)})
+    lesson: dict = LESSON_STORE.get(lesson_id, image_fields=LESSON_IMAGE_FIELDS)
     if lesson is None:
         return jsonify({"message": "Lesson not found."}), 404
 
+    # the client still expects these fields as JSON strings
     lesson_data = {
         "id": str(lesson.get("_id")),
         "title": lesson.get("title"),
-        "markdown_content": lesson.get("markdown_content"),
-        "relevant_images": lesson.get("relevant_images"),
-        "markdown_images": lesson.get("markdown_images"),
-        "uploaded_images": lesson.get("uploaded_images"),
+        "markdown_content": json.dumps(lesson.get("markdown_content")),
+        "relevant_images": json.dumps(lesson.get("relevant_images")),
+        "markdown_images": json.dumps(lesson.get("markdown_images")),
+        "uploaded_images": json.dumps(lesson.get("uploaded_images")),
         "teacher_id": lesson.get("teacher_id"),
         "course_id": lesson.get("course_id")
     }
@@ -794,14 +745,17 @@ def convert_docx():
     markdown = lab_manual.get('markdown_content', '')
     exp_num = lab_manual.get('exp_number', 'Unknown_Experiment')
     image_list = json.loads(lab_manual.get('markdown_images'))
-    doc = LabManualGenerator.convert_markdown_to_docx(
-        input_file=markdown, course_name=course_name, exp_num=exp_num)
+    try:
+        doc = EXPORT_SERVICE.export("docx", render_docx, ".docx", markdown, course_name, exp_num)
+    except ExportTimeout as e:
+        print(f"Lab manual export timed out: {e}")
+        return jsonify({"message": "Creating the document took too long, please try again.", "response": False}), 504
 
-    return send_file(
+    return ARTIFACT_STORE.send(
         doc,
-        as_attachment=True,
         download_name=f"{course_name}_{exp_num}.docx",
-        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        remove=True
     )
     # except Exception as e:
     #     print("An error occurred while creating the document:", e)
@@ -853,6 +807,7 @@ def add_lab_manual():
         result = lab_manuals_collection.insert_one(new_lab_manual)
         new_lab_manual_id = str(result.inserted_id)
 
+    COURSE_CONTENT_CACHE.invalidate(course_id)
     lab_manual_id_to_return = lab_manual_id if lab_manual_id else new_lab_manual_id
     return jsonify({"message": "Lab manual saved successfully!", "lab_manual_id": lab_manual_id_to_return, "response": True}), 200
 
@@ -898,8 +853,8 @@ def download_ppt():
         if not lesson_id:
             return jsonify({"message": "Lesson ID not provided.", "response": False}), 400
 
-        lesson: dict = lessons_collection.find_one(
-            {"_id": ObjectId(lesson_id)})
+        lesson: dict = LESSON_STORE.get(
+            lesson_id, fields=["title", "course_id", "markdown_content"], image_fields=["markdown_images"])
         if not lesson:
             return jsonify({"message": "Lesson not found.", "response": False}), 404
 
@@ -912,18 +867,13 @@ def download_ppt():
         course_name = course.get("course_name", "Default Course")
         lesson_name = lesson.get("title", "Default Lesson")
         lesson_name = re.sub(r'[<>:"/\\|?*]', '_', lesson_name) + ".pptx"
-        markdown_list = ast.literal_eval(lesson.get("markdown_content", []))
-        markdown_images_list = json.loads(lesson.get("markdown_images", []))
-        presentation_content = PPT_GENERATOR.generate_ppt_content(
-            markdown_list=markdown_list)
-        # ppt_gen = PPT_GENERATOR(presentation_content, course_name=course_name, lesson_name=lesson_name, markdown_images_list=markdown_images_list)
-        downloads_path = PPT_GENERATOR.generate_ppt(
-            markdown_list=presentation_content, markdown_images_list=markdown_images_list, course_name=course_name, lesson_name=lesson_name)
-
-        return send_file(
-            downloads_path,
-            as_attachment=True,
-        )
+        downloads_path = LESSON_PPT_CACHE.path_for(lesson_id, lesson, course_name, lesson_name)
+
+        return ARTIFACT_STORE.send(downloads_path, download_name=f"{course_name}_{lesson_name}")
+
+    except ExportTimeout as e:
+        print(f"Presentation export timed out: {e}")
+        return jsonify({"message": "Creating the presentation took too long, please try again.", "response": False}), 504
 
     except Exception as e:
         print(f"Error while creating ppt: {e}")
@@ -942,7 +892,8 @@ def download_pdf():
     if not lesson_id:
         return jsonify({"message": "Lesson ID not provided.", "response": False}), 400
 
-    lesson = lessons_collection.find_one({"_id": ObjectId(lesson_id)})
+    lesson = LESSON_STORE.get(
+        lesson_id, fields=["title", "course_id", "markdown_content"], image_fields=["markdown_images"])
     if not lesson:
         return jsonify({"message": "Lesson not found.", "response": False}), 404
 
@@ -954,17 +905,24 @@ def download_pdf():
     course_name = course.get("course_name", "Default Course")
     lesson_name = lesson.get("title", "Default Lesson")
     lesson_name = re.sub(r'[<>:"/\\|?*]', '_', lesson_name) + ".pdf"
-    markdown_content = json.loads(lesson.get("markdown_content", "{}"))
-    markdown_images = json.loads(lesson.get("markdown_images", "{}"))
+    markdown_content = lesson.get("markdown_content") or []
+    markdown_images = lesson.get("markdown_images") or []
 
-    pdf_path = os.path.join("/tmp", lesson_name)
-    pdf_dir = os.path.dirname(pdf_path)
-    if not os.path.exists(pdf_dir):
-        os.makedirs(pdf_dir, exist_ok=True)
-    TEACHER_PDF_GENERATOR.generate_pdf(
-        pdf_path, course_name, markdown_content, markdown_images)
+    try:
+        pdf_path = EXPORT_SERVICE.export("pdf", render_lesson_pdf, ".pdf", course_name, markdown_content, markdown_images)
+    except ExportTimeout as e:
+        print(f"Lesson PDF export timed out: {e}")
+        return jsonify({"message": "Creating the PDF took too long, please try again.", "response": False}), 504
 
-    return send_file(pdf_path, as_attachment=True)
+    return ARTIFACT_STORE.send(pdf_path, download_name=lesson_name, mimetype='application/pdf', remove=True)
+
+
+@teachers.route('/artifact-stats', methods=['GET'])
+def artifact_stats():
+    teacher_id = session.get("teacher_id")
+    if teacher_id is None:
+        return jsonify({"message": "Teacher not logged in.", "response": False}), 401
+    return jsonify({"stats": ARTIFACT_STORE.stats(), "response": True}), 200
 
 
 @teachers.route('/logout', methods=['GET'])
@@ -978,39 +936,94 @@ def logout():
 
 from core.code_div import *
 
+timetables_collection = mongodb["timetables"]
+
+
+def save_timetable(teacher_id, inputs, timetable, parent_id=None):
+    """Keep the inputs and result of a solve so its teacher can re-solve later changes against it."""
+    result = timetables_collection.insert_one({
+        "teacher_id": teacher_id,
+        "inputs": inputs,
+        "timetable": timetable,
+        "parent_id": parent_id,
+        "createdAt": datetime.now(),
+    })
+    return str(result.inserted_id)
+
+
+def send_timetable_excel(timetable, inputs, timetable_id):
+    # built in memory and sent straight away; the timetable itself is kept in Mongo, not the file
+    excel_data = timetable_excel_bytes(timetable, inputs["start_time"], inputs["end_time"])
+    response = send_file(excel_data, as_attachment=True, download_name="timetable.xlsx",
+                         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    response.headers["X-Timetable-Id"] = timetable_id
+    return response
+
+
 @teachers.route('/timetable', methods=['POST'])
 def generate_timetable_route():
+    # every solve is saved for re-solving, which only its teacher can do
+    teacher_id = session.get("teacher_id")
+    if teacher_id is None:
+        return jsonify({"message": "Teacher not logged in.", "response": False}), 401
+
     data = request.get_json()
-    teachers_subjects = data.get("teachers_subjects", {}) #{teacher:[sub1,sub2]}
-    classes_subjects=data.get("class_subjects", {}) #{class:[sub1,sub2]}
-    hours_per_week = data.get("hours_per_week", {}) #{subject:hours}
-    preferred_slots = data.get("preferred_slots", {}) #{teacher:"slot"}
-    classrooms = data.get("classrooms", []) # [classroom1, classroom2]
-    labs = data.get("labs", []) # [lab1, lab2]
-    lab_requirements = data.get("lab_requirements", {}) #{sub:lab1}
-    theory_requirements = data.get("theory_requirements", []) #[sub1,sub2]
-    start_time = data.get("start_time")
-    end_time = data.get("end_time")
-    
-    print("Teachers and Subjects:", teachers_subjects)
-    print("Class Subjects:", classes_subjects)
-    print("Hours per Week:", hours_per_week)
-    print("Preferred Slots:", preferred_slots)
-    print("Classrooms:", classrooms)
-    print("Labs:", labs)
-    print("Lab Requirements:", lab_requirements)
-    print("Theory Requirements:", theory_requirements)
-    print("Start Time:", start_time)
-    print("End Time:", end_time)
-    
-    timetable = generate_timetable(teachers_subjects, classes_subjects, hours_per_week, preferred_slots, classrooms,labs, lab_requirements,theory_requirements, start_time, end_time)
-    
-    if isinstance(timetable, str):  # Convert string to dictionary if needed
-        timetable = json.loads(timetable)
-    
-    # print(timetable)
-    excel_file = save_timetable_to_excel(timetable)
-    return send_file(excel_file, as_attachment=True, download_name="timetable.xlsx")
+    # teachers_subjects {teacher:[sub1,sub2]}, class_subjects {class:[sub1,sub2]}, hours_per_week {subject:hours},
+    # preferred_slots / unavailable_slots {teacher:"slot"}, classrooms [classroom1, classroom2], labs [lab1, lab2],
+    # lab_requirements {sub:lab1}, theory_requirements [sub1,sub2], start_time / end_time "HH:MM"
+    try:
+        inputs = timetable_inputs(data)
+        print("Timetable inputs:", inputs)
+        timetable = generate_timetable(inputs["teachers_subjects"], inputs["class_subjects"], inputs["hours_per_week"],
+                                       inputs["preferred_slots"], inputs["classrooms"], inputs["labs"],
+                                       inputs["lab_requirements"], inputs["theory_requirements"], inputs["start_time"],
+                                       inputs["end_time"], unavailable_slots=inputs["unavailable_slots"])
+    except TimetableInfeasible as e:
+        return jsonify({"message": str(e), "response": False}), 400
+    except ValueError as e:
+        return jsonify({"message": f"Invalid timetable input: {e}", "response": False}), 400
+    except TimetableValidationError as e:
+        print(f"Timetable solver error: {e}")
+        return jsonify({"message": "Could not generate a valid timetable", "response": False}), 500
+
+    timetable_id = save_timetable(teacher_id, inputs, timetable)
+    return send_timetable_excel(timetable, inputs, timetable_id)
+
+
+@teachers.route('/timetable/<timetable_id>/resolve', methods=['POST'])
+def resolve_timetable_route(timetable_id):
+    """
+    Re-solve a saved timetable after a change, moving as few slots as possible.
+    Body: {"changes": {field: value}, "format": "json" | "xlsx"}; the new timetable is saved under a new id.
+    """
+    teacher_id = session.get("teacher_id")
+    if teacher_id is None:
+        return jsonify({"message": "Teacher not logged in.", "response": False}), 401
+
+    data = request.get_json() or {}
+    try:
+        saved = timetables_collection.find_one({"_id": ObjectId(timetable_id)})
+    except InvalidId:
+        saved = None
+    # another teacher's timetable is reported as missing rather than forbidden
+    if saved is None or saved.get("teacher_id") != teacher_id:
+        return jsonify({"message": "Timetable not found", "response": False}), 404
+
+    try:
+        inputs, timetable, changes = resolve_timetable(saved["inputs"], saved["timetable"], data.get("changes") or {})
+    except TimetableInfeasible as e:
+        return jsonify({"message": str(e), "response": False}), 400
+    except ValueError as e:
+        return jsonify({"message": f"Invalid timetable input: {e}", "response": False}), 400
+    except TimetableValidationError as e:
+        print(f"Timetable solver error: {e}")
+        return jsonify({"message": "Could not generate a valid timetable", "response": False}), 500
+
+    new_id = save_timetable(teacher_id, inputs, timetable, parent_id=timetable_id)
+    print(f"Re-solved timetable {timetable_id} as {new_id}, {len(changes)} slots changed")
+    if data.get("format") == "xlsx":
+        return send_timetable_excel(timetable, inputs, new_id)
+    return jsonify({"timetable_id": new_id, "timetable": timetable, "changes": changes, "response": True}), 200
 
 
 assignments_collection = mongodb["assignments"] 
@@ -1081,47 +1094,26 @@ def fetch_marks():
     return jsonify({"evaluations": formatted_evaluations})
 
 
-# Add these helper functions in the teachers blueprint
-def get_teacher_by_id(teacher_id):
-    """Get teacher by ID"""
-    id_type = get_id_type(teacher_id)
-    
-    if id_type == "ObjectId" or (isinstance(teacher_id, str) and len(teacher_id) == 24):
-        try:
-            return teachers_collection.find_one({"_id": ObjectId(teacher_id)})
-        except InvalidId:
-            pass
-    
-    return None
-
-def get_student_by_id(student_id):
-    """Get student by ID"""
-    id_type = get_id_type(student_id)
-    
-    if id_type == "Integer":
-        return User.query.get(student_id)
-    
-    return None
-
 # Add these routes to the teachers blueprint
 @teachers.route('/chats', methods=['POST'])
 def teacher_access_chat():
     teacher_id = session.get("teacher_id", None)
     print(f"FLASK /chats - Session BEFORE access: {dict(session)}") 
     print(teacher_id)
-    return access_chat(request, mongodb, is_teacher=True, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=teacher_id)
+    return access_chat(request, mongodb, is_teacher=True, user_directory=USER_DIRECTORY, current_user_id=teacher_id)
 
 @teachers.route('/chats', methods=['GET'])
 def teacher_fetch_chats():
     teacher_id = session.get("teacher_id", None)
     print(f"FLASK /chats - Session BEFORE access: {dict(session)}") 
     print(teacher_id)
-    return fetch_chats(mongodb, is_teacher=True, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=teacher_id)
+    return fetch_chats(mongodb, is_teacher=True, user_directory=USER_DIRECTORY, current_user_id=teacher_id,
+                       before=request.args.get('before'), limit=request.args.get('limit'))
 
 @teachers.route('/chats/group', methods=['POST'])
 def teacher_create_group_chat():
     teacher_id = session.get("teacher_id", None)
-    return create_group_chat(request, mongodb, is_teacher=True, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=teacher_id)
+    return create_group_chat(request, mongodb, is_teacher=True, user_directory=USER_DIRECTORY, current_user_id=teacher_id)
 
 @teachers.route('/chats/rename', methods=['PUT'])
 def teacher_rename_group():
@@ -1138,15 +1130,21 @@ def teacher_remove_from_group():
     teacher_id = session.get("teacher_id", None)
     return remove_from_group(request, mongodb, is_teacher=True,current_user_id=teacher_id)
 
+@teachers.route('/chats/read', methods=['POST'])
+def teacher_mark_chat_read():
+    teacher_id = session.get("teacher_id", None)
+    return mark_chat_read(request, mongodb, is_teacher=True, current_user_id=teacher_id)
+
 @teachers.route('/messages', methods=['POST'])
 def teacher_send_message():
     teacher_id = session.get("teacher_id", None)
-    return send_message(request, mongodb, is_teacher=True, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=teacher_id)
+    return send_message(request, mongodb, is_teacher=True, user_directory=USER_DIRECTORY, current_user_id=teacher_id)
 
 @teachers.route('/messages/<chat_id>', methods=['GET'])
 def teacher_all_messages(chat_id):
     teacher_id = session.get("teacher_id", None)
-    return all_messages(chat_id, mongodb, is_teacher=True, get_teacher_func=get_teacher_by_id, get_student_func=get_student_by_id,current_user_id=teacher_id)
+    return all_messages(chat_id, mongodb, is_teacher=True, user_directory=USER_DIRECTORY, current_user_id=teacher_id,
+                        before=request.args.get('before'), limit=request.args.get('limit'))
 
 # Add a route for searching users (teachers and students) for chat
 @teachers.route('/users/search', methods=['GET'])
@@ -1160,51 +1158,9 @@ def search_users():
     if not teacher_id:
         return jsonify({"message": "Not logged in"}), 401
     
-    # Search for teachers
-    teacher_results = list(teachers_collection.find({
-        "$and": [
-            {"_id": {"$ne": ObjectId(teacher_id)}},
-            {"$or": [
-                {"first_name": {"$regex": search_query, "$options": "i"}},
-                {"last_name": {"$regex": search_query, "$options": "i"}},
-                {"email": {"$regex": search_query, "$options": "i"}}
-            ]}
-        ]
-    }))
-    
-    # Search for students
-    student_results = User.query.filter(
-        or_(
-            User.fname.ilike(f'%{search_query}%'),
-            User.lname.ilike(f'%{search_query}%'),
-            User.email.ilike(f'%{search_query}%')
-        )
-    ).all()
-    
-    # Format results
-    formatted_results = []
-    
-    # Format teacher results
-    for teacher in teacher_results:
-        formatted_results.append({
-            "_id": str(teacher["_id"]),
-            "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
-            "email": teacher.get('email', ''),
-            "pic": teacher.get('pic', 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'),
-            "type": "teacher"
-        })
-    
-    # Format student results
-    for student in student_results:
-        formatted_results.append({
-            "_id": student.user_id,
-            "name": f"{student.fname} {student.lname}",
-            "email": student.email,
-            "pic": 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg',
-            "type": "student"
-        })
-    
-    return jsonify(formatted_results), 200
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    results = USER_SEARCH.search(search_query, exclude=("teacher", str(teacher_id)), limit=limit)
+    return jsonify(results), 200
 
 
 
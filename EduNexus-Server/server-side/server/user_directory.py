@@ -0,0 +1,121 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from bson import ObjectId
+from sqlalchemy.orm import load_only
+from models.student_schema import User
+
+DEFAULT_PIC = 'https://icon-library.com/images/anonymous-avatar-icon/anonymous-avatar-icon-25.jpg'
+
+
+class UserDirectory:
+    """
+    Resolves chat participants to profile cards ({_id, name, email, pic, type}).
+    Teachers live in Mongo (ObjectId ids) and students in SQL (integer ids); every id missing from the
+    cache is fetched with one $in query per store, and cards are kept in a short-TTL LRU cache
+    shared by the REST chat routes and the socket handlers.
+    """
+    def __init__(self, mongodb, ttl_seconds=None, max_entries=None):
+        self.teachers_collection = mongodb["teacher"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("USER_CARD_CACHE_TTL", 60))
+        self.max_entries = max_entries or int(os.getenv("USER_CARD_CACHE_SIZE", 5000))
+        self.lock = Lock()
+        self.cards = OrderedDict()
+
+    @staticmethod
+    def is_teacher_id(user_id):
+        if isinstance(user_id, ObjectId):
+            return True
+        return isinstance(user_id, str) and len(user_id) == 24 and ObjectId.is_valid(user_id)
+
+    @staticmethod
+    def teacher_card(teacher):
+        return {
+            "_id": str(teacher["_id"]),
+            "name": f"{teacher.get('first_name', '')} {teacher.get('last_name', '')}",
+            "email": teacher.get('email', ''),
+            "pic": teacher.get('pic', DEFAULT_PIC),
+            "type": "teacher"
+        }
+
+    @staticmethod
+    def student_card(student):
+        return {
+            "_id": str(student.user_id),
+            "name": f"{student.fname} {student.lname}",
+            "email": student.email,
+            "pic": student.pic if student.pic else DEFAULT_PIC,
+            "type": "student"
+        }
+
+    def resolve(self, user_ids):
+        """Map str(user_id) -> card for every id that belongs to a known teacher or student."""
+        keys = {str(user_id) for user_id in user_ids if user_id is not None}
+        now = time.monotonic()
+        cards = {}
+        with self.lock:
+            for key in keys:
+                cached = self.cards.get(key)
+                if cached and now - cached[0] < self.ttl_seconds:
+                    self.cards.move_to_end(key)
+                    cards[key] = cached[1]
+
+        missing = keys - cards.keys()
+        if missing:
+            fetched = self._fetch(missing)
+            with self.lock:
+                for key, card in fetched.items():
+                    self.cards[key] = (now, card)
+                    self.cards.move_to_end(key)
+                while len(self.cards) > self.max_entries:
+                    self.cards.popitem(last=False)
+            cards.update(fetched)
+        return cards
+
+    def card(self, user_id):
+        return self.resolve([user_id]).get(str(user_id))
+
+    def _fetch(self, keys):
+        teacher_ids = []
+        student_ids = []
+        for key in keys:
+            if self.is_teacher_id(key):
+                teacher_ids.append(ObjectId(key))
+            else:
+                try:
+                    student_ids.append(int(key))
+                except ValueError:
+                    continue
+
+        cards = {}
+        if teacher_ids:
+            for teacher in self.teachers_collection.find(
+                    {"_id": {"$in": teacher_ids}},
+                    {"first_name": 1, "last_name": 1, "email": 1, "pic": 1}):
+                cards[str(teacher["_id"])] = self.teacher_card(teacher)
+        if student_ids:
+            students = User.query.options(
+                load_only(User.user_id, User.fname, User.lname, User.email, User.pic)
+            ).filter(User.user_id.in_(student_ids)).all()
+            for student in students:
+                cards[str(student.user_id)] = self.student_card(student)
+        return cards
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.cards.pop(str(user_id), None)
+
+    def populate_chat(self, chat, cards):
+        """Replace the user / groupAdmin ids of a formatted chat with profile cards."""
+        chat['users'] = [cards[str(user_id)] for user_id in chat.get('users', []) if str(user_id) in cards]
+        if chat.get('groupAdmin') and str(chat['groupAdmin']) in cards:
+            chat['groupAdmin'] = cards[str(chat['groupAdmin'])]
+        return chat
+
+    @staticmethod
+    def chat_user_ids(chat):
+        user_ids = list(chat.get('users', []))
+        if chat.get('groupAdmin'):
+            user_ids.append(chat['groupAdmin'])
+        return user_ids
@@ -0,0 +1,282 @@
+import os
+import re
+import time
+import heapq
+from collections import Counter, OrderedDict, defaultdict
+from threading import Lock, Thread
+from flask import current_app
+from sqlalchemy.orm import load_only
+from models.student_schema import User
+from server.user_directory import UserDirectory
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# shorter query tokens share too few trigrams to rank typos, so they are matched by prefix only
+MIN_TYPO_TOKEN_LENGTH = 3
+# edit distance is only computed for the entries sharing the most trigrams with a query token
+MAX_TYPO_CANDIDATES = int(os.getenv("USER_SEARCH_MAX_TYPO_CANDIDATES", 200))
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """Optimal string alignment distance: insertions, deletions, substitutions and adjacent swaps."""
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous_row, row = previous_row, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+    return row[len(b)]
+
+
+def typo_score(query_token, token):
+    """Score below 1 when query_token is a small typo away from token or from its start, else 0."""
+    allowed = 1 if len(query_token) < 8 else 2
+    distance = min(edit_distance(query_token, token), edit_distance(query_token, token[:len(query_token)]))
+    return 1.0 - 0.25 * distance if distance <= allowed else 0.0
+
+
+class SearchData:
+    """
+    One published state of the index: cards by (type, id) plus the prefix and trigram postings.
+    The posting sets are never changed after publication (writers replace them), so searches read a
+    SearchData without holding the index lock.
+    """
+    def __init__(self):
+        self.cards = {}
+        self.tokens = {}
+        self.prefixes = {}
+        self.grams = {}
+
+    def add(self, key, card, tokens, copy_on_write):
+        self.cards[key] = card
+        self.tokens[key] = tokens
+        for postings, entries in ((self.prefixes, token_prefixes(tokens)), (self.grams, token_grams(tokens))):
+            for entry in entries:
+                if copy_on_write:
+                    postings[entry] = postings.get(entry, frozenset()) | {key}
+                else:
+                    postings.setdefault(entry, set()).add(key)
+
+    def discard(self, key):
+        tokens = self.tokens.pop(key, ())
+        for postings, entries in ((self.prefixes, token_prefixes(tokens)), (self.grams, token_grams(tokens))):
+            for entry in entries:
+                if entry in postings:
+                    postings[entry] = postings[entry] - {key}
+        self.cards.pop(key, None)
+
+
+def token_prefixes(tokens):
+    return {token[:end] for token in tokens for end in range(1, len(token) + 1)}
+
+
+def token_grams(tokens):
+    return {gram for token in tokens for gram in trigrams(token)}
+
+
+class UserSearchIndex:
+    """
+    In-process search index over teachers (Mongo) and students (SQL) for the chat user search.
+    Names, email local parts and email domains are indexed by prefix for search-as-you-type and by trigram
+    for typo tolerance, so a query never scans either store. Both stores are loaded once (one query each) and
+    then kept in sync through upsert/remove from the register, profile and delete routes. Every
+    refresh_seconds a background thread reloads them to pick up changes made by other worker processes,
+    while searches keep using the previous data. Recent query results are cached until the index changes.
+    """
+    def __init__(self, mongodb, refresh_seconds=None, cache_ttl_seconds=None, cache_size=512):
+        self.teachers_collection = mongodb["teacher"]
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else int(os.getenv("USER_SEARCH_REFRESH_SECONDS", 300))
+        self.cache_ttl_seconds = cache_ttl_seconds if cache_ttl_seconds is not None else int(os.getenv("USER_SEARCH_CACHE_TTL", 30))
+        self.cache_size = cache_size
+        # serialises writers (upserts, removals, publishing a reload) and guards the query cache
+        self.lock = Lock()
+        self.build_lock = Lock()
+        self.data = None
+        self.built_at = None
+        self.refreshing = False
+        # upserts / removals made while a reload is loading, replayed onto the reloaded data
+        self.replay = None
+        self.generation = 0
+        self.cache = OrderedDict()
+
+    def _load(self):
+        cards = []
+        for teacher in self.teachers_collection.find({}, {"first_name": 1, "last_name": 1, "email": 1, "pic": 1}):
+            cards.append(UserDirectory.teacher_card(teacher))
+        students = User.query.options(load_only(User.user_id, User.fname, User.lname, User.email, User.pic)).all()
+        cards.extend(UserDirectory.student_card(student) for student in students)
+        return cards
+
+    def _ensure_fresh(self):
+        if self.data is None:
+            # nothing to serve yet, the first search builds the index itself
+            with self.build_lock:
+                if self.data is None:
+                    self.reload()
+            return
+        if time.monotonic() - self.built_at < self.refresh_seconds:
+            return
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        Thread(target=self._reload_in_context, args=(current_app._get_current_object(),), daemon=True).start()
+
+    def _reload_in_context(self, app):
+        try:
+            with app.app_context():
+                self.reload()
+        except Exception as e:
+            print(f"Error refreshing the user search index: {e}")
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def reload(self):
+        """Load both stores into new SearchData and publish it; runs without blocking searches."""
+        with self.lock:
+            self.replay = []
+        try:
+            cards = self._load()
+            data = SearchData()
+            for card in cards:
+                data.add(self.card_key(card), self.result_card(card), self.card_tokens(card), copy_on_write=False)
+        except Exception:
+            with self.lock:
+                self.replay = None
+            raise
+        with self.lock:
+            for change in self.replay:
+                self._apply(data, *change)
+            self.replay = None
+            self.data = data
+            self.built_at = time.monotonic()
+            self._changed()
+
+    @staticmethod
+    def card_key(card):
+        return card["type"], str(card["_id"])
+
+    @staticmethod
+    def result_card(card):
+        """The card as the search routes return it: student ids are integers, teacher ids ObjectId strings."""
+        if card["type"] == "student":
+            return {**card, "_id": int(card["_id"])}
+        return card
+
+    @staticmethod
+    def card_tokens(card):
+        # "jo.smith@x.com" is indexed as jo, smith, x, com plus the whole local part and domain
+        email = (card.get("email") or "").lower()
+        local_part, _, domain = email.partition("@")
+        tokens = set(tokenize(card.get("name"))) | set(tokenize(local_part)) | set(tokenize(domain))
+        return tokens | {part for part in (local_part, domain) if part}
+
+    def _apply(self, data, action, card_or_key):
+        if action == "upsert":
+            key = self.card_key(card_or_key)
+            data.discard(key)
+            data.add(key, self.result_card(card_or_key), self.card_tokens(card_or_key), copy_on_write=True)
+        else:
+            data.discard(card_or_key)
+
+    def _changed(self):
+        self.generation += 1
+        self.cache.clear()
+
+    def upsert_teacher(self, teacher):
+        self._write("upsert", UserDirectory.teacher_card(teacher))
+
+    def upsert_student(self, student):
+        self._write("upsert", UserDirectory.student_card(student))
+
+    def remove(self, user_type, user_id):
+        self._write("remove", (user_type, str(user_id)))
+
+    def _write(self, action, card_or_key):
+        with self.lock:
+            if self.replay is not None:
+                self.replay.append((action, card_or_key))
+            if self.data is None:
+                return
+            self._apply(self.data, action, card_or_key)
+            self._changed()
+
+    @staticmethod
+    def _score(data, query_tokens):
+        """
+        Sum of the best per-token scores for every candidate (exact token 3, prefix 2, typo below 1)
+        and how many of the query tokens it matched. Typo candidates are the MAX_TYPO_CANDIDATES entries
+        sharing the most trigrams with the query token.
+        """
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for query_token in query_tokens:
+            best = {}
+            for key in data.prefixes.get(query_token, ()):
+                best[key] = 3.0 if query_token in data.tokens.get(key, ()) else 2.0
+            if len(query_token) >= MIN_TYPO_TOKEN_LENGTH:
+                shared = Counter()
+                for gram in trigrams(query_token):
+                    shared.update(key for key in data.grams.get(gram, ()) if key not in best)
+                candidates = heapq.nlargest(MAX_TYPO_CANDIDATES, shared, key=shared.get) if len(shared) > MAX_TYPO_CANDIDATES else shared
+                for key in candidates:
+                    score = max((typo_score(query_token, token) for token in data.tokens.get(key, ())), default=0.0)
+                    if score > 0:
+                        best[key] = score
+            for key, score in best.items():
+                scores[key] += score
+                matched[key] += 1
+        return scores, matched
+
+    @staticmethod
+    def query_tokens(query_text):
+        if "@" in query_text:
+            # an email (or "@domain") is matched part by part against the whole local part and domain
+            local_part, _, domain = query_text.partition("@")
+            return [part for part in (local_part, domain) if part]
+        return tokenize(query_text)
+
+    def search(self, query, exclude=None, limit=20):
+        """Ranked teacher and student cards matching query, without the excluded (type, id) pair."""
+        query_text = (query or "").strip().lower()
+        query_tokens = self.query_tokens(query_text)
+        if not query_tokens:
+            return []
+        self._ensure_fresh()
+
+        cache_key = (query_text, exclude, limit)
+        now = time.monotonic()
+        with self.lock:
+            data, generation = self.data, self.generation
+            cached = self.cache.get(cache_key)
+            if cached and cached[0] == generation and now - cached[1] < self.cache_ttl_seconds:
+                self.cache.move_to_end(cache_key)
+                return cached[2]
+
+        # scored against the published data, outside the lock
+        scores, matched = self._score(data, query_tokens)
+        # every query token has to match, so "jo sm" narrows the results instead of widening them
+        found = [(key, data.cards.get(key)) for key in scores if matched[key] == len(query_tokens) and key != exclude]
+        # a user removed while scoring has no card any more
+        found = [(key, card) for key, card in found if card is not None]
+        found.sort(key=lambda item: (-scores[item[0]], item[1]["name"].lower()))
+        results = [card for _, card in found[:limit]]
+
+        with self.lock:
+            if self.generation == generation:
+                self.cache[cache_key] = (generation, now, results)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return results